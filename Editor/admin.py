@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import PDFDocument
+from .models import PDFDocument, PDFJob
 
 # Register your models here.
 
-admin.site.register(PDFDocument)
\ No newline at end of file
+admin.site.register(PDFDocument)
+admin.site.register(PDFJob)
@@ -0,0 +1,183 @@
+"""
+Caché de resultados direccionada por contenido.
+
+La clave de cada resultado es el SHA-256 del archivo de entrada junto con el
+nombre de la operación y sus parámetros normalizados. Los resultados se guardan
+en disco (por defecto MEDIA_ROOT/cache) con un límite de tamaño LRU y una
+caducidad (TTL), de modo que una petición repetida se responde con los bytes
+guardados sin volver a abrir el PDF.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from django.conf import settings
+
+
+def hash_uploaded_file(uploaded_file) -> str:
+    """Calcula el SHA-256 de un archivo subido leyéndolo por bloques."""
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def make_key(input_hash: str, operation: str, params: dict) -> str:
+    """Construye la clave de caché a partir de la entrada, la operación y sus parámetros."""
+    payload = json.dumps(
+        {'input': input_hash, 'operation': operation, 'params': params},
+        sort_keys=True,
+        separators=(',', ':'),
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class CachedResult:
+    """Resultado encontrado en la caché."""
+
+    def __init__(self, path: str, filename: str, content_type: str, headers: dict = None):
+        self.path = path
+        self.filename = filename
+        self.content_type = content_type
+        self.headers = headers or {}
+
+
+class ResultCache:
+    """Caché de resultados en disco con expulsión LRU por tamaño y caducidad por TTL."""
+
+    def __init__(self, directory: str, max_bytes: int, ttl: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def _paths(self, key: str) -> tuple:
+        return os.path.join(self.directory, f"{key}.bin"), os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str):
+        """Devuelve el CachedResult de la clave o None si no existe o ha caducado."""
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, encoding='utf-8') as meta_file:
+                meta = json.load(meta_file)
+            if time.time() - meta['created_at'] > self.ttl:
+                self._remove(key)
+                raise FileNotFoundError(data_path)
+            # La fecha de modificación del resultado marca su último uso (LRU)
+            os.utime(data_path)
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return CachedResult(data_path, meta['filename'], meta['content_type'], meta.get('headers'))
+
+    def put(self, key: str, source_path: str, filename: str, content_type: str, headers: dict = None):
+        """
+        Guarda en la caché una copia del resultado y aplica los límites de tamaño y TTL.
+
+        headers son cabeceras de respuesta que se repiten al servir el resultado desde la caché.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        data_path, meta_path = self._paths(key)
+        temp_path = f"{data_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        try:
+            try:
+                os.link(source_path, temp_path)  # Sin copia si están en el mismo sistema de archivos
+            except OSError:
+                shutil.copyfile(source_path, temp_path)
+            os.replace(temp_path, data_path)
+            with open(meta_path, 'w', encoding='utf-8') as meta_file:
+                json.dump({
+                    'filename': filename,
+                    'content_type': content_type,
+                    'headers': headers or {},
+                    'created_at': time.time()
+                }, meta_file)
+        except OSError as e:
+            print(f"Advertencia: No se pudo guardar el resultado en caché: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        self.evict()
+
+    def _remove(self, key: str):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def evict(self):
+        """Elimina los resultados caducados y, si se supera max_bytes, los menos usados."""
+        entries = []
+        now = time.time()
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+
+        for name in names:
+            if not name.endswith('.bin'):
+                continue
+            key = name[:-len('.bin')]
+            data_path, meta_path = self._paths(key)
+            try:
+                stat = os.stat(data_path)
+                created_at = os.stat(meta_path).st_mtime
+            except OSError:
+                continue
+            if now - created_at > self.ttl:
+                self._remove(key)
+                with self._lock:
+                    self.evictions += 1
+                continue
+            entries.append((stat.st_mtime, stat.st_size, key))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(key)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Devuelve la caché de resultados del proceso, o None si está desactivada."""
+    global _result_cache
+    if not getattr(settings, 'PDF_RESULT_CACHE_ENABLED', True):
+        return None
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache(
+                getattr(settings, 'PDF_RESULT_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, 'cache')),
+                getattr(settings, 'PDF_RESULT_CACHE_MAX_BYTES', 512 * 1024 * 1024),
+                getattr(settings, 'PDF_RESULT_CACHE_TTL', 24 * 60 * 60)
+            )
+        return _result_cache
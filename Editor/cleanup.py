@@ -0,0 +1,221 @@
+"""
+Limpieza de archivos temporales.
+
+Cada petición trabaja en su propio directorio (RequestWorkspace, dentro de
+MEDIA_ROOT/tmp) que se borra entero cuando la respuesta que lo usa se cierra, o
+al terminar la vista si no llega a entregarse. Un único hilo conserje recorre
+MEDIA_ROOT cada PDF_JANITOR_INTERVAL segundos y borra los archivos y espacios de
+trabajo huérfanos más antiguos que PDF_JANITOR_MAX_AGE. stats() expone los
+bytes retenidos y lo recuperado.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+
+class CleanupMetrics:
+    """Contadores de la limpieza, compartidos por las vistas y el conserje."""
+
+    def __init__(self):
+        self.files_reclaimed = 0
+        self.bytes_reclaimed = 0
+        self.orphans_reclaimed = 0
+        self.sweeps = 0
+        self._lock = threading.Lock()
+
+    def add(self, files, size, orphans=0):
+        with self._lock:
+            self.files_reclaimed += files
+            self.bytes_reclaimed += size
+            self.orphans_reclaimed += orphans
+
+    def sweep_done(self):
+        with self._lock:
+            self.sweeps += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'files_reclaimed': self.files_reclaimed,
+                'bytes_reclaimed': self.bytes_reclaimed,
+                'orphans_reclaimed': self.orphans_reclaimed,
+                'sweeps': self.sweeps,
+            }
+
+
+metrics = CleanupMetrics()
+
+
+def workspace_root() -> str:
+    return os.path.join(settings.MEDIA_ROOT, 'tmp')
+
+
+def _disk_usage(path) -> tuple:
+    """Devuelve (archivos, bytes) de un archivo o de un árbol de directorios."""
+    if not os.path.isdir(path):
+        try:
+            return 1, os.path.getsize(path)
+        except OSError:
+            return 0, 0
+
+    files = size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                size += os.path.getsize(os.path.join(dirpath, filename))
+                files += 1
+            except OSError:
+                pass
+    return files, size
+
+
+def discard(paths, orphan=False):
+    """Borra archivos o directorios completos y los suma a las métricas."""
+    for path in paths:
+        if not path or not os.path.lexists(path):
+            continue
+        files, size = _disk_usage(path)
+        try:
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except OSError as e:
+            print(f"Error eliminando {path}: {e}")
+            continue
+        metrics.add(files, size, files if orphan else 0)
+
+
+class RequestWorkspace:
+    """
+    Directorio temporal de una petición.
+
+    release() entrega el directorio a la respuesta (se pasa como cleanup_paths de
+    file_download_response o StreamWithCleanup) y close() deja de borrarlo; si no
+    se entrega, close() lo borra al terminar la vista.
+    """
+
+    def __init__(self):
+        start_janitor()
+        os.makedirs(workspace_root(), exist_ok=True)
+        self.path = tempfile.mkdtemp(prefix='req-', dir=workspace_root())
+        self.released = False
+
+    def file_path(self, name: str) -> str:
+        """Ruta dentro del espacio de trabajo para un nombre de archivo (sin directorios)."""
+        return os.path.join(self.path, os.path.basename(name))
+
+    def release(self) -> list:
+        """Cede el borrado del directorio a quien lo reciba; devuelve las rutas a borrar."""
+        self.released = True
+        return [self.path]
+
+    def close(self):
+        if not self.released:
+            discard([self.path])
+            self.released = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _excluded_paths() -> set:
+    """Directorios de MEDIA_ROOT con su propia caducidad, que el conserje no toca."""
+    excluded = {os.path.join(settings.MEDIA_ROOT, name) for name in getattr(settings, 'PDF_JANITOR_EXCLUDE', ())}
+    excluded.add(getattr(settings, 'PDF_RESULT_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, 'cache')))
+    return {os.path.abspath(path) for path in excluded}
+
+
+def sweep(max_age=None):
+    """
+    Borra de MEDIA_ROOT los archivos y espacios de trabajo más antiguos que max_age segundos.
+
+    Borrar un archivo que una respuesta sigue enviando no corta la descarga: el
+    descriptor abierto sigue siendo válido hasta que la respuesta se cierra.
+    """
+    if max_age is None:
+        max_age = getattr(settings, 'PDF_JANITOR_MAX_AGE', 60 * 60)
+    limit = time.time() - max_age
+    excluded = _excluded_paths()
+    root = workspace_root()
+
+    candidates = []
+    for directory in (settings.MEDIA_ROOT, root):
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            path = os.path.abspath(entry.path)
+            if path in excluded or path == os.path.abspath(root):
+                continue
+            try:
+                if entry.stat(follow_symlinks=False).st_mtime < limit:
+                    candidates.append(path)
+            except OSError:
+                pass
+
+    discard(candidates, orphan=True)
+    metrics.sweep_done()
+    return len(candidates)
+
+
+_janitor = None
+_janitor_lock = threading.Lock()
+
+
+def _janitor_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            sweep()
+        except Exception as e:
+            print(f"Error en la limpieza periódica de MEDIA_ROOT: {e}")
+
+
+def start_janitor():
+    """Arranca el hilo conserje del proceso la primera vez que se llama."""
+    global _janitor
+    interval = getattr(settings, 'PDF_JANITOR_INTERVAL', 5 * 60)
+    if not interval:
+        return
+    with _janitor_lock:
+        if _janitor is None:
+            _janitor = threading.Thread(target=_janitor_loop, args=(interval,), name='pdf-janitor', daemon=True)
+            _janitor.start()
+
+
+def stats() -> dict:
+    """Métricas de limpieza más los bytes que ocupan ahora los temporales de MEDIA_ROOT."""
+    excluded = _excluded_paths()
+    held_files = held_bytes = 0
+    try:
+        entries = list(os.scandir(settings.MEDIA_ROOT))
+    except OSError:
+        entries = []
+    for entry in entries:
+        if os.path.abspath(entry.path) in excluded:
+            continue
+        files, size = _disk_usage(entry.path)
+        held_files += files
+        held_bytes += size
+
+    try:
+        workspaces = len(os.listdir(workspace_root()))
+    except OSError:
+        workspaces = 0
+
+    return {
+        'bytes_held': held_bytes,
+        'files_held': held_files,
+        'workspaces': workspaces,
+        'janitor_running': _janitor is not None and _janitor.is_alive(),
+        **metrics.snapshot(),
+    }
@@ -1,53 +1,339 @@
+import hashlib
+import io
 import os
-from PyPDF2 import PdfMerger, PdfReader, PdfWriter
+import re
+import threading
+import time
+from PyPDF2 import PdfReader, PdfWriter
 from PyPDF2.errors import PdfReadError
 from PIL import Image
 import zipfile
 import fitz
 import shutil
+import tempfile
 import traceback
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
 from reportlab.lib.pagesizes import letter, A4, legal
 from reportlab.lib.units import inch
 from reportlab.pdfgen import canvas
+from reportlab.lib.utils import ImageReader
 
-def join_pdfs(pdf_file_paths: list, output_directory: str):
-  """Une múltiples archivos PDF en uno solo."""
+# Las funciones que reciben un archivo de entrada aceptan una ruta o su contenido
+# en bytes: las subidas pequeñas llegan en memoria y no se escriben en disco.
+
+def _en_memoria(source) -> bool:
+  """True si source es el contenido del archivo y no una ruta."""
+  return isinstance(source, (bytes, bytearray, memoryview))
+
+def _describir_origen(source) -> str:
+  """Ruta del archivo, o un texto corto para mensajes si está en memoria."""
+  return f"<{len(source)} bytes en memoria>" if _en_memoria(source) else str(source)
+
+def _comprobar_origen(source, message: str = "Archivo no encontrado"):
+  """Lanza FileNotFoundError si source es una ruta que no existe."""
+  if not _en_memoria(source) and not os.path.exists(source):
+      raise FileNotFoundError(f"{message}: {source}")
+
+def _tamano_origen(source) -> int:
+  return len(source) if _en_memoria(source) else os.path.getsize(source)
+
+def _abrir_binario(source):
+  """Archivo binario de lectura para una ruta o un contenido en memoria."""
+  return io.BytesIO(source) if _en_memoria(source) else open(source, 'rb')
+
+def _copiar_origen(source, output_path: str):
+  """Escribe el archivo de entrada tal cual en output_path."""
+  if _en_memoria(source):
+      with open(output_path, 'wb') as output_file:
+          output_file.write(source)
+  else:
+      shutil.copyfile(source, output_path)
+
+def abrir_fitz(source):
+  """Abre con PyMuPDF una ruta o un PDF en memoria (fitz.open(stream=...))."""
+  if _en_memoria(source):
+      return fitz.open(stream=bytes(source), filetype='pdf')
+  return fitz.open(source)
+
+def _con_progreso(items, total: int, progress=None):
+  """
+  Recorre items y llama a progress(hechos, total) cada vez que se termina uno.
+
+  progress es el mismo parámetro opcional de las operaciones largas (join_pdfs,
+  zip_pdfs, comprimir_pdf, ...); Editor.jobs lo usa para informar el avance.
+  """
+  for done, item in enumerate(items, 1):
+      yield item
+      if progress:
+          progress(done, total)
+
+def _agregar_pdfs_al_writer(writer, pdf_file_paths: list, archivos: ExitStack, progress=None):
+  """
+  Valida cada PDF de entrada y lo agrega al writer en orden.
+
+  Cada archivo se analiza una sola vez: el mismo PdfReader que sirve para
+  validarlo se reutiliza para copiar sus páginas. Los archivos quedan abiertos
+  en `archivos` hasta que el writer termina de escribir. La escritura final
+  cuenta como un paso más en progress.
+  """
+  for pdf_path in _con_progreso(pdf_file_paths, len(pdf_file_paths) + 1, progress): # Iterar sobre los archivos PDF (rutas o bytes)
+      _comprobar_origen(pdf_path)
+      f = archivos.enter_context(_abrir_binario(pdf_path))  # Abrir el archivo PDF
+      _agregar_pdf(writer, f, _describir_origen(pdf_path))
+
+def _agregar_pdf(writer, file_obj, nombre: str):
+  """Valida un PDF abierto y agrega sus páginas al writer con el mismo PdfReader."""
+  try:
+      reader = PdfReader(file_obj) # Leer el archivo PDF
+      writer.append(reader) # Agregar cada PDF reutilizando el mismo reader
+  except PdfReadError:  # Si no es un PDF válido o está corrupto, lanzar error
+      raise ValueError(f"El archivo {nombre} no es un PDF válido o está corrupto.")
+
+def join_pdfs(pdf_file_paths: list, output_directory: str, progress=None):
+  """Une múltiples archivos PDF en uno solo (progress: ver _con_progreso)."""
   if not pdf_file_paths:
       raise ValueError("No se proporcionaron archivos PDF para unir.")
 
-  merger = PdfMerger()
   output_filename = "pdfs_combinados.pdf"
   output_path = os.path.join(output_directory, output_filename)
 
   try: 
-      for pdf_path in pdf_file_paths: # Iterar sobre los archivos PDF
-          if not os.path.exists(pdf_path): 
-              raise FileNotFoundError(f"Archivo no encontrado: {pdf_path}") 
-          try:  
-              with open(pdf_path, 'rb') as f:  # Abrir el archivo PDF
-                  PdfReader(f) # Leer el archivo PDF
-          except PdfReadError:  # Si no es un PDF válido o está corrupto, lanzar error
-              raise ValueError(f"El archivo {pdf_path} no es un PDF válido o está corrupto.")
+      with ExitStack() as archivos: # Asegurar que se cierran los archivos de entrada
+          writer = PdfWriter()
+          _agregar_pdfs_al_writer(writer, pdf_file_paths, archivos, progress)
           
-          merger.append(pdf_path) # Agregar cada PDF al merger
-      
-      merger.write(output_path) # Guardar el merger en el archivo de salida
+          with open(output_path, 'wb') as output_file:
+              writer.write(output_file) # Guardar el resultado en el archivo de salida
+          if progress:
+              progress(len(pdf_file_paths) + 1, len(pdf_file_paths) + 1)
       return output_path # Devolver la ruta del archivo de salida
   except Exception as e: # Si ocurre algún error
       raise Exception(f"Error al unir PDFs: {str(e)}") 
-  finally: # Asegurar que se cierra el merger
-      merger.close()
 
-def split_pdf_by_range(input_pdf_path: str, output_directory: str, start_page: int, end_page: int):
+def join_pdfs_to_stream(pdf_file_paths: list, spool_max_size: int = 16 * 1024 * 1024):
+  """
+  Une múltiples archivos PDF escribiendo el resultado en un archivo temporal "spooled".
+
+  El PDF serializado se mantiene en memoria hasta spool_max_size bytes y a partir
+  de ahí pasa a un archivo temporal anónimo, así que no se guarda una segunda copia
+  completa del resultado en memoria. La memoria no queda acotada: el PdfWriter
+  conserva todas las páginas copiadas (con sus streams) hasta terminar de
+  escribir, por lo que crece con el tamaño del PDF combinado.
+
+  Returns:
+      SpooledTemporaryFile: Archivo con el PDF combinado, posicionado al inicio.
+  """
+  if not pdf_file_paths:
+      raise ValueError("No se proporcionaron archivos PDF para unir.")
+
+  output = tempfile.SpooledTemporaryFile(max_size=spool_max_size)
+
+  try:
+      with ExitStack() as archivos:
+          writer = PdfWriter()
+          _agregar_pdfs_al_writer(writer, pdf_file_paths, archivos)
+
+          writer.write(output)
+      output.seek(0)
+      return output
+  except Exception as e:
+      output.close()
+      raise Exception(f"Error al unir PDFs: {str(e)}")
+
+class IncrementalPdfJoiner:
+  """
+  Une PDFs a medida que van llegando, sin esperar a tenerlos todos.
+
+  append() valida cada archivo con el mismo PdfReader que después copia sus
+  páginas, así que un PDF corrupto se rechaza en cuanto se recibe. Los archivos
+  agregados quedan a cargo del joiner y se cierran en write_to_stream() o close().
+  Como en join_pdfs_to_stream, el writer mantiene en memoria todas las páginas
+  agregadas hasta escribir la unión.
+  """
+
+  def __init__(self):
+      self.writer = PdfWriter()
+      self.count = 0
+      self._archivos = ExitStack()
+
+  def append(self, file_obj, nombre: str):
+      """Agrega un PDF abierto (archivo binario con seek) al final de la unión."""
+      self._archivos.callback(file_obj.close)
+      file_obj.seek(0)
+      _agregar_pdf(self.writer, file_obj, nombre)
+      self.count += 1
+
+  def write_to_stream(self, spool_max_size: int = 16 * 1024 * 1024):
+      """Escribe la unión como join_pdfs_to_stream y cierra los archivos de entrada."""
+      if not self.count:
+          raise ValueError("No se proporcionaron archivos PDF para unir.")
+
+      output = tempfile.SpooledTemporaryFile(max_size=spool_max_size)
+      try:
+          self.writer.write(output)
+      except Exception as e:
+          output.close()
+          raise Exception(f"Error al unir PDFs: {str(e)}")
+      finally:
+          self.close()
+      output.seek(0)
+      return output
+
+  def close(self):
+      self._archivos.close()
+
+def iterar_archivo(file_obj, chunk_size: int = 64 * 1024):
+  """Entrega el contenido de un archivo en bloques y lo cierra al terminar."""
+  try:
+      while True:
+          chunk = file_obj.read(chunk_size)
+          if not chunk:
+              break
+          yield chunk
+  finally:
+      file_obj.close()
+
+PAGE_BACKENDS = ('fitz', 'pypdf2')
+DEFAULT_PAGE_BACKEND = 'fitz'
+
+def _agrupar_consecutivas(indices):
+    """Agrupa índices de página en tramos (inicio, fin) consecutivos y ascendentes."""
+    tramos = []
+    for index in indices:
+        if tramos and index == tramos[-1][1] + 1:
+            tramos[-1][1] = index
+        else:
+            tramos.append([index, index])
+    return [(inicio, fin) for inicio, fin in tramos]
+
+class FitzPageAssembler:
+    """Ensambla páginas con PyMuPDF copiando tramos completos con insert_pdf."""
+
+    def __init__(self, input_pdf_path: str):
+        self._set_document(abrir_fitz(input_pdf_path))
+
+    @classmethod
+    def from_document(cls, doc):
+        """Ensamblador sobre un documento PyMuPDF ya abierto (y autenticado si hace falta)."""
+        assembler = cls.__new__(cls)
+        assembler._set_document(doc)
+        return assembler
+
+    def _set_document(self, doc):
+        self.doc = doc
+        # MuPDF autentica solo los PDFs sin contraseña de usuario, así que se
+        # consulta el trailer para saber si el archivo tiene /Encrypt.
+        self.is_encrypted = self.doc.xref_get_key(-1, "Encrypt")[0] != "null"
+
+    @property
+    def page_count(self) -> int:
+        return self.doc.page_count
+
+    def decrypt(self, password: str) -> int:
+        """Devuelve 0 si la contraseña es incorrecta, 1 (usuario) o 2 (propietario)."""
+        result = self.doc.authenticate(password)
+        if result == 0:
+            return 0
+        return 2 if result & 4 else 1
+
+    def write_pages(self, page_indices, output, skip_broken_pages: bool = False) -> int:
+        """Escribe las páginas indicadas (índices 0-based) en una ruta o archivo binario."""
+        page_indices = list(page_indices)
+        new_doc = fitz.open()
+        try:
+            tramos = _agrupar_consecutivas(page_indices)
+            for n, (inicio, fin) in enumerate(tramos, 1):
+                # final=False conserva el mapa de objetos entre tramos del mismo origen
+                try:
+                    new_doc.insert_pdf(self.doc, from_page=inicio, to_page=fin, final=(n == len(tramos)))
+                except Exception:
+                    if not skip_broken_pages:
+                        raise
+                    self._insert_pages_one_by_one(new_doc, inicio, fin)
+            new_doc.save(output, no_new_id=True)
+            return new_doc.page_count
+        finally:
+            new_doc.close()
+
+    def _insert_pages_one_by_one(self, new_doc, inicio: int, fin: int):
+        """Inserta un tramo página por página, omitiendo las que no se pueden copiar."""
+        for page_index in range(inicio, fin + 1):
+            try:
+                new_doc.insert_pdf(self.doc, from_page=page_index, to_page=page_index)
+            except Exception as e:
+                print(f"Advertencia: Error al procesar página {page_index + 1}: {e}")
+
+    def close(self):
+        if not self.doc.is_closed:
+            self.doc.close()
+
+class PyPDF2PageAssembler:
+    """Ensambla páginas con PyPDF2 copiándolas una a una en un PdfWriter."""
+
+    def __init__(self, input_pdf_path: str):
+        self.reader = PdfReader(io.BytesIO(input_pdf_path) if _en_memoria(input_pdf_path) else input_pdf_path)
+        self.is_encrypted = self.reader.is_encrypted
+
+    @property
+    def page_count(self) -> int:
+        return len(self.reader.pages)
+
+    def decrypt(self, password: str) -> int:
+        """Devuelve 0 si la contraseña es incorrecta, 1 (usuario) o 2 (propietario)."""
+        return int(self.reader.decrypt(password))
+
+    def write_pages(self, page_indices, output, skip_broken_pages: bool = False) -> int:
+        """Escribe las páginas indicadas (índices 0-based) en una ruta o archivo binario."""
+        writer = PdfWriter()
+        for page_index in page_indices:
+            try:
+                writer.add_page(self.reader.pages[page_index])
+            except Exception as e:
+                if not skip_broken_pages:
+                    raise
+                print(f"Advertencia: Error al procesar página {page_index + 1}: {e}")
+
+        if isinstance(output, (str, os.PathLike)):
+            with open(output, "wb") as output_file:
+                writer.write(output_file)
+        else:
+            writer.write(output)
+        return len(writer.pages)
+
+    def close(self):
+        pass
+
+def open_page_assembler(input_pdf_path: str, backend: str = None):
+    """
+    Abre un PDF con el motor de ensamblado de páginas indicado.
+
+    Args:
+        input_pdf_path: Ruta del PDF de origen o su contenido en bytes
+        backend: 'fitz' (PyMuPDF, por defecto) o 'pypdf2'
+
+    Returns:
+        FitzPageAssembler | PyPDF2PageAssembler
+    """
+    backend = (backend or DEFAULT_PAGE_BACKEND).lower()
+    if backend == 'fitz':
+        return FitzPageAssembler(input_pdf_path)
+    if backend == 'pypdf2':
+        return PyPDF2PageAssembler(input_pdf_path)
+    raise ValueError(f"Motor de páginas desconocido: {backend}. Use uno de {', '.join(PAGE_BACKENDS)}.")
+
+def split_pdf_by_range(input_pdf_path: str, output_directory: str, start_page: int, end_page: int, backend: str = None):
   """Divide un PDF extrayendo un rango específico de páginas."""
-  if not os.path.exists(input_pdf_path):
-      raise FileNotFoundError(f"Archivo PDF de entrada no encontrado en {input_pdf_path}")
+  _comprobar_origen(input_pdf_path, "Archivo PDF de entrada no encontrado")
 
   os.makedirs(output_directory, exist_ok=True)
 
+  assembler = None
   try:
-      reader = PdfReader(input_pdf_path)
-      num_pages = len(reader.pages)
+      assembler = open_page_assembler(input_pdf_path, backend)
+      num_pages = assembler.page_count
 
       if not (1 <= start_page <= num_pages and 1 <= end_page <= num_pages): 
           raise ValueError(
@@ -57,65 +343,257 @@ def split_pdf_by_range(input_pdf_path: str, output_directory: str, start_page: i
       if start_page > end_page:
           raise ValueError(f"La página de inicio ({start_page}) no puede ser mayor que la página final ({end_page}).")
 
-      writer = PdfWriter() 
-      
-      for i in range(start_page - 1, end_page): 
-          writer.add_page(reader.pages[i]) 
-      
-      base_name = os.path.splitext(os.path.basename(input_pdf_path))[0]
+      base_name = 'documento' if _en_memoria(input_pdf_path) else os.path.splitext(os.path.basename(input_pdf_path))[0]
       output_pdf_name = f"{base_name}_rango_{start_page}_a_{end_page}.pdf"
       output_pdf_path = os.path.join(output_directory, output_pdf_name)
 
-      with open(output_pdf_path, "wb") as output_file:
-          writer.write(output_file)
+      assembler.write_pages(range(start_page - 1, end_page), output_pdf_path)
       
       return output_pdf_path
 
-  except PdfReadError:
-      raise Exception(f"Error al leer el archivo PDF '{input_pdf_path}'. Podría estar corrupto o encriptado.")
+  except (PdfReadError, fitz.FileDataError):
+      raise Exception(f"Error al leer el archivo PDF '{_describir_origen(input_pdf_path)}'. Podría estar corrupto o encriptado.")
   except Exception as e:
       raise Exception(f"Error al dividir el PDF por rango: {str(e)}")
+  finally:
+      if assembler:
+          assembler.close()
+
+_worker_assembler = None
+
+def _init_part_worker(input_pdf_path: str, backend: str):
+  """Inicializa un proceso del pool abriendo el PDF de origen una sola vez."""
+  global _worker_assembler
+  _worker_assembler = open_page_assembler(input_pdf_path, backend)
+
+def _render_part_in_worker(page_indices) -> bytes:
+  """Genera en un proceso del pool el PDF de una parte."""
+  return _render_part(_worker_assembler, page_indices)
+
+def _render_part(assembler, page_indices) -> bytes:
+  """Serializa en memoria el PDF con las páginas indicadas (índices 0-based)."""
+  buffer = io.BytesIO()
+  assembler.write_pages(page_indices, buffer)
+  return buffer.getvalue()
+
+def _iter_parts(assembler, input_pdf_path: str, parts_pages: list, backend: str, workers: int):
+  """
+  Entrega el contenido de cada parte en el mismo orden de parts_pages.
+
+  Con workers > 1 las partes se generan en un pool de procesos; cada proceso
+  abre el PDF de origen una vez y el orden de salida no depende del pool.
+  """
+  if workers <= 1 or len(parts_pages) <= 1:
+      for page_indices in parts_pages:
+          yield _render_part(assembler, page_indices)
+      return
+
+  chunksize = max(1, len(parts_pages) // (workers * 4))
+  with ProcessPoolExecutor(
+      max_workers=workers,
+      initializer=_init_part_worker,
+      initargs=(input_pdf_path, backend)
+  ) as pool:
+      yield from pool.map(_render_part_in_worker, parts_pages, chunksize=chunksize)
+
+ZIP_COMPRESSION_POLICIES = ('deflate', 'stored', 'auto')
+DEFAULT_ZIP_COMPRESSION = 'deflate'
+# Con 'auto' se guarda sin comprimir si deflate no baja la muestra de este ratio
+ZIP_AUTO_STORE_RATIO = 0.9
+ZIP_AUTO_SAMPLE_SIZE = 256 * 1024
 
-def zip_pdfs(input_pdf_path, output_dir, pages_per_file, original_filename_base):
-  """Divide un PDF en múltiples archivos y los comprime en un ZIP."""
+def parse_zip_compression(policy: str) -> tuple:
+  """
+  Interpreta una política de compresión ZIP.
+
+  Acepta 'stored', 'deflate', 'deflate:N' (nivel 0-9) o 'auto' (decide a partir
+  de la primera parte generada).
+
+  Returns:
+      tuple: (modo, nivel) con modo en ZIP_COMPRESSION_POLICIES y nivel int o None
+  """
+  policy = (policy or DEFAULT_ZIP_COMPRESSION).strip().lower()
+  mode, _, level = policy.partition(':')
+
+  if mode not in ZIP_COMPRESSION_POLICIES or (level and mode != 'deflate'):
+      raise ValueError(
+          f"Política de compresión inválida: {policy}. Use 'stored', 'deflate', 'deflate:N' o 'auto'."
+      )
+  if not level:
+      return mode, None
+  try:
+      compresslevel = int(level)
+  except ValueError:
+      raise ValueError(f"Nivel de compresión inválido: {level}. Debe ser un entero entre 0 y 9.")
+  if not 0 <= compresslevel <= 9:
+      raise ValueError(f"Nivel de compresión inválido: {level}. Debe ser un entero entre 0 y 9.")
+  return mode, compresslevel
+
+def _is_worth_deflating(sample: bytes) -> bool:
+  """Comprueba con una compresión rápida si deflate reduce una muestra de forma apreciable."""
+  sample = sample[:ZIP_AUTO_SAMPLE_SIZE]
+  if not sample:
+      return False
+  return len(zlib.compress(sample, 1)) < len(sample) * ZIP_AUTO_STORE_RATIO
+
+def _zip_entry(arcname: str, date_time: tuple, compress_type: int = zipfile.ZIP_DEFLATED) -> zipfile.ZipInfo:
+  """Crea la entrada ZIP de una parte con fecha fija para que la salida sea reproducible."""
+  info = zipfile.ZipInfo(arcname, date_time=date_time)
+  info.compress_type = compress_type
+  info.external_attr = 0o644 << 16
+  return info
+
+def _write_zip_parts(output, assembler, input_pdf_path: str, parts: list, backend: str, workers: int, compression: str = None):
+  """
+  Escribe en output un ZIP con una entrada por cada (nombre, páginas) de parts.
+
+  Cada parte se serializa en memoria y se agrega con writestr, sin archivos
+  temporales. Cede el control tras cada entrada para poder enviar el ZIP en
+  streaming mientras se genera.
+  """
+  mode, compresslevel = parse_zip_compression(compression)
+  # Fecha de las entradas tomada del PDF de origen: misma entrada, mismo ZIP
+  # (en memoria no hay fecha y se usa la mínima de ZIP)
+  if _en_memoria(input_pdf_path):
+      date_time = (1980, 1, 1, 0, 0, 0)
+  else:
+      date_time = time.localtime(os.path.getmtime(input_pdf_path))[:6]
+  parts_pages = [page_indices for _, page_indices in parts]
+
+  with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf:
+      part_data = _iter_parts(assembler, input_pdf_path, parts_pages, backend, workers)
+      for (arcname, _), data in zip(parts, part_data):
+          if mode == 'auto':
+              # La primera parte decide la política de todo el archivo
+              mode = 'deflate' if _is_worth_deflating(data) else 'stored'
+          compress_type = zipfile.ZIP_STORED if mode == 'stored' else zipfile.ZIP_DEFLATED
+          zf.writestr(_zip_entry(arcname, date_time, compress_type), data, compresslevel=compresslevel)
+          yield
+
+class _ZipStreamSink(io.RawIOBase):
+  """Destino no 'seekable' donde ZipFile escribe y del que se retiran los bytes por bloques."""
+
+  def __init__(self):
+      super().__init__()
+      self._chunks = []
+
+  def writable(self):
+      return True
+
+  def write(self, data):
+      self._chunks.append(bytes(data))
+      return len(data)
+
+  def drain(self) -> bytes:
+      data = b"".join(self._chunks)
+      self._chunks.clear()
+      return data
+
+class ZipStream:
+  """Iterable con los bloques de un ZIP generado al vuelo; libera el PDF de origen al cerrarse."""
+
+  def __init__(self, assembler, input_pdf_path: str, parts: list, backend: str, workers: int, compression: str = None):
+      self._assembler = assembler
+      self._generator = self._generate(input_pdf_path, parts, backend, workers, compression)
+
+  def _generate(self, input_pdf_path, parts, backend, workers, compression):
+      sink = _ZipStreamSink()
+      try:
+          for _ in _write_zip_parts(sink, self._assembler, input_pdf_path, parts, backend, workers, compression):
+              data = sink.drain()
+              if data:
+                  yield data
+          # Directorio central, escrito al cerrar el ZipFile
+          data = sink.drain()
+          if data:
+              yield data
+      finally:
+          self._assembler.close()
+
+  def __iter__(self):
+      return self._generator
+
+  def close(self):
+      self._generator.close()
+      self._assembler.close()
+
+def _plan_pages_per_file(total_pages: int, pages_per_file: int, original_filename_base: str) -> list:
+  """Calcula las partes (nombre, páginas) de una división por número de páginas."""
+  parts = []
+  for start_page in range(0, total_pages, pages_per_file):
+      end_page = min(start_page + pages_per_file, total_pages)
+      split_pdf_name = f"{original_filename_base}_parte_{start_page + 1}-{end_page}.pdf"
+      parts.append((split_pdf_name, range(start_page, end_page)))
+  return parts
+
+def zip_pdfs(input_pdf_path, output_dir, pages_per_file, original_filename_base, backend: str = None, workers: int = 1, compression: str = None,
+             progress=None):
+  """
+  Divide un PDF en múltiples archivos y los comprime en un ZIP.
+
+  Con workers > 1 las partes se generan en paralelo; el ZIP resultante es
+  idéntico byte a byte al generado en serie. compression acepta las políticas
+  de parse_zip_compression ('deflate' por defecto). progress recibe las partes
+  escritas (ver _con_progreso).
+  """
   if pages_per_file <= 0:
       raise ValueError("El número de páginas por archivo debe ser mayor que 0.")
+  parse_zip_compression(compression)
   
   os.makedirs(output_dir, exist_ok=True)
 
+  assembler = None
   try:
-      reader = PdfReader(input_pdf_path)
-      total_pages = len(reader.pages)
+      assembler = open_page_assembler(input_pdf_path, backend)
+      total_pages = assembler.page_count
       
       if total_pages == 0:
           raise ValueError("El PDF no contiene páginas.")
       
       zip_filename = os.path.join(output_dir, f"{original_filename_base}_split.zip")
+      parts = _plan_pages_per_file(total_pages, pages_per_file, original_filename_base)
       
-      with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zf:
-          for i in range(0, total_pages, pages_per_file):
-              writer = PdfWriter() 
-              start_page = i
-              end_page = min(i + pages_per_file, total_pages)  
-              
-              for page_num in range(start_page, end_page): 
-                  writer.add_page(reader.pages[page_num]) 
-              
-              split_pdf_name = f"{original_filename_base}_parte_{start_page + 1}-{end_page}.pdf" 
-              
-              temp_split_pdf_path = os.path.join(output_dir, split_pdf_name) 
-              with open(temp_split_pdf_path, "wb") as output_pdf: 
-                  writer.write(output_pdf) 
-              
-              zf.write(temp_split_pdf_path, arcname=split_pdf_name) 
-              
-              # Limpiar archivo temporal
-              os.remove(temp_split_pdf_path)
+      zip_parts = _write_zip_parts(zip_filename, assembler, input_pdf_path, parts, backend, workers, compression)
+      for _ in _con_progreso(zip_parts, len(parts), progress):
+          pass
               
       return zip_filename
   
   except Exception as e:
       raise Exception(f"Error al crear ZIP de PDFs divididos: {str(e)}")
+  finally:
+      if assembler:
+          assembler.close()
+
+def zip_pdfs_stream(input_pdf_path, pages_per_file, original_filename_base, backend: str = None, workers: int = 1, compression: str = None):
+  """
+  Igual que zip_pdfs, pero genera el ZIP al vuelo sin escribirlo en disco.
+
+  Las validaciones se hacen antes de devolver, de modo que los errores se
+  reportan antes de empezar a enviar la respuesta.
+
+  Returns:
+      tuple: (nombre del ZIP, ZipStream con los bloques del ZIP)
+  """
+  if pages_per_file <= 0:
+      raise ValueError("El número de páginas por archivo debe ser mayor que 0.")
+  parse_zip_compression(compression)
+
+  assembler = None
+  try:
+      assembler = open_page_assembler(input_pdf_path, backend)
+      total_pages = assembler.page_count
+
+      if total_pages == 0:
+          raise ValueError("El PDF no contiene páginas.")
+
+      parts = _plan_pages_per_file(total_pages, pages_per_file, original_filename_base)
+      return f"{original_filename_base}_split.zip", ZipStream(assembler, input_pdf_path, parts, backend, workers, compression)
+
+  except Exception as e:
+      if assembler:
+          assembler.close()
+      raise Exception(f"Error al crear ZIP de PDFs divididos: {str(e)}")
 
 def clean_filename(filename):
   """Limpia el nombre de archivo removiendo caracteres especiales."""
@@ -123,136 +601,627 @@ def clean_filename(filename):
   clean_name = "".join(c for c in name if c.isalnum() or c in (' ', '_', '-')).strip()
   return clean_name if clean_name else "archivo_sin_nombre"
 
-def comprimir_pdf(input_pdf_path: str, output_pdf_path: str) -> bool:
-  """Comprime un PDF reduciendo la calidad de las imágenes."""
-  if not os.path.exists(input_pdf_path):
-      raise FileNotFoundError(f"Archivo no encontrado: {input_pdf_path}")
+# Perfiles de compresión: opciones de rewrite_images, de subset_fonts y de save
+COMPRESSION_PROFILES = {
+  'fast': {
+      # Solo recomprime imágenes con pérdida y evita reescribir la estructura del PDF
+      'rewrite_images': {'dpi_threshold': 150, 'dpi_target': 96, 'quality': 80, 'lossless': False},
+      'subset_fonts': False,
+      'save': {'garbage': 1, 'deflate': True},
+  },
+  'balanced': {
+      'rewrite_images': {'dpi_threshold': 120, 'dpi_target': 60, 'quality': 75},
+      'subset_fonts': False,
+      'save': {'garbage': 3, 'deflate': True, 'use_objstms': True},
+  },
+  'max': {
+      'rewrite_images': {'dpi_threshold': 100, 'dpi_target': 50, 'quality': 60},
+      'subset_fonts': True,
+      'save': {
+          'garbage': 4, 'clean': True, 'deflate': True,
+          'deflate_images': True, 'deflate_fonts': True, 'use_objstms': True,
+      },
+  },
+}
+DEFAULT_COMPRESSION_PROFILE = 'balanced'
+
+def get_compression_profile(profile: str) -> dict:
+  """Devuelve las opciones de un perfil de compresión o lanza ValueError si no existe."""
+  profile = (profile or DEFAULT_COMPRESSION_PROFILE).lower()
+  if profile not in COMPRESSION_PROFILES:
+      raise ValueError(
+          f"Perfil de compresión desconocido: {profile}. Use uno de {', '.join(COMPRESSION_PROFILES)}."
+      )
+  return COMPRESSION_PROFILES[profile]
+
+# Imágenes que se envían a cada lote del pool; limita la memoria de las que están en vuelo
+COMPRESS_BATCH_PER_WORKER = 4
+
+_COLORSPACE_COMPONENTS = {
+  'DeviceGray': 1, 'CalGray': 1,
+  'DeviceRGB': 3, 'CalRGB': 3, 'Lab': 3,
+  'DeviceCMYK': 4,
+}
+
+def _image_components(doc, xref: int, cs_name: str) -> int:
+  """Número de componentes de color de la imagen xref (0 si no se puede saber)."""
+  if cs_name != 'ICCBased':
+      return _COLORSPACE_COMPONENTS.get(cs_name, 0)
+  kind, value = doc.xref_get_key(xref, 'ColorSpace')
+  if kind == 'xref':
+      value = doc.xref_object(int(value.split()[0]))
+  match = re.search(r'/ICCBased\s+(\d+)\s+0\s+R', value)
+  if match:
+      kind, n = doc.xref_get_key(int(match.group(1)), 'N')
+      if kind == 'int':
+          return int(n)
+  return 0
+
+def _effective_image_dpi(doc) -> dict:
+  """
+  Devuelve {xref: (dpi, info)} con la menor resolución efectiva con la que se dibuja
+  cada imagen, es decir, la de su aparición más grande en cualquier página.
+
+  Solo se leen los diccionarios de las imágenes (page.get_images y get_image_bbox);
+  page.get_image_info(xrefs=True) es mucho más lento porque decodifica cada imagen.
+  """
+  images = {}
+  for page in doc:
+      for item in page.get_images(full=True):
+          xref, smask, width, height, bpc, cs_name = item[:6]
+          try:
+              bbox = page.get_image_bbox(item)
+          except ValueError:
+              continue
+          if bbox.is_empty or bbox.is_infinite:
+              continue
+          dpi = min(width * 72 / bbox.width, height * 72 / bbox.height)
+          if xref in images and dpi >= images[xref][0]:
+              continue
+          info = images[xref][1] if xref in images else {
+              'width': width,
+              'height': height,
+              'bpc': bpc,
+              'colorspace': _image_components(doc, xref, cs_name),
+              'cs-name': cs_name,
+              'has-mask': doc.xref_get_key(xref, 'Mask')[0] != 'null',
+          }
+          images[xref] = (dpi, info)
+  return images
+
+def _image_analysis(doc) -> list:
+  """
+  Imágenes del documento en orden de xref con su resolución efectiva, sus datos,
+  su tamaño y si están comprimidas con pérdida (_LOSSY_IMAGE_FILTERS).
+  """
+  return [
+      {
+          'xref': xref, 'dpi': dpi, 'info': info, 'bytes': _stream_length(doc, xref),
+          'lossy': any(f in doc.xref_get_key(xref, 'Filter')[1] for f in _LOSSY_IMAGE_FILTERS),
+      }
+      for xref, (dpi, info) in sorted(_effective_image_dpi(doc).items())
+  ]
+
+def _is_recompressible_image(info: dict) -> bool:
+  """
+  Solo se recomprimen imágenes de 8 bits en gris o RGB sin paleta ni /Mask.
+
+  Una /SMask no lo impide: es otro objeto y se conserva, como en rewrite_images.
+  """
+  return (
+      info['bpc'] == 8
+      and info['colorspace'] in (1, 3)
+      and not info['has-mask']
+      and 'Indexed' not in info.get('cs-name', '')
+  )
+
+# Filtros con pérdida: rewrite_images los trata como imágenes "lossy" y el resto como "lossless"
+_LOSSY_IMAGE_FILTERS = ('/DCTDecode', '/JPXDecode')
+
+def _subsample_factor(dpi: float, dpi_threshold: float, dpi_target: float) -> int:
+  """
+  Factor de submuestreo de rewrite_images (FZ_SUBSAMPLE_AVERAGE): la mayor potencia
+  de 2 que deja la imagen por encima de dpi_target, solo si supera dpi_threshold.
+  """
+  factor = 1
+  if dpi_threshold and dpi > dpi_threshold:
+      while dpi / (factor * 2) > dpi_target:
+          factor *= 2
+  return factor
+
+def _recompress_image(task: tuple):
+  """
+  Submuestrea y recodifica una imagen como JPEG (se ejecuta en los procesos del pool).
+
+  Igual que rewrite_images: promedio de bloques factor x factor (tamaño redondeado
+  hacia arriba) y JPEG con la misma calidad y codificación. Devuelve (xref, bytes, ancho, alto) o
+  (xref, None, 0, 0) si el resultado no es más pequeño.
+  """
+  xref, data, factor, quality, mode = task
+  try:
+      with Image.open(io.BytesIO(data)) as image:
+          width = -(-image.width // factor)
+          height = -(-image.height // factor)
+          # En JPEG, draft() decodifica directamente a una escala reducida (1/2, 1/4, 1/8)
+          image.draft(mode, (width, height))
+          image = image.convert(mode)
+          if image.size != (width, height):
+              image = image.resize((width, height), Image.BOX)
+          output = io.BytesIO()
+          # Mismos parámetros que el codificador JPEG de MuPDF: progresivo y sin submuestreo de croma
+          image.save(output, 'JPEG', quality=quality, subsampling=0, progressive=True)
+  except Exception as e:
+      print(f"Advertencia: No se pudo recomprimir la imagen {xref}: {e}")
+      return xref, None, 0, 0
+
+  if output.tell() >= len(data):
+      return xref, None, 0, 0
+  return xref, output.getvalue(), width, height
+
+def _iter_image_tasks(doc, rewrite_options: dict, images: list = None):
+  """
+  Genera las tareas de _recompress_image para las mismas imágenes que trataría
+  doc.rewrite_images con rewrite_options: todas se recodifican con su calidad y
+  las que superan dpi_threshold además se submuestrean hacia dpi_target.
+
+  images es la lista 'images' de analizar_pdf_para_compresion; si no se pasa, se
+  vuelve a calcular la resolución efectiva de cada imagen.
+  """
+  dpi_threshold = rewrite_options.get('dpi_threshold') or 0
+  dpi_target = rewrite_options.get('dpi_target', 0) if dpi_threshold else 0
+  quality = rewrite_options['quality']
+  lossy = rewrite_options.get('lossy', True)
+  lossless = rewrite_options.get('lossless', True)
+
+  if images is None:
+      images = _image_analysis(doc)
+  for image in images:
+      xref, dpi, info = image['xref'], image['dpi'], image['info']
+      if not _is_recompressible_image(info):
+          continue
+      if not (lossy if image['lossy'] else lossless):
+          continue
+      data = doc.extract_image(xref)['image']
+      mode = 'RGB' if info['colorspace'] == 3 else 'L'
+      yield (xref, data, _subsample_factor(dpi, dpi_threshold, dpi_target), quality, mode)
+
+def _write_recompressed_image(doc, xref: int, data: bytes, width: int, height: int):
+  """Sustituye el flujo de la imagen xref por el JPEG recomprimido."""
+  doc.update_stream(xref, data, compress=0)
+  doc.xref_set_key(xref, 'Filter', '/DCTDecode')
+  doc.xref_set_key(xref, 'Width', str(width))
+  doc.xref_set_key(xref, 'Height', str(height))
+  doc.xref_set_key(xref, 'DecodeParms', 'null')
+
+def recomprimir_imagenes_paralelo(doc, rewrite_options: dict, workers: int = 1, images: list = None) -> int:
+  """
+  Equivalente a doc.rewrite_images para las imágenes de 8 bits en gris o RGB,
+  repartiendo el submuestreo y la codificación con Pillow entre varios procesos
+  con los mismos umbrales, factores y calidad JPEG que MuPDF. Las imágenes que
+  Pillow no puede recodificar igual (CMYK, con paleta, de 1 bit o con /Mask) se
+  dejan como están.
+
+  Las imágenes se procesan por lotes y se escriben en orden de xref, así que el
+  resultado es el mismo con cualquier número de workers. images reutiliza el
+  análisis de analizar_pdf_para_compresion para no recorrer otra vez las páginas.
+  Devuelve cuántas imágenes se sustituyeron.
+  """
+  tasks = _iter_image_tasks(doc, rewrite_options, images)
+  batch_size = max(1, workers) * COMPRESS_BATCH_PER_WORKER
+  replaced = 0
+
+  with ExitStack() as stack:
+      if workers > 1:
+          pool = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+          recompress = pool.map
+      else:
+          recompress = map
+
+      while True:
+          batch = [task for _, task in zip(range(batch_size), tasks)]
+          if not batch:
+              break
+          for xref, data, width, height in recompress(_recompress_image, batch):
+              if data is not None:
+                  _write_recompressed_image(doc, xref, data, width, height)
+                  replaced += 1
+  return replaced
+
+# Ahorro mínimo previsto (fracción del tamaño original) para que merezca la pena comprimir
+COMPRESS_MIN_SAVINGS = 0.05
+# Ahorro adicional previsto que justifica usar un perfil más costoso que otro más barato
+COMPRESS_PROFILE_TOLERANCE = 0.02
+# Fracción estimada que se ahorra al desinflar flujos sin comprimir
+COMPRESS_DEFLATE_SAVINGS = 0.5
+# Fracción estimada que se ahorra al reducir las fuentes incrustadas (subset_fonts)
+COMPRESS_FONT_SUBSET_SAVINGS = 0.5
+
+_FONT_FILE_SUBTYPES = ('/Type1C', '/CIDFontType0C', '/OpenType')
+
+def _stream_length(doc, xref: int) -> int:
+  """Longitud en bytes del flujo xref leída de /Length sin descomprimirlo."""
+  kind, value = doc.xref_get_key(xref, 'Length')
+  try:
+      if kind == 'int':
+          return int(value)
+      if kind == 'xref':
+          return int(doc.xref_object(int(value.split()[0])))
+  except ValueError:
+      pass
+  return len(doc.xref_stream_raw(xref) or b'')
+
+def analizar_pdf_para_compresion(doc, file_size: int) -> dict:
+  """
+  Pre-análisis barato de lo que puede reducir comprimir_pdf.
+
+  Recorre la tabla xref leyendo solo los diccionarios (no decodifica flujos) y las
+  imágenes de cada página con su resolución efectiva y su tamaño en bytes.
+  """
+  stream_bytes = 0
+  uncompressed_stream_bytes = 0
+  font_bytes = 0
+  for xref in range(1, doc.xref_length()):
+      if not doc.xref_is_stream(xref):
+          continue
+      length = _stream_length(doc, xref)
+      stream_bytes += length
+      subtype = doc.xref_get_key(xref, 'Subtype')[1]
+      if doc.xref_get_key(xref, 'Filter')[0] == 'null' and subtype != '/Image':
+          uncompressed_stream_bytes += length
+      if (doc.xref_get_key(xref, 'Length1')[0] != 'null'
+              or subtype in _FONT_FILE_SUBTYPES):
+          font_bytes += length
+
+  return {
+      'file_size': file_size,
+      'page_count': doc.page_count,
+      'object_count': doc.xref_length() - 1,
+      'stream_bytes': stream_bytes,
+      'uncompressed_stream_bytes': uncompressed_stream_bytes,
+      'font_bytes': font_bytes,
+      'images': _image_analysis(doc),
+  }
+
+def _predecir_ahorro(analysis: dict, options: dict) -> tuple:
+  """
+  Devuelve (ahorro en imágenes, ahorro total) previstos para un perfil.
+
+  Solo cuentan las imágenes que rewrite_images trata con las opciones del perfil:
+  con 'lossless': False no se tocan las Flate/PNG y con 'lossy': False las JPEG.
+  """
+  rewrite = options['rewrite_images']
+  lossy = rewrite.get('lossy', True)
+  lossless = rewrite.get('lossless', True)
+  image_savings = 0
+  for image in analysis['images']:
+      if not (lossy if image['lossy'] else lossless):
+          continue
+      if image['dpi'] > rewrite['dpi_threshold']:
+          scale = rewrite['dpi_target'] / image['dpi']
+          image_savings += int(image['bytes'] * (1 - scale * scale))
+
+  savings = image_savings + int(analysis['uncompressed_stream_bytes'] * COMPRESS_DEFLATE_SAVINGS)
+  if options['subset_fonts']:
+      savings += int(analysis['font_bytes'] * COMPRESS_FONT_SUBSET_SAVINGS)
+  return image_savings, min(savings, analysis['file_size'])
+
+def decidir_compresion(analysis: dict, profile: str = DEFAULT_COMPRESSION_PROFILE) -> dict:
+  """
+  Decide qué hacer a partir de analizar_pdf_para_compresion.
+
+  action es 'original' (devolver el archivo tal cual), 'structure' (solo guardar
+  con las opciones del perfil, sin reescribir imágenes) o 'rewrite'. profile puede
+  bajar a un perfil más barato de COMPRESSION_PROFILES que prevea el mismo ahorro
+  que el pedido (hasta COMPRESS_PROFILE_TOLERANCE menos); si se devuelve el
+  original, profile es el pedido.
+  """
+  requested = (profile or DEFAULT_COMPRESSION_PROFILE).lower()
+  get_compression_profile(requested)
+  file_size = max(1, analysis['file_size'])
+
+  # Los perfiles están ordenados de más barato a más costoso
+  candidates = list(COMPRESSION_PROFILES)[:list(COMPRESSION_PROFILES).index(requested) + 1]
+  predictions = {name: _predecir_ahorro(analysis, COMPRESSION_PROFILES[name]) for name in candidates}
+  best_savings = predictions[requested][1]
+  keep_original = best_savings < COMPRESS_MIN_SAVINGS * file_size
+  chosen = requested if keep_original else next(
+      name for name in candidates
+      if best_savings - predictions[name][1] <= COMPRESS_PROFILE_TOLERANCE * file_size
+  )
+  image_savings, savings = predictions[chosen]
+
+  if keep_original:
+      action = 'original'
+  elif image_savings == 0:
+      action = 'structure'
+  else:
+      action = 'rewrite'
+
+  return {
+      'action': action,
+      'profile': chosen,
+      'requested_profile': requested,
+      'predicted_size': file_size - savings,
+      'predicted_ratio': round((file_size - savings) / file_size, 3),
+  }
+
+# Pasos de comprimir_pdf que se informan en progress: análisis, imágenes y guardado
+COMPRESS_PROGRESS_STEPS = 3
+
+def comprimir_pdf(input_pdf_path: str, output_pdf_path: str, profile: str = DEFAULT_COMPRESSION_PROFILE,
+                  workers: int = 1, progress=None) -> dict:
+  """
+  Comprime un PDF reduciendo la calidad de las imágenes.
+
+  profile elige uno de COMPRESSION_PROFILES: 'fast', 'balanced' (por defecto) o 'max'.
+  Con workers > 1 las imágenes se recomprimen en paralelo con Pillow
+  (recomprimir_imagenes_paralelo) en lugar de con doc.rewrite_images.
+
+  Antes de comprimir se analiza el documento (decidir_compresion) y, si no se
+  espera ahorro o el resultado sale más grande, se copia el original. progress
+  recibe los pasos terminados de COMPRESS_PROGRESS_STEPS (ver _con_progreso).
+
+  Returns:
+      dict: La decisión tomada con el tamaño previsto y el obtenido (output_size)
+  """
+  _comprobar_origen(input_pdf_path)
+
+  get_compression_profile(profile)
+  input_size = _tamano_origen(input_pdf_path)
 
   try:
-      doc = fitz.open(input_pdf_path) 
+      doc = abrir_fitz(input_pdf_path) 
       
       # Verificar que el documento se abrió correctamente
       if doc.page_count == 0:
           raise ValueError("El PDF no contiene páginas.")
+
+      analysis = analizar_pdf_para_compresion(doc, input_size)
+      decision = decidir_compresion(analysis, profile)
+      print(f"Decisión de compresión: {decision}")
+      options = COMPRESSION_PROFILES[decision['profile']]
+      if progress:
+          progress(1, COMPRESS_PROGRESS_STEPS)
+
+      if decision['action'] == 'original':
+          doc.close()
+          _copiar_origen(input_pdf_path, output_pdf_path)
+          return dict(decision, output_size=input_size)
       
       # Reescribir imágenes con menor calidad
-      doc.rewrite_images(
-          dpi_threshold=120, 
-          dpi_target=60,    
-          quality=75         
-      )
+      if decision['action'] == 'rewrite':
+          if workers > 1:
+              replaced = recomprimir_imagenes_paralelo(
+                  doc, options['rewrite_images'], workers, images=analysis['images']
+              )
+              print(f"Imágenes recomprimidas en paralelo ({workers} procesos): {replaced}")
+          else:
+              doc.rewrite_images(**options['rewrite_images'])
+      if progress:
+          progress(2, COMPRESS_PROGRESS_STEPS)
+
+      # Reducir las fuentes incrustadas a los glifos usados
+      if options['subset_fonts']:
+          try:
+              doc.subset_fonts()
+          except Exception as e:
+              print(f"Advertencia: No se pudieron reducir las fuentes: {e}")
       
       # Guardar con compresión
-      doc.save( 
-          output_pdf_path,
-          garbage=3,          # Limpieza de objetos no utilizados
-          deflate=True,       # Compresión deflate
-          use_objstms=True    # Usar object streams
-      ) 
+      doc.save(output_pdf_path, **options['save']) 
       doc.close()
-      return True
+      if progress:
+          progress(3, COMPRESS_PROGRESS_STEPS)
+
+      output_size = os.path.getsize(output_pdf_path)
+      if output_size >= input_size:
+          print("El PDF comprimido no es más pequeño; se devuelve el original.")
+          _copiar_origen(input_pdf_path, output_pdf_path)
+          return dict(decision, action='original', output_size=input_size)
+      return dict(decision, output_size=output_size)
 
   except Exception as e:
       raise Exception(f"Error al comprimir el PDF: {e}")
 
-def rotar_pdf(input_pdf_path: str, output_pdf_path: str, page_rotations: dict) -> bool:
+def _reglas_desde_diccionario(page_rotations: dict, total_pages: int) -> list:
+  """Convierte {índice de página (desde 0): ángulo absoluto} en reglas de rotación."""
+  rules = []
+  ignored = 0
+  for page_index_str, angle_value in page_rotations.items():
+      try:
+          page_index = int(page_index_str)
+          angle = int(angle_value)
+      except (ValueError, TypeError):
+          ignored += 1
+          continue
+      if angle not in ROTATION_ANGLES or not 0 <= page_index < total_pages:
+          ignored += 1
+          continue
+      rules.append(([page_index + 1], angle, False))
+  if ignored:
+      print(f"Advertencia: {ignored} rotaciones con página o ángulo inválido (0, 90, 180 o 270) ignoradas.")
+  return rules
+
+def _rotacion_pagina(doc, index: int, xref: int, parents: dict) -> int:
+  """
+  Rotación de la página index (objeto xref) leyendo /Rotate de su diccionario o
+  del nodo del que la hereda, sin cargar la página. parents guarda la de los
+  nodos /Pages ya consultados.
+  """
+  visited = []
+  while True:
+      kind, value = doc.xref_get_key(xref, "Rotate")
+      if kind == "int":
+          rotation = int(value) % 360 if int(value) % 90 == 0 else 0
+          break
+      if kind != "null":
+          # Valor indirecto o no entero: MuPDF lo resuelve al cargar la página
+          rotation = doc[index].rotation
+          break
+      kind, value = doc.xref_get_key(xref, "Parent")
+      if kind != "xref":
+          rotation = 0
+          break
+      xref = int(value.split()[0])
+      if xref in parents:
+          rotation = parents[xref]
+          break
+      visited.append(xref)
+  for node in visited:
+      parents[node] = rotation
+  return rotation
+
+def rotar_pdf(input_pdf_path, output_pdf_path: str, page_rotations) -> bool:
+  """
+  Aplica rotaciones de página en una sola pasada y guarda el PDF de forma incremental.
 
-  if not os.path.exists(input_pdf_path):
-      raise FileNotFoundError(f"Archivo no encontrado: {input_pdf_path}")
+  page_rotations puede ser una especificación de reglas para
+  parse_rotation_specification ("all:+90", "1-500:+90, odd:180") o, como antes,
+  un dict {índice de página (desde 0): ángulo absoluto}. Las reglas se componen
+  en orden y solo se tocan las páginas cuya rotación final cambia.
+
+  Los diccionarios de página modificados se añaden al final del archivo con
+  anexar_actualizacion_incremental: unos cientos de bytes por página, sin leer
+  ni reescribir los streams. Si output_pdf_path es la misma ruta que la entrada
+  se añaden sobre ese archivo; si no, se copia primero la entrada. Los PDF
+  cifrados o reparados se guardan con saveIncr de MuPDF y, si tampoco es
+  posible, se reescriben completos.
+
+  Returns:
+      bool: True si se generó output_pdf_path
+  """
+  _comprobar_origen(input_pdf_path)
+  in_place = not _en_memoria(input_pdf_path) and os.path.abspath(input_pdf_path) == os.path.abspath(output_pdf_path)
   
   if not page_rotations:
       print("Advertencia: No se proporcionaron rotaciones de página. El PDF no será modificado.")
-      shutil.copy(input_pdf_path, output_pdf_path)
+      if not in_place:
+          _copiar_origen(input_pdf_path, output_pdf_path)
       return True
   
   doc = None
   try:
-      doc = fitz.open(input_pdf_path)
+      doc = abrir_fitz(input_pdf_path)
       print(f"PDF abierto correctamente. Total de páginas: {doc.page_count}")
       
       if doc.page_count == 0:
           raise ValueError("El PDF no contiene páginas. No se pueden aplicar rotaciones.")
-      
-      rotations_applied = 0
-      for page_index_str, angle_value in page_rotations.items():
-          try: 
-              page_index = int(page_index_str)  
-              angle = int(angle_value)
-              
-              # Validar ángulo de rotación
-              if angle not in [0, 90, 180, 270]:
-                  print(f"Advertencia: Ángulo {angle} no es válido para página {page_index}. Debe ser 0, 90, 180 o 270. Ignorando.")
-                  continue
-              
-              if 0 <= page_index < doc.page_count: 
-                  pagina = doc[page_index] 
-                  pagina.set_rotation(angle) 
-                  print(f"✓ Página {page_index + 1} rotada a {angle}°.")
-                  rotations_applied += 1
-              else:
-                  print(f"Advertencia: Índice de página {page_index} fuera de rango (0 a {doc.page_count - 1}). Ignorando rotación.")
-          except (ValueError, TypeError) as e:
-              print(f"Advertencia: Error al procesar rotación para página {page_index_str}: {e}. Ignorando.")
-              continue
 
-      if rotations_applied > 0: 
-          print(f"DEBUG: Rotaciones aplicadas > 0. Intentando guardar PDF.")
-          if doc.is_closed:
-              raise Exception("El documento PDF ya está cerrado antes de intentar guardar. Esto indica un problema previo.")
-          
-          doc.save(output_pdf_path,   
-                  garbage=4,           
-                  deflate=True,      
-                  clean=True,         
-                  pretty=False)       
-          print(f"DEBUG: doc.save() completado.")
-
-          if os.path.exists(output_pdf_path):
-              file_size = os.path.getsize(output_pdf_path)
-              print(f"✓ PDF guardado correctamente. Tamaño: {file_size} bytes")
-              return True
-          else:
-              print("❌ Error: El archivo de salida no se creó después de guardar.")
-              raise Exception("El PDF rotado no se pudo generar.")
+      if isinstance(page_rotations, dict):
+          rules = _reglas_desde_diccionario(page_rotations, doc.page_count)
       else:
-          print("❌ No se aplicaron rotaciones válidas, no se generará un nuevo archivo PDF.")
-          shutil.copy(input_pdf_path, output_pdf_path)
+          rules = parse_rotation_specification(str(page_rotations), doc.page_count)
+
+      # Rotación final de cada página tocada por alguna regla, partiendo de la actual.
+      # Los xref de las páginas se leen antes de modificar nada: tras cualquier cambio
+      # MuPDF descarta su mapa de páginas y cada page_xref recorre el árbol de nuevo
+      page_xrefs, current, targets, parents = {}, {}, {}, {}
+      for pages, angle, relative in rules:
+          for page in pages:
+              index = page - 1
+              if index not in current:
+                  page_xrefs[index] = doc.page_xref(index)
+                  current[index] = _rotacion_pagina(doc, index, page_xrefs[index], parents)
+              base = targets.get(index, current[index])
+              targets[index] = (base + angle) % 360 if relative else angle % 360
+
+      # /Rotate se escribe directamente en el diccionario de la página: cargar cada
+      # página (doc[i], set_rotation) cuesta más que todo lo demás
+      changed_xrefs = []
+      for index in sorted(targets):
+          if current[index] != targets[index]:
+              doc.xref_set_key(page_xrefs[index], "Rotate", str(targets[index]))
+              changed_xrefs.append(page_xrefs[index])
+      print(f"✓ {len(changed_xrefs)} páginas rotadas ({len(targets) - len(changed_xrefs)} sin cambios).")
+
+      if not in_place:
+          _copiar_origen(input_pdf_path, output_pdf_path)
+      if not changed_xrefs:
           print("PDF original copiado al destino de salida.")
-          return True 
+          return True
+
+      written = None
+      if puede_actualizar_incrementalmente(doc):
+          try:
+              written = anexar_actualizacion_incremental(doc, output_pdf_path, changed_xrefs)
+          except ValueError as e:
+              print(f"Advertencia: {e} Se guarda con MuPDF.")
+      if written is None:
+          _guardar_rotacion_con_mupdf(doc, output_pdf_path, changed_xrefs)
+      else:
+          print(f"✓ Actualización incremental añadida: {written} bytes")
+
+      file_size = os.path.getsize(output_pdf_path)
+      print(f"✓ PDF guardado correctamente. Tamaño: {file_size} bytes")
+      return True
+  except ValueError:
+      # Especificación o documento inválidos: no queda una copia a medias
+      _descartar_salida_rotada(doc, output_pdf_path, in_place)
+      raise
   except Exception as e:
       print(f"❌ ERROR CRÍTICO en rotar_pdf (catch principal): {e}")
       traceback.print_exc() 
+      _descartar_salida_rotada(doc, output_pdf_path, in_place)
       raise Exception(f"Error crítico al rotar el PDF: {e}")
   finally:
-      if doc and not doc.is_closed:
-          print("DEBUG: Cerrando documento PDF en finally.")
+      if doc is not None and not doc.is_closed:
           doc.close()
-      elif doc and doc.is_closed:
-          print("DEBUG: Documento PDF ya estaba cerrado en finally.")
-      else:
-          print("DEBUG: Documento PDF no inicializado o ya nulo en finally.")
 
-def extract_specific_pages(input_pdf_path: str, output_directory: str, pages_specification: str, original_filename_base: str):
+def _guardar_rotacion_con_mupdf(doc, output_pdf_path: str, xrefs: list):
+  """Guarda las páginas xrefs de doc en output_pdf_path (copia de la entrada) con MuPDF."""
+  if doc.name and os.path.abspath(doc.name) == os.path.abspath(output_pdf_path):
+      target = doc
+  else:
+      # saveIncr solo escribe sobre el archivo abierto: se repiten los cambios en la copia
+      target = fitz.open(output_pdf_path)
+      if target.needs_pass:
+          target.close()
+          raise ValueError("El PDF está protegido con contraseña. No se pueden aplicar rotaciones.")
+      for xref in xrefs:
+          target.xref_set_key(xref, "Rotate", doc.xref_get_key(xref, "Rotate")[1])
+  try:
+      if target.can_save_incrementally():
+          target.saveIncr()
+          return
+      print("Advertencia: el PDF no admite guardado incremental; se reescribe completo.")
+      temp_path = f"{output_pdf_path}.tmp"
+      target.save(temp_path, garbage=4, deflate=True, clean=True, pretty=False)
+  finally:
+      if target is not doc:
+          target.close()
+  if target is doc:
+      doc.close()
+  os.replace(temp_path, output_pdf_path)
+
+def _descartar_salida_rotada(doc, output_pdf_path: str, in_place: bool):
+  if doc is not None and not doc.is_closed:
+      doc.close()
+  # La propia entrada no se borra: anexar_actualizacion_incremental la deja como estaba si falla
+  if not in_place and os.path.exists(output_pdf_path):
+      os.remove(output_pdf_path)
+
+def extract_specific_pages(input_pdf_path: str, output_directory: str, pages_specification: str, original_filename_base: str, backend: str = None):
     """
     Extrae páginas específicas de un PDF y crea UN SOLO PDF con esas páginas.
     
     Args:
-        input_pdf_path: Ruta del PDF de entrada
+        input_pdf_path: Ruta del PDF de entrada o su contenido en bytes
         output_directory: Directorio donde guardar el archivo resultante
         pages_specification: Especificación de páginas como "1, 3-5, 9"
         original_filename_base: Nombre base para el archivo de salida
+        backend: Motor de ensamblado de páginas ('fitz' o 'pypdf2')
     
     Returns:
         str: Ruta del PDF generado con las páginas extraídas
     """
-    if not os.path.exists(input_pdf_path):
-        raise FileNotFoundError(f"Archivo PDF de entrada no encontrado en {input_pdf_path}")
+    _comprobar_origen(input_pdf_path, "Archivo PDF de entrada no encontrado")
 
     os.makedirs(output_directory, exist_ok=True)
 
+    assembler = None
     try:
-        reader = PdfReader(input_pdf_path)
-        total_pages = len(reader.pages)
+        assembler = open_page_assembler(input_pdf_path, backend)
+        total_pages = assembler.page_count
         
         if total_pages == 0:
             raise ValueError("El PDF no contiene páginas.")
@@ -262,87 +1231,178 @@ def extract_specific_pages(input_pdf_path: str, output_directory: str, pages_spe
         if not page_numbers:
             raise ValueError("No se especificaron páginas válidas.")
 
-        writer = PdfWriter() 
-        
-        # Agregar páginas en el orden especificado
-        for page_num in page_numbers:
-            writer.add_page(reader.pages[page_num - 1])  # -1 porque las páginas son 0-indexed
-        
         # Crear nombre del archivo de salida
         pages_str = pages_specification.replace(" ", "").replace(",", "_")
         output_pdf_name = f"{original_filename_base}_paginas_{pages_str}.pdf"
         output_pdf_path = os.path.join(output_directory, output_pdf_name)
         
-        # Guardar el PDF
-        with open(output_pdf_path, "wb") as output_file:
-            writer.write(output_file)
+        # Guardar el PDF con las páginas en el orden especificado (-1 porque las páginas son 0-indexed)
+        assembler.write_pages([page_num - 1 for page_num in page_numbers], output_pdf_path)
         
         return output_pdf_path
 
     except Exception as e:
         raise Exception(f"Error al extraer páginas específicas: {str(e)}")
+    finally:
+        if assembler:
+            assembler.close()
+
+def _plan_page_groups(total_pages: int, pages_specification: str, original_filename_base: str) -> list:
+    """Calcula las partes (nombre, páginas) de una extracción por grupos separados por comas."""
+    page_groups = [group.strip() for group in pages_specification.split(',')]
+    
+    if not page_groups:
+        raise ValueError("No se especificaron grupos de páginas válidos.")
 
-def extract_specific_pages_to_zip(input_pdf_path: str, output_directory: str, pages_specification: str, original_filename_base: str):
+    parts = []
+    for i, group in enumerate(page_groups, 1):
+        page_numbers = parse_page_specification(group, total_pages)
+        
+        if not page_numbers:
+            continue  # Saltar grupos inválidos
+        
+        group_str = group.replace(" ", "").replace("-", "_")
+        pdf_filename = f"{original_filename_base}_grupo_{i}_paginas_{group_str}.pdf"
+        parts.append((pdf_filename, [page_num - 1 for page_num in page_numbers]))
+    return parts
+
+def extract_specific_pages_to_zip(input_pdf_path: str, output_directory: str, pages_specification: str, original_filename_base: str, backend: str = None, workers: int = 1, compression: str = None,
+                                  progress=None):
     """
     Extrae páginas específicas de un PDF y crea PDFs SEPARADOS por cada grupo (separado por comas) en un ZIP.
     
     Args:
-        input_pdf_path: Ruta del PDF de entrada
+        input_pdf_path: Ruta del PDF de entrada o su contenido en bytes
         output_directory: Directorio donde guardar el archivo ZIP resultante
         pages_specification: Especificación de páginas como "1, 3-5, 8" (cada grupo separado por coma será un PDF)
         original_filename_base: Nombre base para los archivos de salida
+        backend: Motor de ensamblado de páginas ('fitz' o 'pypdf2')
+        workers: Procesos usados para generar los PDFs de cada grupo
+        compression: Política de compresión del ZIP ('deflate', 'deflate:N', 'stored' o 'auto')
+        progress: Recibe los grupos escritos (ver _con_progreso)
     
     Returns:
         str: Ruta del archivo ZIP generado con todos los PDFs
     """
-    if not os.path.exists(input_pdf_path):
-        raise FileNotFoundError(f"Archivo PDF de entrada no encontrado en {input_pdf_path}")
+    _comprobar_origen(input_pdf_path, "Archivo PDF de entrada no encontrado")
+    parse_zip_compression(compression)
 
     os.makedirs(output_directory, exist_ok=True)
 
+    assembler = None
     try:
-        reader = PdfReader(input_pdf_path)
-        total_pages = len(reader.pages)
+        assembler = open_page_assembler(input_pdf_path, backend)
+        total_pages = assembler.page_count
         
         if total_pages == 0:
             raise ValueError("El PDF no contiene páginas.")
 
-        page_groups = [group.strip() for group in pages_specification.split(',')]
-        
-        if not page_groups:
-            raise ValueError("No se especificaron grupos de páginas válidos.")
+        parts = _plan_page_groups(total_pages, pages_specification, original_filename_base)
 
         zip_filename = f"{original_filename_base}_paginas_separadas.zip"
         zip_path = os.path.join(output_directory, zip_filename)
         
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for i, group in enumerate(page_groups, 1):
-                page_numbers = parse_page_specification(group, total_pages)
-                
-                if not page_numbers:
-                    continue  # Saltar grupos inválidos
-                
-                writer = PdfWriter()
-                
-                # Agregar páginas del grupo actual
-                for page_num in page_numbers:
-                    writer.add_page(reader.pages[page_num - 1])
-                
-                group_str = group.replace(" ", "").replace("-", "_")
-                pdf_filename = f"{original_filename_base}_grupo_{i}_paginas_{group_str}.pdf"
-                
-                temp_pdf_path = os.path.join(output_directory, pdf_filename)
-                with open(temp_pdf_path, "wb") as temp_file:
-                    writer.write(temp_file)
-                
-                # Agregar al ZIP y eliminar archivo temporal
-                zipf.write(temp_pdf_path, pdf_filename)
-                os.remove(temp_pdf_path)
+        # Cada grupo se serializa en memoria y se agrega directamente al ZIP
+        zip_parts = _write_zip_parts(zip_path, assembler, input_pdf_path, parts, backend, workers, compression)
+        for _ in _con_progreso(zip_parts, len(parts), progress):
+            pass
         
         return zip_path
 
     except Exception as e:
         raise Exception(f"Error al extraer páginas específicas: {str(e)}")
+    finally:
+        if assembler:
+            assembler.close()
+
+def extract_specific_pages_to_zip_stream(input_pdf_path: str, pages_specification: str, original_filename_base: str, backend: str = None, workers: int = 1, compression: str = None):
+    """
+    Igual que extract_specific_pages_to_zip, pero genera el ZIP al vuelo sin escribirlo en disco.
+    
+    Returns:
+        tuple: (nombre del ZIP, ZipStream con los bloques del ZIP)
+    """
+    _comprobar_origen(input_pdf_path, "Archivo PDF de entrada no encontrado")
+    parse_zip_compression(compression)
+
+    assembler = None
+    try:
+        assembler = open_page_assembler(input_pdf_path, backend)
+        total_pages = assembler.page_count
+        
+        if total_pages == 0:
+            raise ValueError("El PDF no contiene páginas.")
+
+        parts = _plan_page_groups(total_pages, pages_specification, original_filename_base)
+        zip_filename = f"{original_filename_base}_paginas_separadas.zip"
+        return zip_filename, ZipStream(assembler, input_pdf_path, parts, backend, workers, compression)
+
+    except Exception as e:
+        if assembler:
+            assembler.close()
+        raise Exception(f"Error al extraer páginas específicas: {str(e)}")
+
+# Ángulos de /Rotate admitidos y giro de una regla de rotación sin ángulo
+ROTATION_ANGLES = (0, 90, 180, 270)
+DEFAULT_ROTATION_DELTA = 90
+
+def parse_rotation_specification(rotation_spec: str, total_pages: int) -> list:
+    """
+    Parsea reglas de rotación como "all:+90", "1-500:+90, odd:180" o "even".
+
+    Cada regla es una selección de páginas seguida de ":" y un ángulo, absoluto
+    ("180") o relativo a la rotación que tenga la página en ese momento ("+90",
+    "-90"). La selección usa la gramática de parse_page_specification ("1, 3-5")
+    o las palabras all, even y odd; los elementos separados por comas se acumulan
+    hasta el que lleva el ángulo, de modo que "1, 3-5:+90" gira las páginas 1, 3,
+    4 y 5. Una selección final sin ángulo gira DEFAULT_ROTATION_DELTA grados. Las
+    reglas también se pueden separar con ";".
+
+    Args:
+        rotation_spec: Especificación de reglas
+        total_pages: Total de páginas en el PDF
+
+    Returns:
+        list: Una tupla (páginas, ángulo, es_relativo) por regla, en orden
+    """
+    keywords = {
+        'all': range(1, total_pages + 1),
+        'even': range(2, total_pages + 1, 2),
+        'odd': range(1, total_pages + 1, 2),
+    }
+    rules = []
+    pages = []
+
+    for part in re.split(r'[,;]', rotation_spec):
+        part = part.strip()
+        if not part:
+            continue
+        selection, has_angle, angle_spec = part.partition(':')
+        selection = selection.strip().lower()
+        if selection in keywords:
+            pages.extend(keywords[selection])
+        elif selection:
+            pages.extend(parse_page_specification(selection, total_pages))
+        if not has_angle:
+            continue
+
+        angle_spec = angle_spec.strip()
+        try:
+            angle = int(angle_spec)
+        except ValueError:
+            raise ValueError(f"Ángulo de rotación inválido: {part}. Use por ejemplo '90', '+90' o '-90'.")
+        if angle % 90:
+            raise ValueError(f"Ángulo de rotación inválido: {part}. Debe ser múltiplo de 90.")
+        if not pages:
+            raise ValueError(f"La regla de rotación {part} no indica páginas.")
+        rules.append((list(dict.fromkeys(pages)), angle, angle_spec[0] in '+-'))
+        pages = []
+
+    if pages:
+        rules.append((list(dict.fromkeys(pages)), DEFAULT_ROTATION_DELTA, True))
+    if not rules:
+        raise ValueError("No se indicó ninguna regla de rotación.")
+    return rules
 
 def parse_page_specification(pages_spec: str, total_pages: int) -> list:
     """
@@ -405,14 +1465,99 @@ def parse_page_specification(pages_spec: str, total_pages: int) -> list:
     
     return unique_pages
 
-def remover_contraseña_pdf(input_pdf_path: str, output_pdf_path: str, password: str) -> bool:
+# Motores de desbloqueo: 'fitz' guarda el documento entero sin cifrado en una sola
+# pasada de MuPDF; 'pages' copia las páginas a un PDF nuevo con open_page_assembler
+UNLOCK_ENGINES = ('fitz', 'pages')
+DEFAULT_UNLOCK_ENGINE = 'fitz'
+# garbage de doc.save al desbloquear con fitz (0 = conservar todos los objetos, 1 = quitar los no usados)
+UNLOCK_GARBAGE = 1
+
+def desbloquear_pdf(input_pdf_path, output_pdf_path: str, password: str, doc=None, backend: str = None,
+                    engine: str = None) -> dict:
+    """
+    Desbloquea un PDF abriéndolo una sola vez.
+
+    Con el mismo documento PyMuPDF (doc si ya está abierto, o uno nuevo) se
+    comprueba el cifrado, se autentica y se genera la salida: con engine 'fitz'
+    se guarda el documento completo con encryption=PDF_ENCRYPT_NONE, que conserva
+    marcadores, formularios y metadatos; con 'pages' se copian las páginas. MuPDF
+    no permite guardar de forma incremental si cambia el cifrado, así que siempre
+    se escribe el archivo completo. Solo el motor de páginas pypdf2 vuelve a
+    abrir el archivo. Si el documento lo abre esta función se cierra al
+    terminar; un doc recibido lo sigue cerrando el llamador (puede reintentar la
+    autenticación con él si la contraseña era incorrecta).
+
+    Returns:
+        dict: is_encrypted, auth (0 contraseña incorrecta, 1 usuario, 2 propietario;
+        None si no está cifrado), total_pages, output_path (None si no se generó
+        la salida) y engine (motor que generó la salida)
+
+    Raises:
+        ValueError: Si el motor no existe o el PDF no contiene páginas
+    """
+    engine = (engine or DEFAULT_UNLOCK_ENGINE).lower()
+    if engine not in UNLOCK_ENGINES:
+        raise ValueError(f"Motor de desbloqueo desconocido: {engine}. Use uno de {', '.join(UNLOCK_ENGINES)}.")
+
+    owns_doc = doc is None
+    if owns_doc:
+        doc = abrir_fitz(input_pdf_path)
+    try:
+        result = {
+            'is_encrypted': doc.xref_get_key(-1, "Encrypt")[0] != "null",
+            'auth': None,
+            'total_pages': 0,
+            'output_path': None,
+            'engine': engine,
+        }
+        if not result['is_encrypted']:
+            return result
+
+        auth = doc.authenticate(password)
+        result['auth'] = 0 if auth == 0 else (2 if auth & 4 else 1)
+        if result['auth'] == 0:
+            return result
+
+        result['total_pages'] = doc.page_count
+        if doc.page_count == 0:
+            raise ValueError("El PDF no contiene páginas válidas")
+
+        output_dir = os.path.dirname(output_pdf_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        if engine == 'fitz':
+            try:
+                doc.save(output_pdf_path, encryption=fitz.PDF_ENCRYPT_NONE, garbage=UNLOCK_GARBAGE, no_new_id=True)
+                return dict(result, output_path=output_pdf_path)
+            except Exception as e:
+                print(f"Advertencia: MuPDF no pudo guardar el PDF sin cifrado ({e}); se copian las páginas.")
+                result['engine'] = 'pages'
+
+        if (backend or DEFAULT_PAGE_BACKEND).lower() == 'fitz':
+            FitzPageAssembler.from_document(doc).write_pages(range(doc.page_count), output_pdf_path, skip_broken_pages=True)
+        else:
+            remover_contraseña_pdf(input_pdf_path, output_pdf_path, password, backend=backend, engine='pages')
+        return dict(result, output_path=output_pdf_path)
+    finally:
+        if owns_doc:
+            doc.close()
+
+def remover_contraseña_pdf(input_pdf_path: str, output_pdf_path: str, password: str, backend: str = None,
+                           engine: str = None) -> bool:
     """
     Remueve la contraseña de un PDF protegido y genera una versión sin encriptación.
     
+    Con engine 'fitz' (por defecto) se usa desbloquear_pdf, que guarda el
+    documento sin cifrado y, si MuPDF no puede guardarlo, copia las páginas; con
+    'pages' se copian las páginas con open_page_assembler.
+
     Args:
         input_pdf_path: Ruta del PDF con contraseña
         output_pdf_path: Ruta donde guardar el PDF sin contraseña
         password: Contraseña del PDF
+        backend: Motor de ensamblado de páginas del motor 'pages' ('fitz' o 'pypdf2')
+        engine: Motor de desbloqueo ('fitz' o 'pages')
     
     Returns:
         bool: True si se removió la contraseña exitosamente
@@ -422,22 +1567,38 @@ def remover_contraseña_pdf(input_pdf_path: str, output_pdf_path: str, password:
         ValueError: Si la contraseña es incorrecta o el PDF no está encriptado
         Exception: Para otros errores durante el procesamiento
     """
-    if not os.path.exists(input_pdf_path):
-        raise FileNotFoundError(f"Archivo PDF no encontrado: {input_pdf_path}")
+    _comprobar_origen(input_pdf_path, "Archivo PDF no encontrado")
     
     if not password or not password.strip():
         raise ValueError("La contraseña no puede estar vacía")
+
+    engine = (engine or DEFAULT_UNLOCK_ENGINE).lower()
+    if engine not in UNLOCK_ENGINES:
+        raise ValueError(f"Motor de desbloqueo desconocido: {engine}. Use uno de {', '.join(UNLOCK_ENGINES)}.")
+
+    if engine == 'fitz':
+        try:
+            result = desbloquear_pdf(input_pdf_path, output_pdf_path, password, backend=backend, engine=engine)
+        except fitz.FileDataError as e:
+            raise Exception(f"El archivo no es un PDF válido: {e}")
+        if not result['is_encrypted']:
+            raise ValueError("El PDF no está protegido con contraseña")
+        if result['auth'] == 0:
+            raise ValueError("Contraseña incorrecta. No se pudo desencriptar el PDF")
+        print(f"✓ PDF desencriptado con el motor {result['engine']} ({'propietario' if result['auth'] == 2 else 'usuario'})")
+        return True
     
+    assembler = None
     try:
         # Intentar abrir el PDF
-        reader = PdfReader(input_pdf_path)
+        assembler = open_page_assembler(input_pdf_path, backend)
         
         # Verificar si el PDF está encriptado
-        if not reader.is_encrypted:
+        if not assembler.is_encrypted:
             raise ValueError("El PDF no está protegido con contraseña")
         
         # Intentar desencriptar con la contraseña proporcionada
-        decrypt_result = reader.decrypt(password)
+        decrypt_result = assembler.decrypt(password)
         
         if decrypt_result == 0:
             raise ValueError("Contraseña incorrecta. No se pudo desencriptar el PDF")
@@ -447,36 +1608,23 @@ def remover_contraseña_pdf(input_pdf_path: str, output_pdf_path: str, password:
             print("✓ PDF desencriptado exitosamente (contraseña de propietario)")
         
         # Verificar que el PDF tiene páginas
-        total_pages = len(reader.pages)
+        total_pages = assembler.page_count
         if total_pages == 0:
             raise ValueError("El PDF no contiene páginas válidas")
         
         print(f"PDF desencriptado: {total_pages} páginas encontradas")
         
-        # Crear un nuevo PDF sin encriptación
-        writer = PdfWriter()
-        
-        # Copiar todas las páginas al nuevo PDF
-        for page_num in range(total_pages):
-            try:
-                page = reader.pages[page_num]
-                writer.add_page(page)
-            except Exception as e:
-                print(f"Advertencia: Error al procesar página {page_num + 1}: {e}")
-                continue
-        
-        # Verificar que se agregaron páginas
-        if len(writer.pages) == 0:
-            raise Exception("No se pudieron procesar las páginas del PDF")
-        
         # Crear directorio de salida si no existe
         output_dir = os.path.dirname(output_pdf_path)
         if output_dir and not os.path.exists(output_dir):
             os.makedirs(output_dir, exist_ok=True)
         
-        # Guardar el PDF sin contraseña
-        with open(output_pdf_path, 'wb') as output_file:
-            writer.write(output_file)
+        # Copiar todas las páginas a un nuevo PDF sin encriptación
+        pages_written = assembler.write_pages(range(total_pages), output_pdf_path, skip_broken_pages=True)
+        
+        # Verificar que se agregaron páginas
+        if pages_written == 0:
+            raise Exception("No se pudieron procesar las páginas del PDF")
         
         # Verificar que el archivo se creó correctamente
         if not os.path.exists(output_pdf_path):
@@ -487,7 +1635,7 @@ def remover_contraseña_pdf(input_pdf_path: str, output_pdf_path: str, password:
             raise Exception("El archivo de salida está vacío")
         
         print(f"✓ PDF sin contraseña guardado exitosamente")
-        print(f"  - Páginas procesadas: {len(writer.pages)}")
+        print(f"  - Páginas procesadas: {pages_written}")
         print(f"  - Tamaño del archivo: {file_size} bytes")
         print(f"  - Ubicación: {output_pdf_path}")
         
@@ -501,6 +1649,9 @@ def remover_contraseña_pdf(input_pdf_path: str, output_pdf_path: str, password:
         else:
             raise Exception(f"Error al leer el PDF: {e}")
     
+    except fitz.FileDataError as e:
+        raise Exception(f"El archivo no es un PDF válido: {e}")
+    
     except ValueError as e:
         # Re-lanzar errores de validación tal como están
         raise e
@@ -509,13 +1660,17 @@ def remover_contraseña_pdf(input_pdf_path: str, output_pdf_path: str, password:
         print(f"❌ ERROR en remover_contraseña_pdf: {e}")
         traceback.print_exc()
         raise Exception(f"Error inesperado al remover contraseña: {e}")
+    
+    finally:
+        if assembler:
+            assembler.close()
 
 def verificar_pdf_protegido(input_pdf_path: str) -> dict:
     """
     Verifica si un PDF está protegido con contraseña y devuelve información sobre su estado.
     
     Args:
-        input_pdf_path: Ruta del archivo PDF
+        input_pdf_path: Ruta del archivo PDF o su contenido en bytes
     
     Returns:
         dict: Información sobre el estado del PDF
@@ -536,15 +1691,15 @@ def verificar_pdf_protegido(input_pdf_path: str) -> dict:
     }
     
     try:
-        if not os.path.exists(input_pdf_path):
+        if not _en_memoria(input_pdf_path) and not os.path.exists(input_pdf_path):
             result['error'] = "Archivo no encontrado"
             return result
         
         # Obtener tamaño del archivo
-        result['file_size'] = os.path.getsize(input_pdf_path)
+        result['file_size'] = _tamano_origen(input_pdf_path)
         
         # Intentar leer el PDF
-        reader = PdfReader(input_pdf_path)
+        reader = PdfReader(io.BytesIO(input_pdf_path) if _en_memoria(input_pdf_path) else input_pdf_path)
         
         # Verificar si está encriptado
         result['is_encrypted'] = reader.is_encrypted
@@ -566,6 +1721,483 @@ def verificar_pdf_protegido(input_pdf_path: str) -> dict:
         result['error'] = f"Error inesperado: {str(e)}"
         return result
 
+# Sondeo rápido (check_pdf_status): solo se leen el trailer y las entradas del
+# xref de los objetos necesarios, sin recorrer el árbol de páginas
+PROBE_TAIL_SIZE = 2048
+PROBE_MAX_SECTIONS = 32
+PROBE_CACHE_SIZE = 256
+
+_STARTXREF_RE = re.compile(rb'startxref\s+(\d+)')
+_OBJ_HEADER_RE = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj')
+_XREF_SUBSECTION_RE = re.compile(rb'\s*(\d+)\s+(\d+)[ \t]*\r?\n?')
+_XREF_ENTRY_RE = re.compile(rb'(\d{10}) (\d{5}) ([nf])')
+
+_probe_cache = OrderedDict()
+_probe_cache_lock = threading.Lock()
+
+class _SondeoFallido(Exception):
+    """La estructura del PDF no se puede leer sin un análisis completo."""
+
+def _nivel_superior(dictionary: bytes) -> bytes:
+    """Copia de un diccionario << ... >> con los diccionarios anidados vaciados."""
+    parts, depth, last = [], 0, 0
+    for match in re.finditer(rb'<<|>>', dictionary):
+        if match.group() == b'<<':
+            depth += 1
+            if depth == 2:
+                parts.append(dictionary[last:match.end()])
+        else:
+            if depth == 2:
+                last = match.start()
+            depth -= 1
+    parts.append(dictionary[last:])
+    return b''.join(parts)
+
+def _clave_pdf(data: bytes, key: str):
+    """Posición del valor de /key en el nivel superior del diccionario, o None."""
+    match = re.search(rb'/' + key.encode() + rb'(?![A-Za-z0-9])\s*', data)
+    return match.end() if match else None
+
+def _valor_entero(data: bytes, key: str):
+    """Entero directo asociado a /key en un diccionario, o None."""
+    data = _nivel_superior(data)
+    pos = _clave_pdf(data, key)
+    if pos is None:
+        return None
+    match = re.match(rb'(\d+)(?![\d.])(?!\s+\d+\s+R)', data[pos:])
+    return int(match.group(1)) if match else None
+
+def _valor_referencia(data: bytes, key: str):
+    """Número de objeto de una referencia indirecta /key n g R, o None."""
+    data = _nivel_superior(data)
+    pos = _clave_pdf(data, key)
+    if pos is None:
+        return None
+    match = re.match(rb'(\d+)\s+\d+\s+R', data[pos:])
+    return int(match.group(1)) if match else None
+
+def _valor_lista(data: bytes, key: str):
+    """Lista de enteros /key [a b c], o None."""
+    data = _nivel_superior(data)
+    pos = _clave_pdf(data, key)
+    if pos is None:
+        return None
+    match = re.match(rb'\[([\d\s]*)\]', data[pos:])
+    return [int(n) for n in match.group(1).split()] if match else None
+
+def _tiene_clave(data: bytes, key: str) -> bool:
+    return _clave_pdf(_nivel_superior(data), key) is not None
+
+def _leer_diccionario(data: bytes, pos: int) -> tuple:
+    """Devuelve (diccionario << ... >> que empieza en pos, posición siguiente)."""
+    while pos < len(data) and data[pos] in b' \t\r\n\f\x00':
+        pos += 1
+    if data[pos:pos + 2] != b'<<':
+        raise _SondeoFallido("Diccionario esperado")
+
+    start, depth, i = pos, 0, pos
+    while i < len(data):
+        if data[i:i + 2] == b'<<':
+            depth += 1
+            i += 2
+        elif data[i:i + 2] == b'>>':
+            depth -= 1
+            i += 2
+            if depth == 0:
+                return data[start:i], i
+        elif data[i:i + 1] == b'(':
+            # Cadena literal: puede contener << o >> y paréntesis escapados o anidados
+            nivel, i = 1, i + 1
+            while i < len(data) and nivel:
+                if data[i:i + 1] == b'\\':
+                    i += 1
+                elif data[i:i + 1] == b'(':
+                    nivel += 1
+                elif data[i:i + 1] == b')':
+                    nivel -= 1
+                i += 1
+        elif data[i:i + 1] == b'<':
+            i = data.index(b'>', i) + 1
+        else:
+            i += 1
+    raise _SondeoFallido("Diccionario sin cerrar")
+
+def _decodificar_stream(dictionary: bytes, raw: bytes) -> bytes:
+    """Aplica FlateDecode y el predictor PNG de un stream de xref u objetos."""
+    top = _nivel_superior(dictionary)
+    pos = _clave_pdf(top, 'Filter')
+    match = re.match(rb'\[[^\]]*\]|/\w+', top[pos:]) if pos is not None else None
+    filters = re.findall(rb'/(\w+)', match.group()) if match else []
+    if filters and filters != [b'FlateDecode']:
+        raise _SondeoFallido(f"Filtro no soportado: {filters}")
+    data = zlib.decompress(raw) if filters else raw
+
+    pos = _clave_pdf(dictionary, 'DecodeParms')
+    params = _leer_diccionario(dictionary, pos)[0] if pos is not None and dictionary[pos:pos + 2] == b'<<' else b''
+    predictor = _valor_entero(params, 'Predictor') or 1
+    if predictor == 1:
+        return data
+    if predictor < 10:
+        raise _SondeoFallido(f"Predictor no soportado: {predictor}")
+
+    columns = _valor_entero(params, 'Columns') or 1
+    previous = bytearray(columns)
+    rows = []
+    for start in range(0, len(data) - columns, columns + 1):
+        kind, row = data[start], bytearray(data[start + 1:start + 1 + columns])
+        if kind == 1:
+            for i in range(1, columns):
+                row[i] = (row[i] + row[i - 1]) & 0xFF
+        elif kind == 2:
+            for i in range(columns):
+                row[i] = (row[i] + previous[i]) & 0xFF
+        elif kind != 0:
+            raise _SondeoFallido(f"Filtro PNG no soportado: {kind}")
+        rows.append(bytes(row))
+        previous = row
+    return b''.join(rows)
+
+class _LectorPdf:
+    """Lecturas por posición sobre una ruta o un contenido en memoria."""
+
+    def __init__(self, file_obj, size: int):
+        self.file_obj = file_obj
+        self.size = size
+
+    def read(self, offset: int, length: int) -> bytes:
+        if not 0 <= offset < self.size:
+            raise _SondeoFallido(f"Posición fuera del archivo: {offset}")
+        self.file_obj.seek(offset)
+        return self.file_obj.read(length)
+
+    def read_object(self, offset: int, num: int = None) -> tuple:
+        """Devuelve (diccionario, datos del stream o None) del objeto en offset."""
+        length = 4096
+        while True:
+            data = self.read(offset, length)
+            match = _OBJ_HEADER_RE.match(data)
+            if not match or (num is not None and int(match.group(1)) != num):
+                raise _SondeoFallido(f"No se encontró el objeto esperado en la posición {offset}")
+            try:
+                dictionary, end = _leer_diccionario(data, match.end())
+                break
+            except (_SondeoFallido, ValueError):
+                if len(data) < length:
+                    raise
+                length *= 4
+
+        stream = re.match(rb'\s*stream\r?\n', data[end:])
+        if not stream:
+            return dictionary, None
+        stream_length = _valor_entero(dictionary, 'Length')
+        if stream_length is None:
+            raise _SondeoFallido("Stream sin /Length directo")
+        start = offset + end + stream.end()
+        return dictionary, self.read(start, stream_length)
+
+class _SeccionXref:
+    """Una sección del xref (tabla clásica o stream) con su trailer."""
+
+    def __init__(self, lector: _LectorPdf, offset: int):
+        self.lector = lector
+        head = lector.read(offset, 16)
+        if head.lstrip().startswith(b'xref'):
+            self._leer_tabla(offset + head.index(b'xref') + 4)
+        else:
+            self._leer_stream(offset)
+
+    def _leer_tabla(self, pos: int):
+        self.subsections = []
+        while True:
+            data = self.lector.read(pos, 64)
+            if data.lstrip().startswith(b'trailer'):
+                data = self.lector.read(pos, 4096)
+                self.trailer, _ = _leer_diccionario(data, data.index(b'trailer') + 7)
+                self.kind = 'table'
+                return
+            match = _XREF_SUBSECTION_RE.match(data)
+            if not match:
+                raise _SondeoFallido("Tabla xref dañada")
+            first, count = int(match.group(1)), int(match.group(2))
+            # Las entradas miden 20 bytes: solo se leen las que se buscan
+            entries = pos + match.end()
+            self.subsections.append((first, count, entries))
+            pos = entries + 20 * count
+
+    def _leer_stream(self, offset: int):
+        dictionary, raw = self.lector.read_object(offset)
+        if raw is None or b'/XRef' not in dictionary:
+            raise _SondeoFallido("Stream xref esperado")
+        self.trailer = dictionary
+        self.kind = 'stream'
+        self.widths = _valor_lista(dictionary, 'W')
+        index = _valor_lista(dictionary, 'Index') or [0, _valor_entero(dictionary, 'Size') or 0]
+        if not self.widths or len(self.widths) != 3 or len(index) % 2:
+            raise _SondeoFallido("Stream xref dañado")
+        # Se decodifica al buscar el primer objeto: un PDF cifrado no lo necesita
+        self.raw = raw
+        self.rows = None
+        self.row_size = sum(self.widths)
+        self.subsections = []
+        row = 0
+        for first, count in zip(index[::2], index[1::2]):
+            self.subsections.append((first, count, row))
+            row += count
+
+    def buscar(self, num: int):
+        """('offset', posición), ('objstm', stream, índice), ('free',) o None si no está."""
+        for first, count, start in self.subsections:
+            if not first <= num < first + count:
+                continue
+            if self.kind == 'table':
+                match = _XREF_ENTRY_RE.match(self.lector.read(start + 20 * (num - first), 20))
+                if not match:
+                    raise _SondeoFallido("Entrada xref dañada")
+                return ('offset', int(match.group(1))) if match.group(3) == b'n' else ('free',)
+
+            if self.rows is None:
+                self.rows = _decodificar_stream(self.trailer, self.raw)
+            pos = (start + num - first) * self.row_size
+            row = self.rows[pos:pos + self.row_size]
+            if len(row) < self.row_size:
+                raise _SondeoFallido("Stream xref incompleto")
+            fields, pos = [], 0
+            for width in self.widths:
+                fields.append(int.from_bytes(row[pos:pos + width], 'big'))
+                pos += width
+            kind = fields[0] if self.widths[0] else 1
+            if kind == 1:
+                return ('offset', fields[1])
+            if kind == 2:
+                return ('objstm', fields[1], fields[2])
+            return ('free',)
+        return None
+
+def _buscar_objeto(lector: _LectorPdf, sections: list, num: int) -> bytes:
+    """Diccionario del objeto num, buscando desde la sección más reciente."""
+    for section in sections:
+        entry = section.buscar(num)
+        if entry is None:
+            continue
+        if entry[0] == 'offset':
+            return lector.read_object(entry[1], num)[0]
+        if entry[0] == 'objstm':
+            stream_dict, raw = lector.read_object(_buscar_offset(sections, entry[1]), entry[1])
+            data = _decodificar_stream(stream_dict, raw)
+            first = _valor_entero(stream_dict, 'First')
+            header = data[:first].split()
+            offsets = dict(zip(map(int, header[::2]), map(int, header[1::2])))
+            if first is None or num not in offsets:
+                raise _SondeoFallido(f"Objeto {num} no encontrado en su stream")
+            return _leer_diccionario(data, first + offsets[num])[0]
+        break
+    raise _SondeoFallido(f"Objeto {num} no encontrado")
+
+def _buscar_offset(sections: list, num: int) -> int:
+    for section in sections:
+        entry = section.buscar(num)
+        if entry is not None:
+            if entry[0] != 'offset':
+                break
+            return entry[1]
+    raise _SondeoFallido(f"Objeto {num} no encontrado")
+
+def _leer_secciones(lector: _LectorPdf) -> tuple:
+    """Devuelve (posición del último startxref, secciones del xref desde la más reciente)."""
+    tail = lector.read(max(0, lector.size - PROBE_TAIL_SIZE), PROBE_TAIL_SIZE)
+    matches = _STARTXREF_RE.findall(tail)
+    if not matches:
+        raise _SondeoFallido("startxref no encontrado")
+
+    # Secciones desde la más reciente siguiendo /Prev (y /XRefStm en archivos híbridos)
+    startxref = int(matches[-1])
+    sections, pending, seen = [], [startxref], set()
+    while pending and len(sections) < PROBE_MAX_SECTIONS:
+        offset = pending.pop(0)
+        if offset in seen:
+            continue
+        seen.add(offset)
+        section = _SeccionXref(lector, offset)
+        sections.append(section)
+        pending = [n for n in (_valor_entero(section.trailer, 'XRefStm'), _valor_entero(section.trailer, 'Prev')) if n is not None] + pending
+    return startxref, sections
+
+def _sondear_estructura(file_obj, size: int) -> dict:
+    """Lee /Encrypt del trailer y /Count del nodo raíz de páginas sin un análisis completo."""
+    lector = _LectorPdf(file_obj, size)
+    _, sections = _leer_secciones(lector)
+
+    trailer = sections[0].trailer
+    if _tiene_clave(trailer, 'Encrypt'):
+        return {'is_encrypted': True, 'total_pages': 0}
+
+    root = _valor_referencia(trailer, 'Root')
+    if root is None:
+        raise _SondeoFallido("Trailer sin /Root")
+    pages = _valor_referencia(_buscar_objeto(lector, sections, root), 'Pages')
+    if pages is None:
+        raise _SondeoFallido("Catálogo sin /Pages")
+    count = _valor_entero(_buscar_objeto(lector, sections, pages), 'Count')
+    if count is None:
+        raise _SondeoFallido("Nodo de páginas sin /Count")
+    return {'is_encrypted': False, 'total_pages': count}
+
+def _hash_origen(source) -> str:
+    digest = hashlib.sha256()
+    if _en_memoria(source):
+        digest.update(source)
+    else:
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+def sondear_pdf_protegido(input_pdf_path, content_hash: str = None) -> dict:
+    """
+    Igual que verificar_pdf_protegido, pero leyendo solo el trailer y la cola del xref.
+
+    Busca /Encrypt en el trailer y el /Count del nodo /Pages del catálogo; si el
+    xref está dañado o usa algo que el sondeo no interpreta, recurre a
+    verificar_pdf_protegido. Los resultados se memorizan por SHA-256 del contenido
+    (los últimos PROBE_CACHE_SIZE); content_hash evita recalcularlo si el llamador
+    ya lo tiene. La clave 'method' indica cómo se obtuvo: 'trailer', 'full' o 'cache'.
+    """
+    if not _en_memoria(input_pdf_path) and not os.path.exists(input_pdf_path):
+        return dict(verificar_pdf_protegido(input_pdf_path), method='full')
+
+    key = content_hash or _hash_origen(input_pdf_path)
+    with _probe_cache_lock:
+        cached = _probe_cache.get(key)
+        if cached is not None:
+            _probe_cache.move_to_end(key)
+            return dict(cached, method='cache')
+
+    size = _tamano_origen(input_pdf_path)
+    try:
+        with _abrir_binario(input_pdf_path) as file_obj:
+            probe = _sondear_estructura(file_obj, size)
+        result = {
+            'is_encrypted': probe['is_encrypted'],
+            'total_pages': probe['total_pages'],
+            'file_size': size,
+            'needs_password': probe['is_encrypted'],
+            'error': None,
+            'method': 'trailer',
+        }
+    except Exception as e:
+        print(f"Sondeo rápido no disponible ({e}); se analiza el PDF completo.")
+        result = dict(verificar_pdf_protegido(input_pdf_path), method='full')
+
+    if not result['error']:
+        with _probe_cache_lock:
+            _probe_cache[key] = result
+            while len(_probe_cache) > PROBE_CACHE_SIZE:
+                _probe_cache.popitem(last=False)
+    return result
+
+# Actualización incremental: los objetos modificados se añaden al final del archivo
+# con una tabla xref clásica y un trailer que apunta con /Prev a la sección anterior
+INCREMENTAL_TRAILER_KEYS = ('Root', 'Info', 'ID')
+
+def _generacion_objeto(lector: _LectorPdf, sections: list, num: int) -> int:
+    """Generación vigente del objeto num (0 si está en un stream de objetos)."""
+    for section in sections:
+        entry = section.buscar(num)
+        if entry is None:
+            continue
+        if entry[0] == 'objstm':
+            return 0
+        if entry[0] == 'offset':
+            match = _OBJ_HEADER_RE.match(lector.read(entry[1], 64))
+            if not match or int(match.group(1)) != num:
+                raise _SondeoFallido(f"No se encontró el objeto esperado en la posición {entry[1]}")
+            return int(match.group(2))
+        break
+    raise _SondeoFallido(f"Objeto {num} no encontrado")
+
+def puede_actualizar_incrementalmente(doc) -> bool:
+    """
+    True si los cambios de doc se pueden añadir con anexar_actualizacion_incremental.
+
+    Los PDF cifrados quedan fuera (los objetos añadidos tendrían que cifrarse con
+    la clave del documento) y también los que MuPDF tuvo que reparar al abrirlos,
+    porque sus posiciones del xref no son fiables.
+    """
+    return (not doc.is_encrypted and doc.xref_get_key(-1, "Encrypt")[0] == "null"
+            and not doc.is_repaired)
+
+def anexar_actualizacion_incremental(doc, pdf_path: str, xrefs) -> int:
+    """
+    Añade al final de pdf_path los objetos xrefs de doc como actualización incremental.
+
+    doc es un documento PyMuPDF abierto con el mismo contenido que pdf_path en el
+    que se modificaron los objetos xrefs (p. ej. con xref_set_key). Se escribe
+    cada objeto con su generación vigente, una tabla xref clásica (la entrada
+    del objeto 0 y una subsección por tramo de números consecutivos) y un
+    trailer con /Size, /Root, /Info, /ID y /Prev. Del archivo solo se leen la
+    cola del xref y la cabecera de esos objetos; lo demás no se toca. Si la
+    escritura falla, el archivo se trunca a su tamaño original.
+
+    Returns:
+        int: Bytes añadidos
+
+    Raises:
+        ValueError: Si el documento no admite este tipo de actualización
+    """
+    if not puede_actualizar_incrementalmente(doc):
+        raise ValueError("El PDF está cifrado o dañado: no admite una actualización incremental propia.")
+    xrefs = sorted(set(xrefs))
+    if not xrefs:
+        return 0
+
+    with open(pdf_path, 'r+b') as pdf_file:
+        size = pdf_file.seek(0, os.SEEK_END)
+        lector = _LectorPdf(pdf_file, size)
+        try:
+            prev, sections = _leer_secciones(lector)
+            generations = {xref: _generacion_objeto(lector, sections, xref) for xref in xrefs}
+        except _SondeoFallido as e:
+            raise ValueError(f"No se pudo leer el xref del PDF: {e}")
+
+        update = bytearray()
+        if lector.read(size - 1, 1) not in (b'\n', b'\r'):
+            update += b'\n'
+        offsets = {}
+        for xref in xrefs:
+            offsets[xref] = size + len(update)
+            update += f"{xref} {generations[xref]} obj\n{doc.xref_object(xref, compressed=True)}\nendobj\n".encode('latin-1')
+
+        # Como en los ejemplos de la especificación, la tabla empieza por la entrada
+        # del objeto 0: algunos lectores interpretan una primera subsección que no
+        # empieza en 0 como una tabla mal numerada
+        xref_offset = size + len(update)
+        update += b'xref\n0 1\n0000000000 65535 f\r\n'
+        start = 0
+        while start < len(xrefs):
+            end = start + 1
+            while end < len(xrefs) and xrefs[end] == xrefs[end - 1] + 1:
+                end += 1
+            update += f"{xrefs[start]} {end - start}\n".encode('ascii')
+            for xref in xrefs[start:end]:
+                update += f"{offsets[xref]:010d} {generations[xref]:05d} n\r\n".encode('ascii')
+            start = end
+
+        trailer = [f"/Size {doc.xref_length()}"]
+        for key in INCREMENTAL_TRAILER_KEYS:
+            kind, value = doc.xref_get_key(-1, key)
+            if kind != "null":
+                trailer.append(f"/{key} {value}")
+        trailer.append(f"/Prev {prev}")
+        update += f"trailer\n<<{' '.join(trailer)}>>\nstartxref\n{xref_offset}\n%%EOF\n".encode('latin-1')
+
+        try:
+            pdf_file.seek(size)
+            pdf_file.write(update)
+        except Exception:
+            pdf_file.truncate(size)
+            raise
+    return len(update)
+
 def get_page_size(size_str):
     """Retorna el tamaño de página de ReportLab a partir de un string."""
     sizes = {
@@ -614,7 +2246,202 @@ def calcular_posicion_y_tamano(img_width, img_height, page_width, page_height, m
 
     return x, y, draw_width, draw_height
 
-def convert_images_to_pdf_with_options(image_paths: list, output_path: str, page_size: str, orientation: str, margins: str, fit_mode: str):
+def parse_target_dpi(value):
+    """Convierte el parámetro target_dpi en entero positivo o None (resolución original)."""
+    if value in (None, '', 'original'):
+        return None
+    try:
+        target_dpi = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Valor inválido para la resolución objetivo: {value}.")
+    if target_dpi <= 0:
+        raise ValueError(f"Valor inválido para la resolución objetivo: {value}.")
+    return target_dpi
+
+def _reducir_imagen(img, target_size):
+    """
+    Reduce img a target_size usando las vías rápidas de Pillow.
+
+    img debe estar recién abierta (sin decodificar) para que draft() pueda pedir al
+    decodificador JPEG una escala 1/2, 1/4 o 1/8; después reduce() hace un
+    promediado entero por bloques y solo el último ajuste usa LANCZOS.
+    """
+    img.draft(img.mode if img.mode in ('RGB', 'L') else 'RGB', target_size)
+    if img.mode not in ('RGB', 'L', 'RGBA', 'LA'):
+        img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+    factor = min(img.width // target_size[0], img.height // target_size[1])
+    if factor > 1:
+        img = img.reduce(factor)
+    if img.size != target_size:
+        img = img.resize(target_size, Image.LANCZOS)
+    return img
+
+IMAGE_BACKENDS = ('fitz', 'reportlab')
+# Formatos (y modos, None = cualquiera) que cada motor incrusta sin recodificar
+IMAGE_PASSTHROUGH_FORMATS = {
+    'reportlab': {'JPEG': ('RGB', 'L')},
+    'fitz': {'JPEG': ('RGB', 'L'), 'PNG': None},
+}
+
+def _preparar_imagen_para_pdf(image_path, page_width, page_height, margin_value, fit_mode, target_dpi=None,
+                              backend='reportlab'):
+    """
+    Devuelve (bytes de imagen, x, y, draw_width, draw_height) listos para dibujar sin pasar por disco.
+
+    Las imágenes que no hay que reducir y que el motor incrusta tal cual
+    (IMAGE_PASSTHROUGH_FORMATS: JPEG en RGB o gris, y también PNG con fitz) se
+    entregan sin recodificar. El resto se decodifica, se aplana sobre
+    fondo blanco si tiene transparencia y se codifica como JPEG en memoria. Con
+    target_dpi, las imágenes con más píxeles de los que caben a esa resolución en
+    su tamaño de dibujo se reducen con _reducir_imagen.
+    """
+    with Image.open(io.BytesIO(image_path) if _en_memoria(image_path) else image_path) as img:
+        # Calcular posición y tamaño usando la nueva función
+        x, y, draw_width, draw_height = calcular_posicion_y_tamano(
+            img_width=img.width,
+            img_height=img.height,
+            page_width=page_width,
+            page_height=page_height,
+            margin_value=margin_value,
+            fit_mode=fit_mode
+        )
+
+        target_size = None
+        if target_dpi:
+            size = (max(1, round(draw_width * target_dpi / 72)), max(1, round(draw_height * target_dpi / 72)))
+            if size[0] < img.width and size[1] < img.height:
+                target_size = size
+
+        passthrough_modes = IMAGE_PASSTHROUGH_FORMATS[backend].get(img.format, ())
+        if target_size is None and (passthrough_modes is None or img.mode in passthrough_modes):
+            if _en_memoria(image_path):
+                return bytes(image_path), x, y, draw_width, draw_height
+            with open(image_path, 'rb') as image_file:
+                return image_file.read(), x, y, draw_width, draw_height
+
+        converted = _reducir_imagen(img, target_size) if target_size else img
+
+        # Si tiene transparencia, colocar fondo blanco
+        if converted.mode in ("RGBA", "LA") or (converted.mode == "P" and 'transparency' in converted.info):
+            rgba = converted.convert("RGBA")
+            converted = Image.new("RGB", rgba.size, (255, 255, 255))
+            converted.paste(rgba, mask=rgba.getchannel("A"))
+            rgba.close()
+        elif converted.mode not in ("RGB", "L"):
+            converted = converted.convert("RGB")
+        elif converted is img:
+            # Copia decodificada, porque img se cierra al salir del with
+            converted = img.copy()
+
+    buffer = io.BytesIO()
+    converted.save(buffer, "JPEG")
+    converted.close()
+    return buffer.getvalue(), x, y, draw_width, draw_height
+
+# Imágenes preparadas por adelantado por cada proceso del pool de imagen a PDF
+IMAGE_LOOKAHEAD_PER_WORKER = 2
+
+def _iter_imagenes_preparadas(image_paths: list, layout: tuple, target_dpi, workers: int, backend: str):
+    """
+    Entrega (image_path, resultado o excepción) en el mismo orden de image_paths.
+
+    Con workers > 1 las imágenes se preparan (decodificar, aplanar, reducir y codificar)
+    en un pool de procesos mientras el hilo principal dibuja. Como mucho hay
+    workers * IMAGE_LOOKAHEAD_PER_WORKER imágenes en vuelo, así la memoria no
+    crece con el número de imágenes.
+    """
+    if workers <= 1 or len(image_paths) <= 1:
+        for image_path in image_paths:
+            try:
+                yield image_path, _preparar_imagen_para_pdf(image_path, *layout, target_dpi, backend)
+            except Exception as e:
+                yield image_path, e
+        return
+
+    lookahead = workers * IMAGE_LOOKAHEAD_PER_WORKER
+    pending = deque()
+    paths = iter(image_paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for image_path in paths:
+            pending.append((image_path, pool.submit(_preparar_imagen_para_pdf, image_path, *layout, target_dpi, backend)))
+            if len(pending) < lookahead:
+                continue
+            image_path, future = pending.popleft()
+            try:
+                yield image_path, future.result()
+            except Exception as e:
+                yield image_path, e
+
+        while pending:
+            image_path, future = pending.popleft()
+            try:
+                yield image_path, future.result()
+            except Exception as e:
+                yield image_path, e
+
+def elegir_backend_imagenes(image_paths: list) -> str:
+    """'fitz' si todas las imágenes legibles son JPEG o PNG; si no, 'reportlab'."""
+    for image_path in image_paths:
+        try:
+            with Image.open(io.BytesIO(image_path) if _en_memoria(image_path) else image_path) as img:
+                if img.format not in ('JPEG', 'PNG'):
+                    return 'reportlab'
+        except Exception:
+            continue
+    return 'fitz'
+
+def _dibujar_con_reportlab(prepared_images, output_path: str, page_width, page_height):
+    c = canvas.Canvas(output_path, pagesize=(page_width, page_height))
+    for image_path, prepared in prepared_images:
+        if isinstance(prepared, Exception):
+            print(f"Error procesando {_describir_origen(image_path)}: {prepared}")
+            continue
+
+        data, x, y, draw_width, draw_height = prepared
+        c.drawImage(ImageReader(io.BytesIO(data)), x, y, width=draw_width, height=draw_height)
+        c.showPage()
+    c.save()
+
+def _dibujar_con_fitz(prepared_images, output_path: str, page_width, page_height):
+    """Inserta cada imagen con page.insert_image(stream=...), sin recodificarla."""
+    doc = fitz.open()
+    try:
+        for image_path, prepared in prepared_images:
+            if isinstance(prepared, Exception):
+                print(f"Error procesando {_describir_origen(image_path)}: {prepared}")
+                continue
+
+            data, x, y, draw_width, draw_height = prepared
+            page = doc.new_page(width=page_width, height=page_height)
+            # reportlab mide y desde abajo; fitz, desde arriba
+            top = page_height - y - draw_height
+            page.insert_image(fitz.Rect(x, top, x + draw_width, top + draw_height), stream=data)
+
+        if doc.page_count == 0:
+            raise ValueError("No se pudo procesar ninguna imagen.")
+        doc.save(output_path, garbage=1, deflate=True, no_new_id=True)
+    finally:
+        doc.close()
+
+def convert_images_to_pdf_with_options(image_paths: list, output_path: str, page_size: str, orientation: str, margins: str, fit_mode: str,
+                                       target_dpi: int = None, workers: int = 1, backend: str = None, progress=None):
+    """
+    Crea un PDF con una imagen por página.
+
+    Las imágenes se preparan de una en una, así que en memoria solo hay una imagen
+    decodificada a la vez (ver _preparar_imagen_para_pdf); con workers > 1 se
+    preparan en paralelo con una ventana acotada (_iter_imagenes_preparadas) y se
+    dibujan en el orden original. target_dpi limita la resolución de las imágenes a
+    su tamaño en la página (None = resolución original).
+
+    backend es 'fitz' (PyMuPDF) o 'reportlab'; con None se usa fitz si todas las
+    imágenes son JPEG o PNG (elegir_backend_imagenes). progress recibe las imágenes
+    dibujadas (ver _con_progreso).
+    """
+    backend = (backend or elegir_backend_imagenes(image_paths)).lower()
+    if backend not in IMAGE_BACKENDS:
+        raise ValueError(f"Motor de imagen a PDF desconocido: {backend}. Use uno de {', '.join(IMAGE_BACKENDS)}.")
+
     try:
         page_width, page_height = get_page_size(page_size)
         
@@ -622,43 +2449,15 @@ def convert_images_to_pdf_with_options(image_paths: list, output_path: str, page
             page_width, page_height = page_height, page_width
 
         margin_value = get_margins(margins)
-        c = canvas.Canvas(output_path, pagesize=(page_width, page_height))
-        
-        for image_path in image_paths:
-            try:
-                img = Image.open(image_path)
-                
-                # Si tiene transparencia, colocar fondo blanco
-                if img.mode in ("RGBA", "LA"):
-                    background = Image.new("RGB", img.size, (255, 255, 255))
-                    background.paste(img, mask=img.split()[3])
-                    img = background
-                elif img.mode != "RGB":
-                    img = img.convert("RGB")
-                
-                temp_path = image_path + "_temp.jpg"
-                img.save(temp_path, "JPEG")
-
-                # Calcular posición y tamaño usando la nueva función
-                x, y, draw_width, draw_height = calcular_posicion_y_tamano(
-                    img_width=img.width,
-                    img_height=img.height,
-                    page_width=page_width,
-                    page_height=page_height,
-                    margin_value=margin_value,
-                    fit_mode=fit_mode
-                )
-
-                c.drawImage(temp_path, x, y, width=draw_width, height=draw_height)
-                c.showPage()
+        layout = (page_width, page_height, margin_value, fit_mode)
+        prepared_images = _con_progreso(
+            _iter_imagenes_preparadas(image_paths, layout, target_dpi, workers, backend), len(image_paths), progress
+        )
 
-            except Exception as e:
-                print(f"Error procesando {image_path}: {e}")
-            finally:
-                if 'img' in locals() and img:
-                    img.close()
-        
-        c.save()
+        if backend == 'fitz':
+            _dibujar_con_fitz(prepared_images, output_path, page_width, page_height)
+        else:
+            _dibujar_con_reportlab(prepared_images, output_path, page_width, page_height)
         return output_path
 
     except Exception as e:
@@ -0,0 +1,117 @@
+"""
+Documentos abiertos entre check_pdf_status y el POST de desbloqueo.
+
+Cuando check_pdf_status detecta un PDF cifrado deja el documento PyMuPDF abierto
+en esta caché, asociado al navegador (un token en una cookie firmada) y al
+SHA-256 del archivo. Si el desbloqueo del mismo archivo llega desde el mismo
+navegador antes de PDF_HANDLE_CACHE_TTL segundos, desbloquear_pdf reutiliza ese
+documento en lugar de volver a analizarlo. Cada documento se usa una sola vez,
+solo se guardan los PDF que llegaron en memoria (hasta
+FILE_UPLOAD_MAX_MEMORY_SIZE) y como mucho PDF_HANDLE_CACHE_MAX_ENTRIES a la vez.
+La caché es local al proceso: si el desbloqueo lo atiende otro proceso, el
+archivo simplemente se vuelve a abrir.
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+HANDLE_COOKIE = 'pdf_handle'
+HANDLE_COOKIE_SALT = 'Editor.handles'
+
+
+class DocumentHandleCache:
+    """Documentos abiertos por clave, con caducidad y límite de entradas (LRU)."""
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, key: str, doc):
+        """Guarda doc; los documentos desplazados o caducados se cierran."""
+        evicted = []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                evicted.append(previous[0])
+            self._entries[key] = (doc, time.monotonic() + self.ttl)
+            evicted.extend(self._purge_locked())
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[1][0])
+        self._close(evicted)
+
+    def pop(self, key: str):
+        """Saca el documento de key si sigue vigente; quien lo recibe debe cerrarlo."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            evicted = self._purge_locked()
+            if entry is not None and entry[1] < time.monotonic():
+                evicted.append(entry[0])
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        self._close(evicted)
+        return entry[0] if entry else None
+
+    def _purge_locked(self) -> list:
+        now = time.monotonic()
+        expired = [key for key, (_, expires) in self._entries.items() if expires < now]
+        return [self._entries.pop(key)[0] for key in expired]
+
+    @staticmethod
+    def _close(docs):
+        for doc in docs:
+            try:
+                doc.close()
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+_handle_cache = None
+_handle_cache_lock = threading.Lock()
+
+
+def get_handle_cache():
+    """Devuelve la caché de documentos del proceso, o None si está desactivada."""
+    global _handle_cache
+    ttl = getattr(settings, 'PDF_HANDLE_CACHE_TTL', 120)
+    if not ttl:
+        return None
+    with _handle_cache_lock:
+        if _handle_cache is None:
+            _handle_cache = DocumentHandleCache(ttl, getattr(settings, 'PDF_HANDLE_CACHE_MAX_ENTRIES', 32))
+        return _handle_cache
+
+
+def make_key(token: str, content_hash: str) -> str:
+    return f"{token}:{content_hash}"
+
+
+def get_token(request):
+    """Token del navegador guardado en la cookie firmada, o None."""
+    return request.get_signed_cookie(HANDLE_COOKIE, default=None, salt=HANDLE_COOKIE_SALT)
+
+
+def get_or_create_token(request) -> str:
+    """Token del navegador, o uno nuevo si todavía no tiene (hay que guardarlo con set_token)."""
+    return get_token(request) or secrets.token_urlsafe(16)
+
+
+def set_token(response, token: str):
+    """Guarda el token del navegador en la cookie firmada de la respuesta."""
+    response.set_signed_cookie(
+        HANDLE_COOKIE, token, salt=HANDLE_COOKIE_SALT,
+        max_age=getattr(settings, 'PDF_HANDLE_CACHE_TTL', 120), httponly=True, samesite='Lax'
+    )
@@ -0,0 +1,344 @@
+"""
+Cola de trabajos en segundo plano para las operaciones pesadas.
+
+Los trabajos se registran en la tabla PDFJob (SQLite) y se ejecutan en un pool
+de hilos local al proceso, sin broker externo. Cada trabajo tiene su propio
+directorio en MEDIA_ROOT/jobs/<id>/ con las entradas y el resultado.
+
+El progreso lo informa la propia operación (el parámetro progress de
+pdf_processor, ver JobProgress). Un trabajo pendiente o en proceso que ningún
+pool de este proceso está ejecutando y que lleva PDF_JOB_STALE_AFTER segundos
+sin avanzar (p. ej. porque el servidor se reinició) se marca como error
+(fail_stale_jobs).
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .funciones_python import pdf as pdf_processor
+from .models import PDFJob
+
+_executor = None
+_executor_lock = threading.Lock()
+# Trabajos encolados o en ejecución en el pool de este proceso
+_active_jobs = set()
+_active_jobs_lock = threading.Lock()
+
+# Progreso de un trabajo recién empezado y el máximo antes de guardar el resultado
+PROGRESS_STARTED = 10
+PROGRESS_WORK_DONE = 95
+# Segundos mínimos entre dos escrituras del progreso en la tabla
+PROGRESS_SAVE_INTERVAL = 1.0
+
+# Parámetros que no deben quedar guardados en la tabla una vez terminado el trabajo
+SENSITIVE_PARAMS = ('password',)
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Devuelve el pool de trabajos del proceso, creándolo la primera vez."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PDF_JOB_WORKERS', 2),
+                thread_name_prefix='pdf-job'
+            )
+        return _executor
+
+
+def job_directory(job_id) -> str:
+    return os.path.join(settings.MEDIA_ROOT, 'jobs', str(job_id))
+
+
+class JobProgress:
+    """
+    Callback progress(hechos, total) de pdf_processor que guarda el avance en el trabajo.
+
+    Lleva el avance al tramo PROGRESS_STARTED..PROGRESS_WORK_DONE, nunca retrocede
+    y escribe en la tabla como mucho una vez cada PROGRESS_SAVE_INTERVAL segundos
+    (el final del tramo siempre se guarda). Cada escritura renueva updated_at, que
+    es lo que fail_stale_jobs usa para saber si el trabajo sigue vivo.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self._last_save = 0.0
+
+    def __call__(self, done: int, total: int):
+        span = PROGRESS_WORK_DONE - PROGRESS_STARTED
+        value = PROGRESS_STARTED + span * min(done, total) // max(total, 1)
+        if value <= self.job.progress:
+            return
+        now = time.monotonic()
+        if value < PROGRESS_WORK_DONE and now - self._last_save < PROGRESS_SAVE_INTERVAL:
+            return
+        self._last_save = now
+        self.job.progress = value
+        PDFJob.objects.filter(pk=self.job.pk).update(progress=value, updated_at=timezone.now())
+
+
+def _op_join(job, workdir, progress):
+    output_pdf_path = pdf_processor.join_pdfs(job.input_files, workdir, progress=progress)
+    return output_pdf_path, os.path.basename(output_pdf_path), 'application/pdf'
+
+
+def _op_split(job, workdir, progress):
+    params = job.params
+    input_pdf_path = job.input_files[0]
+    base_name = params.get('original_filename_base') or 'documento'
+    split_method = params.get('split_method')
+    page_backend = getattr(settings, 'PDF_PAGE_BACKEND', pdf_processor.DEFAULT_PAGE_BACKEND)
+    split_workers = getattr(settings, 'PDF_SPLIT_WORKERS', 1)
+    zip_compression = params.get('zip_compression') or getattr(settings, 'PDF_SPLIT_ZIP_COMPRESSION', pdf_processor.DEFAULT_ZIP_COMPRESSION)
+
+    if split_method == 'pages_per_file':
+        try:
+            pages_per_file = int(params.get('pages_per_file'))
+        except (TypeError, ValueError):
+            raise ValueError("Valor inválido para 'páginas por archivo'.")
+        output_path = pdf_processor.zip_pdfs(
+            input_pdf_path, workdir, pages_per_file, base_name,
+            backend=page_backend, workers=split_workers, compression=zip_compression, progress=progress
+        )
+        return output_path, os.path.basename(output_path), 'application/zip'
+
+    if split_method == 'page_range':
+        try:
+            start_page = int(params.get('start_page'))
+            end_page = int(params.get('end_page'))
+        except (TypeError, ValueError):
+            raise ValueError("Valor inválido para el rango de páginas.")
+        output_path = pdf_processor.split_pdf_by_range(input_pdf_path, workdir, start_page, end_page, backend=page_backend)
+        return output_path, f"{base_name}_rango_{start_page}_a_{end_page}.pdf", 'application/pdf'
+
+    if split_method == 'extract_pages':
+        pages_specification = (params.get('pages_specification') or '').strip()
+        if not pages_specification:
+            raise ValueError("La especificación de páginas es requerida para este método.")
+        if params.get('split_into_separate_pdfs') == 'true':
+            output_path = pdf_processor.extract_specific_pages_to_zip(
+                input_pdf_path, workdir, pages_specification, base_name,
+                backend=page_backend, workers=split_workers, compression=zip_compression, progress=progress
+            )
+            return output_path, os.path.basename(output_path), 'application/zip'
+        output_path = pdf_processor.extract_specific_pages(
+            input_pdf_path, workdir, pages_specification, base_name, backend=page_backend
+        )
+        pages_clean = pages_specification.replace(" ", "").replace(",", "_")
+        return output_path, f"{base_name}_paginas_{pages_clean}.pdf", 'application/pdf'
+
+    raise ValueError("Método de división inválido seleccionado.")
+
+
+def _op_compress(job, workdir, progress):
+    base_name = job.params.get('original_filename_base') or 'documento'
+    output_pdf_path = os.path.join(workdir, f"{base_name}_comprimido.pdf")
+    compression_profile = job.params.get('compression_profile') or getattr(settings, 'PDF_COMPRESSION_PROFILE', pdf_processor.DEFAULT_COMPRESSION_PROFILE)
+    pdf_processor.comprimir_pdf(
+        job.input_files[0], output_pdf_path, compression_profile,
+        workers=getattr(settings, 'PDF_COMPRESS_WORKERS', 1), progress=progress
+    )
+    return output_pdf_path, os.path.basename(output_pdf_path), 'application/pdf'
+
+
+def _op_rotate(job, workdir, progress):
+    page_rotations = job.params.get('rotation_spec')
+    if page_rotations is None:
+        try:
+            page_rotations = json.loads(job.params.get('page_rotations') or '')
+        except json.JSONDecodeError:
+            raise ValueError("Formato de datos de rotación de página inválido.")
+    base_name = job.params.get('original_filename_base') or 'documento'
+    output_pdf_path = os.path.join(workdir, f"{base_name}_rotado.pdf")
+    pdf_processor.rotar_pdf(job.input_files[0], output_pdf_path, page_rotations)
+    return output_pdf_path, os.path.basename(output_pdf_path), 'application/pdf'
+
+
+def _op_unlock(job, workdir, progress):
+    password = (job.params.get('password') or '').strip()
+    base_name = job.params.get('original_filename_base') or 'documento'
+    output_pdf_path = os.path.join(workdir, f"{base_name}_sin_contraseña.pdf")
+    pdf_processor.remover_contraseña_pdf(
+        job.input_files[0], output_pdf_path, password,
+        backend=getattr(settings, 'PDF_PAGE_BACKEND', pdf_processor.DEFAULT_PAGE_BACKEND),
+        engine=getattr(settings, 'PDF_UNLOCK_ENGINE', pdf_processor.DEFAULT_UNLOCK_ENGINE)
+    )
+    return output_pdf_path, os.path.basename(output_pdf_path), 'application/pdf'
+
+
+def _op_images(job, workdir, progress):
+    params = job.params
+    output_pdf_path = pdf_processor.convert_images_to_pdf_with_options(
+        job.input_files,
+        os.path.join(workdir, 'imagenes_a_pdf.pdf'),
+        params.get('page_size', 'A4'),
+        params.get('orientation', 'portrait'),
+        params.get('margins', 'standard'),
+        params.get('image_fit', 'fit'),
+        pdf_processor.parse_target_dpi(params.get('target_dpi') or getattr(settings, 'PDF_IMAGE_TARGET_DPI', None)),
+        workers=getattr(settings, 'PDF_IMAGE_WORKERS', 1),
+        backend=getattr(settings, 'PDF_IMAGE_BACKEND', None),
+        progress=progress
+    )
+    return output_pdf_path, 'imagenes_a_pdf.pdf', 'application/pdf'
+
+
+# Operación -> (función, campo de archivos del formulario, admite varios archivos).
+# La función recibe (trabajo, directorio, progress); rotar y desbloquear son un
+# único paso y no informan avance intermedio.
+OPERATIONS = {
+    'join': (_op_join, 'pdf_files', True),
+    'split': (_op_split, 'pdf_file', False),
+    'compress': (_op_compress, 'pdf_file', False),
+    'rotate': (_op_rotate, 'pdf_file', False),
+    'unlock': (_op_unlock, 'pdf_file', False),
+    'images': (_op_images, 'image_files', True),
+}
+
+
+def submit_job(operation: str, uploaded_files: list, params: dict) -> PDFJob:
+    """
+    Registra un trabajo, guarda sus archivos de entrada y lo encola en el pool.
+
+    Raises:
+        ValueError: Si la operación no existe o no se recibieron archivos
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f"Operación desconocida: {operation}")
+    if not uploaded_files:
+        raise ValueError("No se recibieron archivos para procesar.")
+
+    purge_expired_jobs()
+
+    job = PDFJob(operation=operation, params=params)
+    workdir = job_directory(job.id)
+    os.makedirs(workdir, exist_ok=True)
+
+    input_files = []
+    for n, uploaded_file in enumerate(uploaded_files, 1):
+        _, ext = os.path.splitext(uploaded_file.name)
+        input_path = os.path.join(workdir, f"entrada_{n}{ext.lower()}")
+        with open(input_path, 'wb') as destination:
+            for chunk in uploaded_file.chunks():
+                destination.write(chunk)
+        input_files.append(input_path)
+
+    job.input_files = input_files
+    job.save()
+
+    with _active_jobs_lock:
+        _active_jobs.add(job.id)
+    get_executor().submit(run_job, job.id)
+    return job
+
+
+def run_job(job_id):
+    """Ejecuta un trabajo pendiente y guarda su resultado o su error."""
+    close_old_connections()
+    try:
+        job = PDFJob.objects.get(pk=job_id)
+        operation, _, _ = OPERATIONS[job.operation]
+
+        # La contraseña solo se conserva en memoria mientras dura la operación
+        sensitive = {key: job.params.pop(key) for key in SENSITIVE_PARAMS if key in job.params}
+        job.status = PDFJob.STATUS_RUNNING
+        job.progress = PROGRESS_STARTED
+        job.save(update_fields=['status', 'progress', 'params', 'updated_at'])
+        job.params.update(sensitive)
+
+        try:
+            result_path, result_filename, content_type = operation(job, job_directory(job.id), JobProgress(job))
+        except Exception as e:
+            job.status = PDFJob.STATUS_ERROR
+            job.error = str(e)
+            print(f"❌ ERROR en trabajo {job.id} ({job.operation}): {e}")
+        else:
+            job.status = PDFJob.STATUS_DONE
+            job.progress = 100
+            job.result_path = result_path
+            job.result_filename = result_filename
+            job.result_content_type = content_type
+        finally:
+            for key in SENSITIVE_PARAMS:
+                job.params.pop(key, None)
+
+        # Las entradas ya no se necesitan una vez terminado el trabajo
+        _remove_inputs(job)
+        job.save()
+    finally:
+        with _active_jobs_lock:
+            _active_jobs.discard(job_id)
+        close_old_connections()
+
+
+def _remove_inputs(job):
+    """Borra las entradas de un trabajo terminado (el resultado, si es una de ellas, se conserva)."""
+    for input_path in job.input_files:
+        if input_path != job.result_path and os.path.exists(input_path):
+            try:
+                os.remove(input_path)
+            except OSError:
+                pass
+
+
+def fail_stale_jobs() -> int:
+    """
+    Marca como error los trabajos pendientes o en proceso que ningún pool de este
+    proceso ejecuta y que llevan PDF_JOB_STALE_AFTER segundos sin avanzar.
+
+    Son trabajos interrumpidos (el proceso que los ejecutaba terminó) que de otro
+    modo se quedarían "en proceso" para siempre. Si otro proceso sí lo estaba
+    ejecutando, su resultado sobrescribe el error al terminar. Devuelve cuántos
+    trabajos se marcaron.
+    """
+    stale_after = getattr(settings, 'PDF_JOB_STALE_AFTER', 10 * 60)
+    if not stale_after:
+        return 0
+    limit = timezone.now() - timedelta(seconds=stale_after)
+    with _active_jobs_lock:
+        active = set(_active_jobs)
+
+    stale = PDFJob.objects.filter(
+        status__in=[PDFJob.STATUS_PENDING, PDFJob.STATUS_RUNNING], updated_at__lt=limit
+    ).exclude(pk__in=active)
+    count = 0
+    for job in stale:
+        job.status = PDFJob.STATUS_ERROR
+        job.error = "El trabajo se interrumpió antes de terminar (el servidor se reinició). Vuelva a enviarlo."
+        for key in SENSITIVE_PARAMS:
+            job.params.pop(key, None)
+        _remove_inputs(job)
+        job.save()
+        count += 1
+        print(f"⚠️ Trabajo {job.id} ({job.operation}) interrumpido; marcado como error")
+    return count
+
+
+def purge_expired_jobs():
+    """
+    Marca los trabajos interrumpidos (fail_stale_jobs) y elimina los trabajos
+    terminados (y sus archivos) más antiguos que PDF_JOB_RESULT_TTL segundos.
+
+    Los pendientes o en proceso nunca se eliminan: rotar y desbloquear no informan
+    avance, así que un trabajo largo puede llevar más del TTL sin actualizarse
+    mientras todavía escribe en su directorio.
+    """
+    fail_stale_jobs()
+    ttl = getattr(settings, 'PDF_JOB_RESULT_TTL', 60 * 60)
+    limit = timezone.now() - timedelta(seconds=ttl)
+    with _active_jobs_lock:
+        active = set(_active_jobs)
+    expired = PDFJob.objects.filter(
+        status__in=[PDFJob.STATUS_DONE, PDFJob.STATUS_ERROR], updated_at__lt=limit
+    ).exclude(pk__in=active)
+    for job_id in expired.values_list('id', flat=True):
+        shutil.rmtree(job_directory(job_id), ignore_errors=True)
+        PDFJob.objects.filter(pk=job_id).delete()
@@ -0,0 +1,129 @@
+"""
+Compresión HTTP según el contenido de la respuesta.
+
+Sustituye a GZipMiddleware: los PDF, ZIP e imágenes ya van comprimidos y volver
+a pasarlos por gzip gasta CPU del hilo de la petición sin reducir casi nada.
+Solo se comprimen los tipos de texto (HTML, JSON, JS, CSS, XML...), con brotli
+si el cliente lo acepta y el paquete está instalado, y si no con gzip. Como
+comprobación extra se mide la entropía de una muestra del cuerpo y se omite la
+compresión si los bytes ya parecen comprimidos.
+"""
+import math
+from collections import Counter
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él se usa gzip
+    brotli = None
+
+# Tipos de contenido que merece la pena comprimir
+COMPRESSIBLE_CONTENT_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+# Tipos donde brotli compensa su coste frente a gzip
+BROTLI_CONTENT_TYPES = ('text/html', 'application/json')
+
+ENTROPY_SAMPLE_SIZE = 4096
+
+
+def _accepted_encodings(request) -> set:
+    """Codificaciones de Accept-Encoding con q > 0."""
+    encodings = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = item.strip().partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            encodings.add(name.lower())
+    return encodings
+
+
+def shannon_entropy(data: bytes) -> float:
+    """Entropía de Shannon en bits por byte (8.0 = datos aleatorios o ya comprimidos)."""
+    if not data:
+        return 0.0
+    total = len(data)
+    return -sum(count / total * math.log2(count / total) for count in Counter(data).values())
+
+
+class ContentAwareCompressionMiddleware(MiddlewareMixin):
+    """
+    Comprime solo las respuestas de texto; PDF, ZIP, imágenes y rangos parciales pasan tal cual.
+
+    Igual que GZipMiddleware, añade Vary: Accept-Encoding, debilita los ETag
+    fuertes y mete bytes aleatorios en gzip para mitigar BREACH.
+    """
+
+    max_random_bytes = 100
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or response.status_code == 206:
+            return response
+
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if not content_type.startswith(COMPRESSIBLE_CONTENT_TYPES):
+            return response
+
+        min_size = getattr(settings, 'PDF_COMPRESSION_MIN_SIZE', 200)
+        if not response.streaming and len(response.content) < min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        accepted = _accepted_encodings(request)
+        use_brotli = brotli is not None and 'br' in accepted and content_type in BROTLI_CONTENT_TYPES
+        if not use_brotli and 'gzip' not in accepted:
+            return response
+
+        if response.streaming:
+            # Las respuestas en streaming se comprimen con gzip por bloques
+            if response.is_async or 'gzip' not in accepted:
+                return response
+            response.streaming_content = compress_sequence(
+                response.streaming_content,
+                max_random_bytes=self.max_random_bytes,
+            )
+            del response.headers['Content-Length']
+            encoding = 'gzip'
+        else:
+            content = response.content
+            max_entropy = getattr(settings, 'PDF_COMPRESSION_MAX_ENTROPY', 7.5)
+            if shannon_entropy(content[:ENTROPY_SAMPLE_SIZE]) > max_entropy:
+                return response
+
+            if use_brotli:
+                compressed = brotli.compress(
+                    content,
+                    mode=brotli.MODE_TEXT,
+                    quality=getattr(settings, 'PDF_BROTLI_QUALITY', 5),
+                )
+                encoding = 'br'
+            else:
+                compressed = compress_string(content, max_random_bytes=self.max_random_bytes)
+                encoding = 'gzip'
+
+            # Solo si de verdad es más corto
+            if len(compressed) >= len(content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
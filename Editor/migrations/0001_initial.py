@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:03
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PDFDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pdf_file', models.FileField(upload_to='pdfs/')),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PDFJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('operation', models.CharField(max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En proceso'), ('done', 'Completado'), ('error', 'Error')], default='pending', max_length=10)),
+                ('progress', models.PositiveSmallIntegerField(default=0)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('input_files', models.JSONField(blank=True, default=list)),
+                ('result_path', models.CharField(blank=True, max_length=500)),
+                ('result_filename', models.CharField(blank=True, max_length=255)),
+                ('result_content_type', models.CharField(blank=True, max_length=100)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 
 class PDFDocument(models.Model):
@@ -5,4 +7,33 @@ class PDFDocument(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return self.pdf_file.name 
\ No newline at end of file
+        return self.pdf_file.name
+
+class PDFJob(models.Model):
+    """Trabajo de procesamiento ejecutado en segundo plano por el pool local de Editor.jobs."""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_ERROR = 'error'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pendiente'),
+        (STATUS_RUNNING, 'En proceso'),
+        (STATUS_DONE, 'Completado'),
+        (STATUS_ERROR, 'Error'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    operation = models.CharField(max_length=20)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    progress = models.PositiveSmallIntegerField(default=0)
+    params = models.JSONField(default=dict, blank=True)
+    input_files = models.JSONField(default=list, blank=True)
+    result_path = models.CharField(max_length=500, blank=True)
+    result_filename = models.CharField(max_length=255, blank=True)
+    result_content_type = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.operation} ({self.status}) {self.id}"
@@ -0,0 +1,201 @@
+"""
+Respuestas de descarga que se sirven siempre desde disco.
+
+file_download_response envía un archivo en bloques (o lo delega en el proxy con
+X-Sendfile / X-Accel-Redirect), admite peticiones HTTP Range de un solo rango
+para reanudar descargas y borra los archivos temporales (o espacios de trabajo
+completos, ver cleanup.py) cuando la respuesta se cierra, es decir, cuando el
+servidor termina de enviarla.
+"""
+import io
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+from .cleanup import discard
+
+SENDFILE_BACKENDS = ('x-sendfile', 'x-accel-redirect')
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class StreamWithCleanup:
+    """Contenido en streaming que borra archivos temporales cuando se cierra la respuesta."""
+
+    def __init__(self, content, paths):
+        self.content = content
+        self.paths = list(paths)
+
+    def __iter__(self):
+        return iter(self.content)
+
+    def close(self):
+        if hasattr(self.content, 'close'):
+            self.content.close()
+        discard(self.paths)
+        self.paths = []
+
+
+class FileWithCleanup(io.FileIO):
+    """
+    Archivo de solo lectura que, al cerrarse, borra los archivos temporales indicados.
+
+    Al ser un io.FileIO conserva fileno(), así que el servidor WSGI puede enviarlo
+    con wsgi.file_wrapper (sendfile) sin copiarlo a memoria.
+    """
+
+    def __init__(self, path, cleanup_paths=()):
+        super().__init__(path, 'rb')
+        self.cleanup_paths = list(cleanup_paths)
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            discard(self.cleanup_paths)
+            self.cleanup_paths = []
+
+
+class FileRangeStream:
+    """Itera un fragmento de un archivo abierto y lo cierra al cerrarse la respuesta."""
+
+    def __init__(self, file_obj, start, length, chunk_size):
+        self.file_obj = file_obj
+        self.start = start
+        self.length = length
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        self.file_obj.seek(self.start)
+        remaining = self.length
+        while remaining > 0:
+            chunk = self.file_obj.read(min(self.chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    def close(self):
+        self.file_obj.close()
+
+
+def parse_range_header(header, size):
+    """
+    Interpreta una cabecera Range de un solo rango de bytes.
+
+    Returns:
+        tuple | None: (inicio, fin) inclusivos, o None si no hay cabecera o si pide
+        varios rangos (se responde el archivo completo)
+
+    Raises:
+        ValueError: Si el rango no se puede satisfacer (416)
+    """
+    if not header or ',' in header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        raise ValueError(f"Rango inválido: {header}")
+
+    first, last = match.groups()
+    if not first and not last:
+        raise ValueError(f"Rango inválido: {header}")
+    if not first:
+        # bytes=-N: los últimos N bytes
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError(f"Rango inválido: {header}")
+        return max(0, size - suffix), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(f"Rango inválido: {header}")
+    return start, end
+
+
+def _sendfile_headers(path):
+    """Cabeceras para que el proxy sirva path, o None si el envío delegado no aplica."""
+    backend = getattr(settings, 'PDF_SENDFILE_BACKEND', None)
+    if not backend:
+        return None
+    if backend not in SENDFILE_BACKENDS:
+        raise ValueError(f"PDF_SENDFILE_BACKEND desconocido: {backend}. Use uno de {', '.join(SENDFILE_BACKENDS)}.")
+
+    if backend == 'x-sendfile':
+        return {'X-Sendfile': os.path.abspath(path)}
+
+    # X-Accel-Redirect usa una ubicación interna de nginx que apunta a MEDIA_ROOT
+    media_root = os.path.abspath(settings.MEDIA_ROOT)
+    path = os.path.abspath(path)
+    if os.path.commonpath([media_root, path]) != media_root:
+        return None
+    prefix = getattr(settings, 'PDF_SENDFILE_URL_PREFIX', '/protected-media/').rstrip('/')
+    return {'X-Accel-Redirect': f"{prefix}/{os.path.relpath(path, media_root).replace(os.sep, '/')}"}
+
+
+def _is_temporary(path, cleanup_paths) -> bool:
+    """True si path es uno de cleanup_paths o está dentro de uno de ellos (un espacio de trabajo)."""
+    path = os.path.abspath(path)
+    for cleanup_path in cleanup_paths:
+        cleanup_path = os.path.abspath(cleanup_path)
+        try:
+            if os.path.commonpath([cleanup_path, path]) == cleanup_path:
+                return True
+        except ValueError:
+            # Rutas en unidades distintas (Windows)
+            continue
+    return False
+
+
+def file_download_response(request, path, filename, content_type, cleanup_paths=(), headers=None):
+    """
+    Respuesta de descarga para path sin cargarlo en memoria.
+
+    - cleanup_paths se borran cuando la respuesta se cierra (path incluido si se
+      pasa en la lista).
+    - Si PDF_SENDFILE_BACKEND está configurado y path no es temporal (ni está dentro
+      de un espacio de trabajo de cleanup_paths), el envío se delega al proxy; un
+      archivo temporal se borraría antes de que el proxy lo lea.
+    - Una cabecera Range de un solo rango devuelve 206 con ese fragmento.
+    """
+    cleanup_paths = list(cleanup_paths)
+    size = os.path.getsize(path)
+
+    sendfile_headers = None if _is_temporary(path, cleanup_paths) else _sendfile_headers(path)
+    if sendfile_headers:
+        discard(cleanup_paths)
+        response = HttpResponse(content_type=content_type)
+        for header, value in sendfile_headers.items():
+            response[header] = value
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+    else:
+        try:
+            byte_range = parse_range_header(request.META.get('HTTP_RANGE') if request else None, size)
+        except ValueError:
+            discard(cleanup_paths)
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{size}"
+            return response
+
+        file_obj = FileWithCleanup(path, cleanup_paths)
+        if byte_range is None:
+            response = FileResponse(file_obj, content_type=content_type, filename=filename, as_attachment=True)
+        else:
+            start, end = byte_range
+            chunk_size = getattr(settings, 'PDF_STREAM_CHUNK_SIZE', 64 * 1024)
+            response = StreamingHttpResponse(
+                FileRangeStream(file_obj, start, end - start + 1, chunk_size),
+                status=206,
+                content_type=content_type
+            )
+            response['Content-Range'] = f"bytes {start}-{end}/{size}"
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Disposition'] = content_disposition_header(True, filename)
+
+    response['Accept-Ranges'] = 'bytes'
+    for header, value in (headers or {}).items():
+        response[header] = value
+    return response
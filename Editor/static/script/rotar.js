@@ -302,17 +302,15 @@ async saveRotatedPDF() {
     this.showLoading(true);
 
     try {
-        const finalRotations = {};
-        for (let i = 0; i < this.pdfDoc.numPages; i++) {
-            const page = await this.pdfDoc.getPage(i + 1);
-            const baseRotation = page.rotate || 0; 
-            const extraRotation = this.pageRotations[i] || 0; 
-            finalRotations[i] = (baseRotation + extraRotation) % 360;
-        }
+        // Solo las páginas giradas, como giro relativo a su rotación original ("3:+90, 7:+180")
+        const rotationSpec = Object.entries(this.pageRotations)
+            .filter(([, extraRotation]) => extraRotation % 360 !== 0)
+            .map(([pageIndex, extraRotation]) => `${Number(pageIndex) + 1}:+${extraRotation}`)
+            .join(", ");
 
         const formData = new FormData();
         formData.append("pdf_file", this.originalPdfFile);
-        formData.append("page_rotations", JSON.stringify(finalRotations));
+        formData.append("rotation_spec", rotationSpec);
 
         const response = await fetch(window.location.href, {
             method: "POST",
@@ -1 +1,1737 @@
-from django.test import TestCase
+import gzip
+import io
+import os
+import re
+import shutil
+import tempfile
+import time
+import unittest
+import zipfile
+from datetime import timedelta
+from unittest import mock
+
+import fitz
+from PIL import Image
+from PyPDF2 import PdfReader
+from django.core.files.uploadedfile import InMemoryUploadedFile, SimpleUploadedFile, TemporaryUploadedFile
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.http.multipartparser import MultiPartParser
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.urls import reverse
+from django.utils import timezone
+
+from . import cache as result_cache_module
+from . import cleanup
+from . import handles
+from . import jobs
+from . import middleware as middleware_module
+from .funciones_python import pdf as pdf_processor
+from .models import PDFJob
+from .responses import file_download_response, parse_range_header
+from .uploads import JoinUploadHandler, upload_source, upload_sources
+
+
+def crear_pdf(paginas=3, **save_options) -> bytes:
+    """PDF de prueba con una línea de texto por página."""
+    doc = fitz.open()
+    for numero in range(paginas):
+        doc.new_page().insert_text((72, 72), f"Página {numero + 1}")
+    data = doc.tobytes(**save_options)
+    doc.close()
+    return data
+
+
+def actualizar_incrementalmente(data: bytes, password: str = None) -> bytes:
+    """Añade una página con saveIncr de MuPDF: el resultado tiene dos secciones xref enlazadas por /Prev."""
+    with tempfile.TemporaryDirectory() as directorio:
+        path = os.path.join(directorio, 'entrada.pdf')
+        with open(path, 'wb') as f:
+            f.write(data)
+        doc = fitz.open(path)
+        if password:
+            doc.authenticate(password)
+        doc.new_page().insert_text((72, 72), "Página añadida")
+        doc.saveIncr()
+        doc.close()
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+def danar_startxref(data: bytes, offset: int = 999999) -> bytes:
+    """Sustituye el último startxref por una posición que no apunta a ningún xref."""
+    return data[:data.rindex(b'startxref')] + b'startxref\n%d\n%%%%EOF\n' % offset
+
+
+CIFRADO = {'encryption': fitz.PDF_ENCRYPT_AES_256, 'user_pw': 'usuario', 'owner_pw': 'propietario'}
+# PyPDF2 necesita PyCryptodome para AES; el análisis completo se prueba con RC4
+CIFRADO_RC4 = {'encryption': fitz.PDF_ENCRYPT_RC4_128, 'user_pw': 'usuario', 'owner_pw': 'propietario'}
+
+
+class MediaRootMixin:
+    """Cada prueba trabaja en un MEDIA_ROOT propio, sin caché de resultados ni conserje."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        overrides = override_settings(
+            MEDIA_ROOT=self.media_root, PDF_RESULT_CACHE_ENABLED=False, PDF_JANITOR_INTERVAL=0
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def workspace_files(self):
+        return [
+            os.path.join(dirpath, filename)
+            for dirpath, _, filenames in os.walk(os.path.join(self.media_root, 'tmp'))
+            for filename in filenames
+        ]
+
+
+class MediaRootTestCase(MediaRootMixin, SimpleTestCase):
+    pass
+
+
+class OutputIsolationTests(MediaRootTestCase):
+    """Dos peticiones con el mismo nombre de archivo no comparten la salida."""
+
+    def _post_capturando_salida(self, url, funcion, data):
+        salidas = []
+        original = getattr(pdf_processor, funcion)
+
+        def registrar(input_path, output_path, *args, **kwargs):
+            salidas.append(output_path)
+            return original(input_path, output_path, *args, **kwargs)
+
+        with mock.patch.object(pdf_processor, funcion, side_effect=registrar):
+            response = self.client.post(url, data)
+            contenido = b''.join(response.streaming_content)
+            response.close()
+        return response, contenido, salidas[0]
+
+    def test_rotate_outputs_are_per_request(self):
+        respuestas = []
+        for paginas in (2, 3):
+            upload = SimpleUploadedFile('informe.pdf', crear_pdf(paginas), 'application/pdf')
+            respuestas.append(self._post_capturando_salida(
+                reverse('rotate_pdf'), 'rotar_pdf', {'pdf_file': upload, 'rotation_spec': 'all:90'}
+            ))
+
+        (primera, pdf_a, salida_a), (segunda, pdf_b, salida_b) = respuestas
+        self.assertEqual((primera.status_code, segunda.status_code), (200, 200))
+        self.assertNotEqual(salida_a, salida_b)
+        self.assertNotEqual(os.path.dirname(salida_a), self.media_root)
+        self.assertEqual(fitz.open(stream=pdf_a).page_count, 2)
+        self.assertEqual(fitz.open(stream=pdf_b).page_count, 3)
+        self.assertEqual(self.workspace_files(), [])
+
+    def test_unlock_outputs_are_per_request(self):
+        protegido = crear_pdf(
+            2, encryption=fitz.PDF_ENCRYPT_AES_256, user_pw='clave', owner_pw='clave'
+        )
+        salidas = []
+        for _ in range(2):
+            upload = SimpleUploadedFile('informe.pdf', protegido, 'application/pdf')
+            response, contenido, salida = self._post_capturando_salida(
+                reverse('unlock_pdf'), 'desbloquear_pdf', {'pdf_file': upload, 'password': 'clave'}
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(fitz.open(stream=contenido).needs_pass)
+            salidas.append(salida)
+
+        self.assertNotEqual(salidas[0], salidas[1])
+        self.assertNotEqual(os.path.dirname(salidas[0]), self.media_root)
+        self.assertEqual(self.workspace_files(), [])
+
+    def test_image_outputs_are_per_request(self):
+        imagen = io.BytesIO()
+        Image.new('RGB', (40, 30), 'red').save(imagen, 'PNG')
+        salidas = []
+        for _ in range(2):
+            upload = SimpleUploadedFile('foto.png', imagen.getvalue(), 'image/png')
+            response, contenido, salida = self._post_capturando_salida(
+                reverse('convert_image_to_pdf'), 'convert_images_to_pdf_with_options', {'image_files': upload}
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(fitz.open(stream=contenido).page_count, 1)
+            salidas.append(salida)
+
+        self.assertNotEqual(salidas[0], salidas[1])
+        self.assertNotEqual(os.path.dirname(salidas[0]), self.media_root)
+        self.assertEqual(os.listdir(self.media_root), ['tmp'])
+        self.assertEqual(self.workspace_files(), [])
+
+
+class SendfileTests(MediaRootTestCase):
+    """El envío delegado al proxy solo se usa con archivos que sobreviven a la respuesta."""
+
+    def _descargar(self, path, cleanup_paths):
+        response = file_download_response(None, path, 'salida.pdf', 'application/pdf', cleanup_paths=cleanup_paths)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        response.close()
+        return response
+
+    @override_settings(PDF_SENDFILE_BACKEND='x-accel-redirect')
+    def test_permanent_file_is_delegated(self):
+        path = os.path.join(self.media_root, 'pdfs', 'salida.pdf')
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(crear_pdf(1))
+
+        response = self._descargar(path, ())
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/pdfs/salida.pdf')
+        self.assertTrue(os.path.exists(path))
+
+    @override_settings(PDF_SENDFILE_BACKEND='x-accel-redirect')
+    def test_file_inside_released_workspace_is_streamed(self):
+        workspace = cleanup.RequestWorkspace()
+        path = workspace.file_path('salida.pdf')
+        with open(path, 'wb') as f:
+            f.write(crear_pdf(1))
+
+        response = file_download_response(
+            None, path, 'salida.pdf', 'application/pdf', cleanup_paths=workspace.release()
+        )
+        self.assertNotIn('X-Accel-Redirect', response)
+        # El archivo sigue ahí hasta que se envía el cuerpo
+        self.assertTrue(os.path.exists(path))
+        contenido = b''.join(response.streaming_content)
+        response.close()
+        self.assertEqual(fitz.open(stream=contenido).page_count, 1)
+        self.assertFalse(os.path.exists(os.path.dirname(path)))
+
+    @override_settings(PDF_SENDFILE_BACKEND='x-sendfile')
+    def test_temporary_file_is_streamed(self):
+        path = os.path.join(self.media_root, 'salida.pdf')
+        with open(path, 'wb') as f:
+            f.write(crear_pdf(1))
+
+        response = self._descargar(path, [path])
+        self.assertNotIn('X-Sendfile', response)
+        self.assertFalse(os.path.exists(path))
+
+
+class RangeTests(MediaRootTestCase):
+    """Peticiones Range de file_download_response y su relación con el envío delegado."""
+
+    def setUp(self):
+        super().setUp()
+        self.contenido = bytes(range(256)) * 4
+        self.path = os.path.join(self.media_root, 'salida.pdf')
+        with open(self.path, 'wb') as f:
+            f.write(self.contenido)
+
+    def _descargar(self, rango=None, cleanup_paths=()):
+        extra = {'HTTP_RANGE': rango} if rango else {}
+        request = RequestFactory().get('/descarga/', **extra)
+        response = file_download_response(request, self.path, 'salida.pdf', 'application/pdf', cleanup_paths=cleanup_paths)
+        response.cuerpo = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response
+
+    def test_parse_range_header(self):
+        self.assertIsNone(parse_range_header(None, 1024))
+        self.assertIsNone(parse_range_header('', 1024))
+        self.assertIsNone(parse_range_header('bytes=0-1,5-9', 1024))
+        self.assertEqual(parse_range_header('bytes=0-99', 1024), (0, 99))
+        self.assertEqual(parse_range_header(' bytes=1000- ', 1024), (1000, 1023))
+        self.assertEqual(parse_range_header('bytes=1000-5000', 1024), (1000, 1023))
+        self.assertEqual(parse_range_header('bytes=-24', 1024), (1000, 1023))
+        self.assertEqual(parse_range_header('bytes=-5000', 1024), (0, 1023))
+        for header in ('bytes=1024-', 'bytes=10-5', 'bytes=-0', 'bytes=-', 'items=0-1', 'bytes=a-b'):
+            with self.subTest(header=header):
+                with self.assertRaises(ValueError):
+                    parse_range_header(header, 1024)
+
+    @override_settings(PDF_STREAM_CHUNK_SIZE=100)
+    def test_single_range_returns_206(self):
+        response = self._descargar('bytes=10-509')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.cuerpo, self.contenido[10:510])
+        self.assertEqual(response['Content-Range'], 'bytes 10-509/1024')
+        self.assertEqual(response['Content-Length'], '500')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('attachment', response['Content-Disposition'])
+
+        response = self._descargar('bytes=-24')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.cuerpo, self.contenido[-24:])
+
+    def test_unsatisfiable_range_returns_416_and_cleans_up(self):
+        response = self._descargar('bytes=2000-', cleanup_paths=[self.path])
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_multiple_ranges_return_whole_file(self):
+        response = self._descargar('bytes=0-1,5-9', cleanup_paths=[self.path])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.cuerpo, self.contenido)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_sendfile_leaves_ranges_to_the_proxy(self):
+        with override_settings(PDF_SENDFILE_BACKEND='x-accel-redirect', PDF_SENDFILE_URL_PREFIX='/interno/'):
+            response = self._descargar('bytes=10-19')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/interno/salida.pdf')
+        self.assertNotIn('Content-Range', response)
+        self.assertEqual(response.cuerpo, b'')
+
+        with override_settings(PDF_SENDFILE_BACKEND='x-sendfile'):
+            response = self._descargar('bytes=10-19')
+        self.assertEqual(response['X-Sendfile'], os.path.abspath(self.path))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(os.path.exists(self.path))
+
+    def test_sendfile_outside_media_root_is_streamed(self):
+        fuera = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, fuera, ignore_errors=True)
+        self.path = os.path.join(fuera, 'salida.pdf')
+        with open(self.path, 'wb') as f:
+            f.write(self.contenido)
+
+        with override_settings(PDF_SENDFILE_BACKEND='x-accel-redirect'):
+            response = self._descargar('bytes=0-9')
+        self.assertNotIn('X-Accel-Redirect', response)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.cuerpo, self.contenido[:10])
+
+    @override_settings(PDF_SENDFILE_BACKEND='nginx')
+    def test_unknown_sendfile_backend(self):
+        with self.assertRaises(ValueError):
+            self._descargar()
+
+
+def crear_pdf_con_imagenes(imagenes) -> bytes:
+    """PDF con una página por imagen: (ancho, alto, formato, modo, ancho dibujado en puntos)."""
+    doc = fitz.open()
+    for width, height, fmt, mode, drawn_width in imagenes:
+        image = Image.radial_gradient('L').resize((width, height)).convert(mode)
+        data = io.BytesIO()
+        image.save(data, fmt, **({'quality': 95} if fmt == 'JPEG' else {}))
+        page = doc.new_page(width=612, height=792)
+        page.insert_image(fitz.Rect(20, 20, 20 + drawn_width, 20 + drawn_width * height / width), stream=data.getvalue())
+    pdf = doc.tobytes()
+    doc.close()
+    return pdf
+
+
+class ParallelCompressionTests(SimpleTestCase):
+    """Con workers > 1 las imágenes salen como con doc.rewrite_images."""
+
+    IMAGENES = [
+        (900, 1200, 'JPEG', 'RGB', 540),   # 120 dpi: en el umbral de 'balanced', solo se recodifica
+        (1800, 2400, 'PNG', 'RGB', 540),   # 240 dpi: sin pérdida, se submuestrea
+        (1000, 1000, 'JPEG', 'L', 300),    # 240 dpi en gris
+        (701, 703, 'PNG', 'L', 300),       # tamaño impar: el submuestreo redondea hacia arriba
+        (600, 600, 'JPEG', 'RGB', 500),    # 86 dpi
+    ]
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        self.entrada = os.path.join(self.directorio, 'entrada.pdf')
+        with open(self.entrada, 'wb') as f:
+            f.write(crear_pdf_con_imagenes(self.IMAGENES))
+
+    def _comprimir(self, profile, workers):
+        salida = os.path.join(self.directorio, f'{profile}_{workers}.pdf')
+        result = pdf_processor.comprimir_pdf(self.entrada, salida, profile, workers=workers)
+        doc = fitz.open(salida)
+        imagenes = [
+            (item[2], item[3], len(doc.xref_stream_raw(item[0])), pdf_processor._image_components(doc, item[0], item[5]))
+            for page in doc for item in page.get_images(full=True)
+        ]
+        doc.close()
+        return result, imagenes, os.path.getsize(salida)
+
+    def test_parallel_matches_serial_rewrite(self):
+        for profile in ('balanced', 'max'):
+            with self.subTest(profile=profile):
+                serie, imagenes_serie, tamano_serie = self._comprimir(profile, 1)
+                paralelo, imagenes_paralelo, tamano_paralelo = self._comprimir(profile, 2)
+
+                self.assertEqual(serie['action'], 'rewrite')
+                self.assertEqual(serie['profile'], paralelo['profile'])
+                self.assertEqual(
+                    [(width, height) for width, height, _, _ in imagenes_serie],
+                    [(width, height) for width, height, _, _ in imagenes_paralelo]
+                )
+                for (_, _, bytes_serie, componentes), (_, _, bytes_paralelo, _) in zip(imagenes_serie, imagenes_paralelo):
+                    # MuPDF guarda las imágenes en gris como JPEG de 3 componentes; Pillow las deja en gris
+                    if componentes == 3:
+                        self.assertAlmostEqual(bytes_paralelo, bytes_serie, delta=bytes_serie * 0.02)
+                self.assertAlmostEqual(tamano_paralelo, tamano_serie, delta=tamano_serie * 0.1)
+
+    def test_parallel_skips_lossless_images_like_fast(self):
+        # 'fast' ya no compensa en este documento (sus PNG no se tocan): se comparan las imágenes
+        options = pdf_processor.COMPRESSION_PROFILES['fast']['rewrite_images']
+        tamanos = []
+        for reescribir in (
+            lambda doc: doc.rewrite_images(**options),
+            lambda doc: pdf_processor.recomprimir_imagenes_paralelo(doc, options, 2),
+        ):
+            doc = fitz.open(self.entrada)
+            reescribir(doc)
+            tamanos.append([
+                (doc.xref_get_key(item[0], 'Filter')[1], item[2], item[3])
+                for page in doc for item in page.get_images(full=True)
+            ])
+            doc.close()
+        self.assertEqual(tamanos[0], tamanos[1])
+        # Las PNG conservan su tamaño y filtro; las JPEG por encima del umbral se submuestrean
+        self.assertEqual(tamanos[0][1::2], [('null', 1800, 2400), ('null', 701, 703)])
+        self.assertEqual(tamanos[0][2][1:], (500, 500))
+
+    def test_parallel_reuses_the_analysis(self):
+        salida = os.path.join(self.directorio, 'salida.pdf')
+        with mock.patch.object(
+            pdf_processor, '_effective_image_dpi', wraps=pdf_processor._effective_image_dpi
+        ) as effective_image_dpi:
+            pdf_processor.comprimir_pdf(self.entrada, salida, 'balanced', workers=2)
+        self.assertEqual(effective_image_dpi.call_count, 1)
+
+    def test_subsample_factor_is_a_power_of_two_above_target(self):
+        self.assertEqual(pdf_processor._subsample_factor(120, 120, 60), 1)
+        self.assertEqual(pdf_processor._subsample_factor(120.2, 120, 60), 2)
+        self.assertEqual(pdf_processor._subsample_factor(240, 120, 60), 2)
+        self.assertEqual(pdf_processor._subsample_factor(288, 120, 60), 4)
+        self.assertEqual(pdf_processor._subsample_factor(432, 120, 60), 4)
+        self.assertEqual(pdf_processor._subsample_factor(432, 0, 0), 1)
+
+
+def analisis(file_size, imagenes=(), uncompressed_stream_bytes=0, font_bytes=0):
+    """Resultado de analizar_pdf_para_compresion con imágenes (dpi, bytes, con pérdida)."""
+    return {
+        'file_size': file_size,
+        'uncompressed_stream_bytes': uncompressed_stream_bytes,
+        'font_bytes': font_bytes,
+        'images': [{'dpi': dpi, 'bytes': size, 'lossy': lossy} for dpi, size, lossy in imagenes],
+    }
+
+
+class CompressionDecisionTests(MediaRootTestCase):
+    """Tabla de decisión de decidir_compresion y cabeceras X-PDF-Compression-* de la vista."""
+
+    def test_keeps_original_below_min_savings(self):
+        # Flujos sin comprimir: se prevé ahorrar la mitad (COMPRESS_DEFLATE_SAVINGS)
+        umbral = int(1000 * pdf_processor.COMPRESS_MIN_SAVINGS / pdf_processor.COMPRESS_DEFLATE_SAVINGS)
+        for profile in pdf_processor.COMPRESSION_PROFILES:
+            with self.subTest(profile=profile):
+                decision = pdf_processor.decidir_compresion(analisis(1000, uncompressed_stream_bytes=umbral - 2), profile)
+                self.assertEqual(decision['action'], 'original')
+                self.assertEqual(decision['profile'], profile)
+                self.assertEqual(decision['requested_profile'], profile)
+
+                decision = pdf_processor.decidir_compresion(analisis(1000, uncompressed_stream_bytes=umbral), profile)
+                self.assertEqual(decision['action'], 'structure')
+                self.assertEqual(decision['predicted_size'], 1000 - umbral // 2)
+                self.assertEqual(decision['predicted_ratio'], round((1000 - umbral // 2) / 1000, 3))
+
+    def test_downgrades_when_cheaper_profile_saves_as_much(self):
+        # Una JPEG a 1000 dpi: 'fast' ya ahorra casi todo lo que ahorraría 'max'
+        decision = pdf_processor.decidir_compresion(analisis(100000, [(1000, 90000, True)]), 'max')
+        self.assertEqual((decision['action'], decision['profile'], decision['requested_profile']), ('rewrite', 'fast', 'max'))
+
+        # Fuentes incrustadas: solo 'max' las reduce, no se baja de perfil
+        decision = pdf_processor.decidir_compresion(analisis(100000, [(1000, 10000, True)], font_bytes=80000), 'max')
+        self.assertEqual(decision['profile'], 'max')
+
+    def test_lossless_images_are_not_downgraded_to_fast(self):
+        # 'fast' no reescribe imágenes sin pérdida: no prevé ahorro en ellas
+        self.assertEqual(pdf_processor._predecir_ahorro(
+            analisis(100000, [(1000, 90000, False)]), pdf_processor.COMPRESSION_PROFILES['fast']
+        ), (0, 0))
+        for profile in ('balanced', 'max'):
+            with self.subTest(profile=profile):
+                decision = pdf_processor.decidir_compresion(analisis(100000, [(1000, 90000, False)]), profile)
+                self.assertEqual((decision['action'], decision['profile']), ('rewrite', 'balanced'))
+        decision = pdf_processor.decidir_compresion(analisis(100000, [(1000, 90000, False)]), 'fast')
+        self.assertEqual((decision['action'], decision['profile']), ('original', 'fast'))
+
+    def _comprimir(self, data, profile):
+        entrada = os.path.join(self.media_root, 'entrada.pdf')
+        salida = os.path.join(self.media_root, 'salida.pdf')
+        with open(entrada, 'wb') as f:
+            f.write(data)
+        return pdf_processor.comprimir_pdf(entrada, salida, profile), os.path.getsize(salida)
+
+    def test_compresses_lossless_image(self):
+        # PNG de 800x800 dibujada a 800 dpi
+        data = crear_pdf_con_imagenes([(800, 800, 'PNG', 'RGB', 72)])
+        for profile in ('balanced', 'max'):
+            with self.subTest(profile=profile):
+                decision, size = self._comprimir(data, profile)
+                self.assertEqual((decision['action'], decision['profile']), ('rewrite', 'balanced'))
+                self.assertEqual(decision['output_size'], size)
+                self.assertLess(size, len(data) * 0.05)
+
+    def test_view_headers(self):
+        data = crear_pdf_con_imagenes([(800, 800, 'PNG', 'RGB', 72)])
+        response = self.client.post(reverse('compress_pdf'), {
+            'pdf_file': SimpleUploadedFile('escaneo.pdf', data, 'application/pdf'), 'compression_profile': 'max',
+        })
+        self.assertEqual(response.status_code, 200)
+        size = len(b''.join(response.streaming_content))
+        self.assertEqual(response['X-PDF-Compression-Action'], 'rewrite')
+        self.assertEqual(response['X-PDF-Compression-Profile'], 'balanced')
+        self.assertLess(float(response['X-PDF-Compression-Predicted-Ratio']), 0.05)
+        self.assertEqual(response['X-PDF-Compression-Ratio'], str(round(size / len(data), 3)))
+
+        texto = crear_pdf(1)
+        response = self.client.post(reverse('compress_pdf'), {
+            'pdf_file': SimpleUploadedFile('texto.pdf', texto, 'application/pdf'), 'compression_profile': 'max',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), texto)
+        self.assertEqual(response['X-PDF-Compression-Action'], 'original')
+        self.assertEqual(response['X-PDF-Compression-Profile'], 'max')
+        self.assertEqual(response['X-PDF-Compression-Ratio'], '1.0')
+
+
+class PageAssemblerParityTests(SimpleTestCase):
+    """open_page_assembler da el mismo resultado con 'fitz' y con 'pypdf2'."""
+
+    def setUp(self):
+        doc = fitz.open()
+        for numero in range(6):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Página {numero + 1}")
+            page.set_rotation((numero % 4) * 90)
+        self.pdf = doc.tobytes()
+        doc.close()
+
+    def _paginas(self, data):
+        """(rotación, texto) de cada página del PDF escrito por un ensamblador."""
+        doc = fitz.open(stream=data)
+        paginas = [(page.rotation, page.get_text().strip()) for page in doc]
+        doc.close()
+        return paginas
+
+    def _escribir(self, source, backend, page_indices, password=None):
+        assembler = pdf_processor.open_page_assembler(source, backend)
+        try:
+            estado = (assembler.is_encrypted, assembler.decrypt(password) if password else None)
+            output = io.BytesIO()
+            escritas = assembler.write_pages(page_indices, output)
+            return assembler.page_count, estado, escritas, self._paginas(output.getvalue())
+        finally:
+            assembler.close()
+
+    def test_same_pages_rotation_and_text(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        path = os.path.join(directorio, 'entrada.pdf')
+        with open(path, 'wb') as f:
+            f.write(self.pdf)
+
+        for source in (path, self.pdf):
+            for page_indices in ([0, 1, 2, 3, 4, 5], [0, 2, 3, 5], [4, 1]):
+                with self.subTest(source=type(source).__name__, page_indices=page_indices):
+                    fitz_result = self._escribir(source, 'fitz', page_indices)
+                    pypdf2_result = self._escribir(source, 'pypdf2', page_indices)
+                    self.assertEqual(fitz_result, pypdf2_result)
+                    self.assertEqual(fitz_result[0], 6)
+                    self.assertEqual(fitz_result[3], [
+                        ((n % 4) * 90, f"Página {n + 1}") for n in page_indices
+                    ])
+
+    def test_same_decrypt_results(self):
+        protegido = fitz.open(stream=self.pdf).tobytes(**CIFRADO_RC4)
+        for password, esperado in (('usuario', 1), ('propietario', 2), ('otra', 0)):
+            with self.subTest(password=password):
+                resultados = []
+                for backend in pdf_processor.PAGE_BACKENDS:
+                    assembler = pdf_processor.open_page_assembler(protegido, backend)
+                    resultados.append((assembler.is_encrypted, assembler.decrypt(password)))
+                    assembler.close()
+                self.assertEqual(resultados, [(True, esperado)] * 2)
+
+        # Ya autenticados, los dos copian las páginas sin cifrar
+        for backend in pdf_processor.PAGE_BACKENDS:
+            with self.subTest(backend=backend):
+                self.assertEqual(
+                    self._escribir(protegido, backend, [1, 0], password='usuario'),
+                    (6, (True, 1), 2, [(90, "Página 2"), (0, "Página 1")])
+                )
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            pdf_processor.open_page_assembler(self.pdf, 'pdfium')
+
+
+class SplitCacheKeyTests(MediaRootTestCase):
+    """La clave de caché de split incluye los ajustes que cambian el resultado."""
+
+    def setUp(self):
+        super().setUp()
+        overrides = override_settings(
+            PDF_RESULT_CACHE_ENABLED=True, PDF_RESULT_CACHE_DIR=os.path.join(self.media_root, 'cache'),
+            PDF_SPLIT_STREAM_ZIP=False
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        patcher = mock.patch.object(result_cache_module, '_result_cache', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pdf = crear_pdf(4)
+
+    def _split(self):
+        upload = SimpleUploadedFile('informe.pdf', self.pdf, 'application/pdf')
+        response = self.client.post(reverse('split_pdf'), {
+            'pdf_file': upload, 'split_method': 'pages_per_file', 'pages_per_file': '2',
+        })
+        contenido = b''.join(response.streaming_content)
+        response.close()
+        self.assertEqual(response.status_code, 200)
+        return response.get('X-PDF-Cache'), contenido
+
+    def test_page_backend_is_part_of_the_key(self):
+        with override_settings(PDF_PAGE_BACKEND='fitz'):
+            self.assertIsNone(self._split()[0])
+            self.assertEqual(self._split()[0], 'HIT')
+        with override_settings(PDF_PAGE_BACKEND='pypdf2'):
+            self.assertIsNone(self._split()[0])
+            self.assertEqual(self._split()[0], 'HIT')
+
+    def test_split_workers_do_not_change_the_result(self):
+        with override_settings(PDF_RESULT_CACHE_ENABLED=False, PDF_SPLIT_WORKERS=1):
+            _, serie = self._split()
+        with override_settings(PDF_RESULT_CACHE_ENABLED=False, PDF_SPLIT_WORKERS=2):
+            _, paralelo = self._split()
+        self.assertEqual(serie, paralelo)
+
+
+class ResultCacheTests(MediaRootTestCase):
+    """Expulsión LRU por tamaño, caducidad, enlace o copia del resultado y contadores."""
+
+    def setUp(self):
+        super().setUp()
+        self.directorio = os.path.join(self.media_root, 'cache')
+        patcher = mock.patch.object(result_cache_module, '_result_cache', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _resultado(self, nombre, size=100):
+        path = os.path.join(self.media_root, nombre)
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+        return path
+
+    def test_evicts_least_recently_used_beyond_max_bytes(self):
+        cache = result_cache_module.ResultCache(self.directorio, max_bytes=250, ttl=3600)
+        for key in ('a', 'b'):
+            cache.put(key, self._resultado(key), f'{key}.pdf', 'application/pdf')
+        # b se usó más tarde que a, pero la lectura de a la vuelve la más reciente
+        os.utime(os.path.join(self.directorio, 'a.bin'), (1000, 1000))
+        os.utime(os.path.join(self.directorio, 'b.bin'), (2000, 2000))
+        self.assertIsNotNone(cache.get('a'))
+
+        cache.put('c', self._resultado('c'), 'c.pdf', 'application/pdf')
+        self.assertIsNone(cache.get('b'))
+        self.assertFalse(os.path.exists(os.path.join(self.directorio, 'b.json')))
+        self.assertEqual(cache.get('a').filename, 'a.pdf')
+        self.assertEqual(cache.get('c').filename, 'c.pdf')
+        self.assertEqual(cache.stats(), {'hits': 3, 'misses': 1, 'evictions': 1})
+
+    def test_entries_expire_after_ttl(self):
+        cache = result_cache_module.ResultCache(self.directorio, max_bytes=10 ** 6, ttl=60)
+        with mock.patch.object(result_cache_module.time, 'time', return_value=1000.0):
+            cache.put('a', self._resultado('a'), 'a.pdf', 'application/pdf', {'X-Prueba': '1'})
+        with mock.patch.object(result_cache_module.time, 'time', return_value=1060.0):
+            self.assertEqual(cache.get('a').headers, {'X-Prueba': '1'})
+        with mock.patch.object(result_cache_module.time, 'time', return_value=1061.0):
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual(os.listdir(self.directorio), [])
+
+        # evict() también retira los caducados, según la fecha de sus metadatos
+        cache.put('b', self._resultado('b'), 'b.pdf', 'application/pdf')
+        antiguo = time.time() - 61
+        os.utime(os.path.join(self.directorio, 'b.json'), (antiguo, antiguo))
+        cache.put('c', self._resultado('c'), 'c.pdf', 'application/pdf')
+        self.assertEqual(sorted(os.listdir(self.directorio)), ['c.bin', 'c.json'])
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'evictions': 1})
+
+    def test_hardlinks_or_copies_the_result(self):
+        cache = result_cache_module.ResultCache(self.directorio, max_bytes=10 ** 6, ttl=3600)
+        origen = self._resultado('a')
+        cache.put('a', origen, 'a.pdf', 'application/pdf')
+        self.assertTrue(os.path.samefile(origen, cache.get('a').path))
+
+        # Otro sistema de archivos: os.link falla y se copia
+        origen = self._resultado('b')
+        with mock.patch.object(result_cache_module.os, 'link', side_effect=OSError(18, 'Invalid cross-device link')):
+            cache.put('b', origen, 'b.pdf', 'application/pdf')
+        copia = cache.get('b').path
+        self.assertFalse(os.path.samefile(origen, copia))
+        with open(origen, 'rb') as a, open(copia, 'rb') as b:
+            self.assertEqual(a.read(), b.read())
+        self.assertFalse([nombre for nombre in os.listdir(self.directorio) if nombre.endswith('.tmp')])
+
+    def test_stats_view_reports_counters(self):
+        self.assertEqual(self.client.get(reverse('cache_stats')).json()['data'], {'enabled': False})
+
+        with override_settings(PDF_RESULT_CACHE_ENABLED=True, PDF_RESULT_CACHE_DIR=self.directorio,
+                               PDF_RESULT_CACHE_MAX_BYTES=3000):
+            cabeceras = []
+            dos_paginas = crear_pdf(2)
+            for data in (dos_paginas, dos_paginas, crear_pdf(3)):
+                response = self.client.post(reverse('rotate_pdf'), {
+                    'pdf_file': SimpleUploadedFile('informe.pdf', data, 'application/pdf'), 'rotation_spec': 'all:90',
+                })
+                b''.join(response.streaming_content)
+                response.close()
+                cabeceras.append(response.get('X-PDF-Cache'))
+            stats = self.client.get(reverse('cache_stats')).json()['data']
+
+        self.assertEqual(cabeceras, [None, 'HIT', None])
+        # Los dos resultados rotados (unos 1,5 y 2 KB) no caben juntos en 3000 bytes
+        self.assertEqual(stats, {'enabled': True, 'hits': 1, 'misses': 2, 'evictions': 1})
+
+
+class StreamingZipTests(MediaRootTestCase):
+    """Con PDF_SPLIT_STREAM_ZIP la vista envía el ZIP mientras lo genera (ZipStream)."""
+
+    def setUp(self):
+        super().setUp()
+        self.pdf = crear_pdf(5)
+
+    def _split(self, **data):
+        upload = SimpleUploadedFile('informe.pdf', self.pdf, 'application/pdf')
+        response = self.client.post(reverse('split_pdf'), {'pdf_file': upload, **data})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        bloques = list(response.streaming_content)
+        response.close()
+        return response, bloques
+
+    def _miembros(self, contenido):
+        with zipfile.ZipFile(io.BytesIO(contenido)) as zf:
+            self.assertIsNone(zf.testzip())
+            return [(info.filename, len(PdfReader(io.BytesIO(zf.read(info))).pages)) for info in zf.infolist()]
+
+    @override_settings(PDF_SPLIT_STREAM_ZIP=True)
+    def test_pages_per_file(self):
+        response, bloques = self._split(split_method='pages_per_file', pages_per_file='2')
+        self.assertTrue(response.streaming)
+        self.assertNotIn('Content-Length', response)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="informe_split.zip"')
+        # Un bloque por parte más el directorio central
+        self.assertEqual(len(bloques), 4)
+        self.assertEqual(self._miembros(b''.join(bloques)), [
+            ('informe_parte_1-2.pdf', 2), ('informe_parte_3-4.pdf', 2), ('informe_parte_5-5.pdf', 1),
+        ])
+        self.assertEqual(self.workspace_files(), [])
+
+    @override_settings(PDF_SPLIT_STREAM_ZIP=True)
+    def test_extract_pages_to_separate_pdfs(self):
+        _, bloques = self._split(
+            split_method='extract_pages', pages_specification='1-2, 4', split_into_separate_pdfs='true'
+        )
+        self.assertEqual(self._miembros(b''.join(bloques)), [
+            ('informe_grupo_1_paginas_1_2.pdf', 2), ('informe_grupo_2_paginas_4.pdf', 1),
+        ])
+        self.assertEqual(self.workspace_files(), [])
+
+    def test_stream_matches_the_zip_on_disk(self):
+        with override_settings(PDF_SPLIT_STREAM_ZIP=False):
+            _, en_disco = self._split(split_method='pages_per_file', pages_per_file='2')
+        with override_settings(PDF_SPLIT_STREAM_ZIP=True):
+            _, en_streaming = self._split(split_method='pages_per_file', pages_per_file='2')
+        self.assertEqual(self._miembros(b''.join(en_streaming)), self._miembros(b''.join(en_disco)))
+
+    def test_closing_early_releases_the_input(self):
+        assembler = pdf_processor.open_page_assembler(self.pdf, 'fitz')
+        parts = pdf_processor._plan_pages_per_file(assembler.page_count, 1, 'informe')
+        stream = pdf_processor.ZipStream(assembler, self.pdf, parts, 'fitz', 1)
+        self.assertTrue(next(iter(stream)).startswith(b'PK'))
+        stream.close()
+        self.assertTrue(assembler.doc.is_closed)
+
+
+@mock.patch.object(jobs, 'close_old_connections', lambda: None)
+class JobTests(MediaRootMixin, TestCase):
+    """Progreso informado por la operación y trabajos interrumpidos."""
+
+    def _crear_trabajo(self, operation='split', params=None, status=PDFJob.STATUS_PENDING, paginas=12):
+        job = PDFJob(operation=operation, params=params or {}, status=status)
+        workdir = jobs.job_directory(job.id)
+        os.makedirs(workdir)
+        job.input_files = [os.path.join(workdir, 'entrada_1.pdf')]
+        with open(job.input_files[0], 'wb') as f:
+            f.write(crear_pdf(paginas))
+        job.save()
+        return job
+
+    def test_progress_comes_from_the_operation(self):
+        job = self._crear_trabajo(params={'split_method': 'pages_per_file', 'pages_per_file': '2'})
+        registrado = []
+        original = jobs.JobProgress.__call__
+
+        def registrar(progress, done, total):
+            original(progress, done, total)
+            registrado.append(PDFJob.objects.get(pk=job.pk).progress)
+
+        with mock.patch.object(jobs, 'PROGRESS_SAVE_INTERVAL', 0), \
+                mock.patch.object(jobs.JobProgress, '__call__', registrar):
+            jobs.run_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, PDFJob.STATUS_DONE)
+        self.assertEqual(job.progress, 100)
+        # Seis partes: el avance sube en seis pasos hasta PROGRESS_WORK_DONE
+        self.assertEqual(len(registrado), 6)
+        self.assertEqual(registrado, sorted(registrado))
+        self.assertGreater(registrado[0], jobs.PROGRESS_STARTED)
+        self.assertEqual(registrado[-1], jobs.PROGRESS_WORK_DONE)
+
+    def test_progress_saves_are_throttled(self):
+        job = self._crear_trabajo()
+        job.progress = jobs.PROGRESS_STARTED
+        progress = jobs.JobProgress(job)
+        with mock.patch.object(jobs.time, 'monotonic', return_value=1000.0):
+            progress(1, 10)
+            progress(2, 10)
+            self.assertEqual(PDFJob.objects.get(pk=job.pk).progress, 18)
+            # El final del tramo no espera al intervalo
+            progress(10, 10)
+            self.assertEqual(PDFJob.objects.get(pk=job.pk).progress, jobs.PROGRESS_WORK_DONE)
+            # Nunca retrocede
+            progress(3, 10)
+            self.assertEqual(PDFJob.objects.get(pk=job.pk).progress, jobs.PROGRESS_WORK_DONE)
+
+    @override_settings(PDF_JOB_STALE_AFTER=60)
+    def test_interrupted_jobs_are_marked_as_errors(self):
+        antiguo = timezone.now() - timedelta(minutes=5)
+        interrumpido = self._crear_trabajo(
+            operation='unlock', params={'password': 'clave'}, status=PDFJob.STATUS_RUNNING
+        )
+        pendiente = self._crear_trabajo(status=PDFJob.STATUS_PENDING)
+        en_este_proceso = self._crear_trabajo(status=PDFJob.STATUS_RUNNING)
+        reciente = self._crear_trabajo(status=PDFJob.STATUS_RUNNING)
+        PDFJob.objects.exclude(pk=reciente.pk).update(updated_at=antiguo)
+
+        with mock.patch.object(jobs, '_active_jobs', {en_este_proceso.id}):
+            response = self.client.get(reverse('job_status', args=[interrumpido.id]))
+
+        self.assertEqual(response.json()['data']['job_status'], PDFJob.STATUS_ERROR)
+        interrumpido.refresh_from_db()
+        self.assertNotIn('password', interrumpido.params)
+        self.assertFalse(os.path.exists(interrumpido.input_files[0]))
+        estados = dict(PDFJob.objects.values_list('pk', 'status'))
+        self.assertEqual(estados[pendiente.pk], PDFJob.STATUS_ERROR)
+        self.assertEqual(estados[en_este_proceso.pk], PDFJob.STATUS_RUNNING)
+        self.assertEqual(estados[reciente.pk], PDFJob.STATUS_RUNNING)
+
+        # El conserje de trabajos también los recoge, y ya marcados no caducan enseguida
+        PDFJob.objects.filter(pk=reciente.pk).update(updated_at=antiguo)
+        jobs.purge_expired_jobs()
+        self.assertEqual(PDFJob.objects.get(pk=reciente.pk).status, PDFJob.STATUS_ERROR)
+
+    @override_settings(PDF_JOB_RESULT_TTL=60, PDF_JOB_STALE_AFTER=0)
+    def test_purge_keeps_unfinished_jobs(self):
+        antiguo = timezone.now() - timedelta(minutes=5)
+        trabajos = {
+            status: self._crear_trabajo(operation='rotate', status=status)
+            for status in (PDFJob.STATUS_PENDING, PDFJob.STATUS_RUNNING, PDFJob.STATUS_DONE, PDFJob.STATUS_ERROR)
+        }
+        en_este_proceso = self._crear_trabajo(status=PDFJob.STATUS_DONE)
+        PDFJob.objects.update(updated_at=antiguo)
+
+        with mock.patch.object(jobs, '_active_jobs', {en_este_proceso.id}):
+            jobs.purge_expired_jobs()
+
+        restantes = set(PDFJob.objects.values_list('pk', flat=True))
+        self.assertEqual(restantes, {
+            trabajos[PDFJob.STATUS_PENDING].pk, trabajos[PDFJob.STATUS_RUNNING].pk, en_este_proceso.pk
+        })
+        self.assertTrue(os.path.exists(trabajos[PDFJob.STATUS_RUNNING].input_files[0]))
+        self.assertFalse(os.path.exists(jobs.job_directory(trabajos[PDFJob.STATUS_DONE].id)))
+
+    def test_password_is_dropped_when_the_worker_starts(self):
+        data = crear_pdf(2, **CIFRADO)
+        job = self._crear_trabajo(operation='unlock', params={'password': 'usuario'})
+        with open(job.input_files[0], 'wb') as f:
+            f.write(data)
+        guardado = []
+        remover = pdf_processor.remover_contraseña_pdf
+
+        def remover_registrando(*args, **kwargs):
+            guardado.append(PDFJob.objects.get(pk=job.pk).params)
+            return remover(*args, **kwargs)
+
+        with mock.patch.object(jobs.pdf_processor, 'remover_contraseña_pdf', remover_registrando):
+            jobs.run_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, PDFJob.STATUS_DONE)
+        self.assertEqual(guardado, [{}])
+        self.assertNotIn('password', job.params)
+        doc = fitz.open(job.result_path)
+        self.assertFalse(doc.needs_pass)
+        doc.close()
+
+
+class ProbeTests(SimpleTestCase):
+    """sondear_pdf_protegido: /Encrypt y /Count leídos desde el trailer y la cola del xref."""
+
+    def setUp(self):
+        pdf_processor._probe_cache.clear()
+        self.addCleanup(pdf_processor._probe_cache.clear)
+
+    def _secciones(self, data):
+        lector = pdf_processor._LectorPdf(io.BytesIO(data), len(data))
+        return pdf_processor._leer_secciones(lector)[1]
+
+    def assertProbe(self, data, kinds, is_encrypted, total_pages):
+        self.assertEqual([section.kind for section in self._secciones(data)], kinds)
+        result = pdf_processor.sondear_pdf_protegido(data)
+        self.assertEqual(result['method'], 'trailer')
+        self.assertEqual(result['is_encrypted'], is_encrypted)
+        self.assertEqual(result['needs_password'], is_encrypted)
+        self.assertEqual(result['total_pages'], total_pages)
+        self.assertIsNone(result['error'])
+        return result
+
+    def test_classic_xref(self):
+        self.assertProbe(crear_pdf(3), ['table'], False, 3)
+        self.assertProbe(crear_pdf(3, **CIFRADO), ['table'], True, 0)
+
+    def test_xref_stream(self):
+        self.assertProbe(crear_pdf(3, use_objstms=True), ['stream'], False, 3)
+        self.assertProbe(crear_pdf(3, use_objstms=True, **CIFRADO), ['stream'], True, 0)
+
+    def test_encrypted_xref_stream_is_not_decoded(self):
+        data = crear_pdf(3, use_objstms=True, **CIFRADO)
+        with mock.patch.object(pdf_processor, '_decodificar_stream', side_effect=AssertionError):
+            result = pdf_processor.sondear_pdf_protegido(data)
+        self.assertEqual((result['method'], result['is_encrypted']), ('trailer', True))
+
+    def test_prev_chain(self):
+        self.assertProbe(actualizar_incrementalmente(crear_pdf(3)), ['table', 'table'], False, 4)
+        self.assertProbe(
+            actualizar_incrementalmente(crear_pdf(3, use_objstms=True)), ['stream', 'stream'], False, 4
+        )
+        self.assertProbe(
+            actualizar_incrementalmente(crear_pdf(3, **CIFRADO), 'propietario'), ['table', 'table'], True, 0
+        )
+        self.assertProbe(
+            actualizar_incrementalmente(crear_pdf(3, use_objstms=True, **CIFRADO), 'propietario'),
+            ['stream', 'stream'], True, 0
+        )
+
+    def test_prev_chain_mixing_table_and_stream(self):
+        # Tabla clásica añadida (anexar_actualizacion_incremental) sobre un PDF con xref en stream
+        with tempfile.TemporaryDirectory() as directorio:
+            path = os.path.join(directorio, 'entrada.pdf')
+            with open(path, 'wb') as f:
+                f.write(crear_pdf(3, use_objstms=True))
+            pdf_processor.rotar_pdf(path, path, '1:90')
+            with open(path, 'rb') as f:
+                data = f.read()
+        self.assertProbe(data, ['table', 'stream'], False, 3)
+
+    def test_damaged_tail_falls_back_to_full_analysis(self):
+        casos = [
+            (danar_startxref(crear_pdf(3)), False, 3),
+            (danar_startxref(crear_pdf(3, **CIFRADO_RC4)), True, 0),
+            (crear_pdf(3)[:-200], None, None),
+            (danar_startxref(crear_pdf(3, use_objstms=True), 12), None, None),
+        ]
+        for data, is_encrypted, total_pages in casos:
+            with self.subTest(tail=data[-40:]):
+                result = pdf_processor.sondear_pdf_protegido(data)
+                self.assertEqual(result['method'], 'full')
+                if is_encrypted is None:
+                    # Tampoco PyPDF2 lo puede leer: el error no se memoriza
+                    self.assertTrue(result['error'])
+                    self.assertEqual(pdf_processor.sondear_pdf_protegido(data)['method'], 'full')
+                else:
+                    self.assertIsNone(result['error'])
+                    self.assertEqual(result['is_encrypted'], is_encrypted)
+                    self.assertEqual(result['total_pages'], total_pages)
+
+    def test_results_are_cached_by_content(self):
+        data = crear_pdf(2)
+        self.assertEqual(pdf_processor.sondear_pdf_protegido(data)['method'], 'trailer')
+        cached = pdf_processor.sondear_pdf_protegido(data)
+        self.assertEqual((cached['method'], cached['total_pages']), ('cache', 2))
+
+    def test_path_and_bytes_agree(self):
+        data = crear_pdf(5, use_objstms=True)
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as f:
+            f.write(data)
+            f.flush()
+            desde_ruta = pdf_processor.sondear_pdf_protegido(f.name)
+        pdf_processor._probe_cache.clear()
+        self.assertEqual(desde_ruta, pdf_processor.sondear_pdf_protegido(data))
+
+
+class IncrementalUpdateTests(SimpleTestCase):
+    """anexar_actualizacion_incremental añade una sección válida sin tocar los bytes originales."""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+
+    def _escribir(self, data):
+        path = os.path.join(self.directorio, 'entrada.pdf')
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def _rotar_paginas(self, path, paginas, angle=90):
+        """Cambia /Rotate de las páginas indicadas (desde 0) y añade la actualización."""
+        doc = fitz.open(path)
+        xrefs = [doc.page_xref(page) for page in paginas]
+        for xref in xrefs:
+            doc.xref_set_key(xref, 'Rotate', str(angle))
+        added = pdf_processor.anexar_actualizacion_incremental(doc, path, xrefs)
+        doc.close()
+        return added
+
+    def assertStrictRead(self, path, rotations):
+        with self.assertNoLogs('PyPDF2', level='WARNING'):
+            reader = PdfReader(path, strict=True)
+            self.assertEqual([page.get('/Rotate', 0) for page in reader.pages], rotations)
+        doc = fitz.open(path)
+        self.assertFalse(doc.is_repaired)
+        self.assertEqual([page.rotation for page in doc], rotations)
+        doc.close()
+
+    def _comprobar_actualizacion(self, original):
+        path = self._escribir(original)
+        added = self._rotar_paginas(path, [0, 2])
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        self.assertEqual(len(data), len(original) + added)
+        self.assertEqual(data[:len(original)], original)
+        update = data[len(original):]
+        previous_startxref = re.findall(rb'startxref\s+(\d+)', original)[-1]
+        self.assertIn(b'/Prev ' + previous_startxref, update)
+        original_id = re.search(rb'/ID\s*(\[[^\]]*\])', original).group(1)
+        self.assertIn(b'/ID ' + original_id, update)
+        # Objeto 0 y dos subsecciones de un objeto: las páginas 1 y 3 no son consecutivas
+        self.assertRegex(update, rb'xref\n0 1\n0000000000 65535 f\r\n\d+ 1\n\d{10} 00000 n\r\n\d+ 1\n')
+        self.assertStrictRead(path, [90, 0, 90])
+        return path
+
+    def test_classic_xref_source(self):
+        self._comprobar_actualizacion(crear_pdf(3))
+
+    def test_object_stream_source(self):
+        original = crear_pdf(3, use_objstms=True)
+        doc = fitz.open(stream=original)
+        page_xref = doc.page_xref(0)
+        doc.close()
+        lector = pdf_processor._LectorPdf(io.BytesIO(original), len(original))
+        sections = pdf_processor._leer_secciones(lector)[1]
+        # La página modificada vive dentro de un stream de objetos
+        self.assertEqual(sections[0].buscar(page_xref)[0], 'objstm')
+        self._comprobar_actualizacion(original)
+
+    def test_repeated_updates_chain_through_prev(self):
+        path = self._comprobar_actualizacion(crear_pdf(3))
+        with open(path, 'rb') as f:
+            before = f.read()
+        self._rotar_paginas(path, [1], 180)
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.assertEqual(data[:len(before)], before)
+        self.assertIn(b'/Prev ' + re.findall(rb'startxref\s+(\d+)', before)[-1], data[len(before):])
+        self.assertStrictRead(path, [90, 180, 90])
+
+    def test_no_objects_leaves_file_untouched(self):
+        original = crear_pdf(2)
+        path = self._escribir(original)
+        doc = fitz.open(path)
+        self.assertEqual(pdf_processor.anexar_actualizacion_incremental(doc, path, []), 0)
+        doc.close()
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), original)
+
+    def test_encrypted_source_is_rejected(self):
+        original = crear_pdf(2, **CIFRADO)
+        path = self._escribir(original)
+        doc = fitz.open(path)
+        doc.authenticate('propietario')
+        with self.assertRaises(ValueError):
+            pdf_processor.anexar_actualizacion_incremental(doc, path, [doc.page_xref(0)])
+        doc.close()
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), original)
+
+
+class RotationSpecificationTests(MediaRootTestCase):
+    """Gramática de parse_rotation_specification y su aplicación en rotar_pdf."""
+
+    def test_ranges_and_keywords(self):
+        parse = pdf_processor.parse_rotation_specification
+        self.assertEqual(parse('1-3:+90', 6), [([1, 2, 3], 90, True)])
+        self.assertEqual(parse('even:-90', 6), [([2, 4, 6], -90, True)])
+        self.assertEqual(parse('ODD:180', 6), [([1, 3, 5], 180, False)])
+        self.assertEqual(parse('all:+180', 3), [([1, 2, 3], 180, True)])
+        # Los elementos separados por comas se acumulan hasta el que lleva el ángulo
+        self.assertEqual(parse('1, 3-4:270', 6), [([1, 3, 4], 270, False)])
+        self.assertEqual(parse('1-2:+90; 3:180', 6), [([1, 2], 90, True), ([3], 180, False)])
+
+    def test_selection_without_angle_turns_default_delta(self):
+        self.assertEqual(
+            pdf_processor.parse_rotation_specification('2-3', 6),
+            [([2, 3], pdf_processor.DEFAULT_ROTATION_DELTA, True)]
+        )
+        self.assertEqual(
+            pdf_processor.parse_rotation_specification('1:180, even', 4),
+            [([1], 180, False), ([2, 4], pdf_processor.DEFAULT_ROTATION_DELTA, True)]
+        )
+
+    def test_negative_angles_and_overlapping_rules(self):
+        parse = pdf_processor.parse_rotation_specification
+        self.assertEqual(parse('1:-270', 2), [([1], -270, True)])
+        self.assertEqual(parse('1-4:+90, 2:-90', 6), [([1, 2, 3, 4], 90, True), ([2], -90, True)])
+        # Una página repetida en la misma regla se gira una sola vez
+        self.assertEqual(parse('1, 1-2:+90', 3), [([1, 2], 90, True)])
+
+    def test_invalid_specifications(self):
+        casos = [
+            ('1:45', "Ángulo de rotación inválido: 1:45. Debe ser múltiplo de 90."),
+            ('1:abc', "Ángulo de rotación inválido: 1:abc. Use por ejemplo '90', '+90' o '-90'."),
+            ('1:', "Ángulo de rotación inválido: 1:. Use por ejemplo '90', '+90' o '-90'."),
+            (':90', "La regla de rotación :90 no indica páginas."),
+            (' , ;', "No se indicó ninguna regla de rotación."),
+            ('5-2:90', "Rango inválido: 5-2. El inicio no puede ser mayor que el final."),
+            ('9:90', "Número de página inválido: 9"),
+            ('x:90', "Número de página inválido: x"),
+        ]
+        for spec, message in casos:
+            with self.subTest(spec=spec):
+                with self.assertRaises(ValueError) as raised:
+                    pdf_processor.parse_rotation_specification(spec, 6)
+                self.assertEqual(str(raised.exception), message)
+
+    def _rotar(self, spec, rotaciones_iniciales=(0, 0, 0, 0, 0, 0)):
+        doc = fitz.open(stream=crear_pdf(len(rotaciones_iniciales)))
+        for page, rotation in zip(doc, rotaciones_iniciales):
+            page.set_rotation(rotation)
+        with tempfile.TemporaryDirectory() as directorio:
+            entrada = os.path.join(directorio, 'entrada.pdf')
+            salida = os.path.join(directorio, 'salida.pdf')
+            doc.save(entrada)
+            doc.close()
+            self.assertTrue(pdf_processor.rotar_pdf(entrada, salida, spec))
+            doc = fitz.open(salida)
+            rotations = [page.rotation for page in doc]
+            doc.close()
+        return rotations
+
+    def test_rules_are_applied_in_order(self):
+        self.assertEqual(self._rotar('1-4:+90, 2:-90'), [90, 0, 90, 90, 0, 0])
+        self.assertEqual(self._rotar('all:180, odd:+90'), [270, 180, 270, 180, 270, 180])
+        self.assertEqual(self._rotar('odd:+90, all:180'), [180] * 6)
+
+    def test_relative_angles_start_from_current_rotation(self):
+        self.assertEqual(self._rotar('all:-90', (0, 90, 180, 270)), [270, 0, 90, 180])
+        self.assertEqual(self._rotar('1:-270, 2:+360, 3:0', (0, 90, 180, 270)), [90, 90, 0, 270])
+
+    def test_legacy_dictionary_sets_absolute_angles(self):
+        self.assertEqual(self._rotar({'0': 90, '2': 270, '9': 90, '1': 45}, (180, 180, 180)), [90, 180, 270])
+
+    def test_view_reports_invalid_specifications(self):
+        upload = SimpleUploadedFile('informe.pdf', crear_pdf(3), 'application/pdf')
+        response = self.client.post(reverse('rotate_pdf'), {'pdf_file': upload, 'rotation_spec': '1:45'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {
+            'status': 'error', 'message': "Ángulo de rotación inválido: 1:45. Debe ser múltiplo de 90."
+        })
+
+
+class ZipCompressionTests(MediaRootTestCase):
+    """Políticas de parse_zip_compression y método de compresión de cada entrada del ZIP."""
+
+    def test_policy_parsing(self):
+        parse = pdf_processor.parse_zip_compression
+        self.assertEqual(parse(None), (pdf_processor.DEFAULT_ZIP_COMPRESSION, None))
+        self.assertEqual(parse(''), (pdf_processor.DEFAULT_ZIP_COMPRESSION, None))
+        self.assertEqual(parse('stored'), ('stored', None))
+        self.assertEqual(parse(' AUTO '), ('auto', None))
+        self.assertEqual(parse('deflate'), ('deflate', None))
+        self.assertEqual(parse('deflate:0'), ('deflate', 0))
+        self.assertEqual(parse('Deflate:9'), ('deflate', 9))
+
+    def test_invalid_policies(self):
+        casos = [
+            ('zip', "Política de compresión inválida: zip. Use 'stored', 'deflate', 'deflate:N' o 'auto'."),
+            ('stored:5', "Política de compresión inválida: stored:5. Use 'stored', 'deflate', 'deflate:N' o 'auto'."),
+            ('auto:1', "Política de compresión inválida: auto:1. Use 'stored', 'deflate', 'deflate:N' o 'auto'."),
+            ('deflate:x', "Nivel de compresión inválido: x. Debe ser un entero entre 0 y 9."),
+            ('deflate:10', "Nivel de compresión inválido: 10. Debe ser un entero entre 0 y 9."),
+            ('deflate:-1', "Nivel de compresión inválido: -1. Debe ser un entero entre 0 y 9."),
+        ]
+        for policy, message in casos:
+            with self.subTest(policy=policy):
+                with self.assertRaises(ValueError) as raised:
+                    pdf_processor.parse_zip_compression(policy)
+                self.assertEqual(str(raised.exception), message)
+
+    def _crear_pdf_mixto(self, paginas_con_ruido):
+        """PDF de texto sin comprimir; las páginas indicadas (desde 0) llevan además una imagen de ruido."""
+        doc = fitz.open()
+        for numero in range(4):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Página {numero + 1} " * 40)
+            if numero in paginas_con_ruido:
+                pix = fitz.Pixmap(fitz.csRGB, 200, 200, os.urandom(200 * 200 * 3), False)
+                page.insert_image(fitz.Rect(72, 100, 272, 300), pixmap=pix)
+        data = doc.tobytes()
+        doc.close()
+        return data
+
+    def _zip(self, data, compression):
+        path = os.path.join(self.media_root, 'entrada.pdf')
+        with open(path, 'wb') as f:
+            f.write(data)
+        zip_path = pdf_processor.zip_pdfs(path, self.media_root, 1, 'informe', backend='fitz', compression=compression)
+        with zipfile.ZipFile(zip_path) as zf:
+            entries = zf.infolist()
+            self.assertIsNone(zf.testzip())
+        return entries
+
+    def test_method_per_entry(self):
+        texto = self._crear_pdf_mixto(())
+        for policy, method in [
+            ('stored', zipfile.ZIP_STORED),
+            ('deflate', zipfile.ZIP_DEFLATED),
+            ('deflate:0', zipfile.ZIP_DEFLATED),
+            ('auto', zipfile.ZIP_DEFLATED),
+        ]:
+            with self.subTest(policy=policy):
+                entries = self._zip(texto, policy)
+                self.assertEqual(len(entries), 4)
+                self.assertEqual({entry.compress_type for entry in entries}, {method})
+
+        # Con nivel 0 deflate no reduce nada; el 9 comprime más que el 1
+        nivel_0 = sum(entry.compress_size for entry in self._zip(texto, 'deflate:0'))
+        nivel_1 = sum(entry.compress_size for entry in self._zip(texto, 'deflate:1'))
+        nivel_9 = sum(entry.compress_size for entry in self._zip(texto, 'deflate:9'))
+        self.assertGreaterEqual(nivel_0, sum(entry.file_size for entry in self._zip(texto, 'stored')))
+        self.assertLessEqual(nivel_9, nivel_1)
+
+    def test_auto_stores_incompressible_parts(self):
+        entries = self._zip(self._crear_pdf_mixto(range(4)), 'auto')
+        self.assertEqual({entry.compress_type for entry in entries}, {zipfile.ZIP_STORED})
+
+    def test_auto_decides_from_the_first_part(self):
+        # La primera parte decide la política de todo el archivo
+        incompresible_primero = self._zip(self._crear_pdf_mixto((0,)), 'auto')
+        self.assertEqual({entry.compress_type for entry in incompresible_primero}, {zipfile.ZIP_STORED})
+        compresible_primero = self._zip(self._crear_pdf_mixto((1, 2, 3)), 'auto')
+        self.assertEqual({entry.compress_type for entry in compresible_primero}, {zipfile.ZIP_DEFLATED})
+
+    def test_view_rejects_invalid_policy(self):
+        upload = SimpleUploadedFile('informe.pdf', crear_pdf(2), 'application/pdf')
+        response = self.client.post(reverse('split_pdf'), {
+            'pdf_file': upload, 'split_method': 'pages_per_file', 'pages_per_file': '1',
+            'zip_compression': 'deflate:12',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], "Nivel de compresión inválido: 12. Debe ser un entero entre 0 y 9.")
+
+
+class JoinUploadHandlerTests(MediaRootTestCase):
+    """Unión mientras llega el cuerpo, rechazo temprano de partes y CSRF en join_pdfs_view."""
+
+    def _parsear(self, archivos):
+        """
+        Pasa por MultiPartParser un cuerpo con archivos ([(nombre, bytes)]) en pdf_files.
+
+        Returns:
+            tuple: (manejador, cuerpo, posición del cuerpo al agregar cada PDF, stream)
+        """
+        body = encode_multipart(BOUNDARY, {
+            'pdf_files': [SimpleUploadedFile(nombre, data, 'application/pdf') for nombre, data in archivos],
+        })
+        stream = io.BytesIO(body)
+        handler = JoinUploadHandler()
+        posiciones = []
+        append = handler.joiner.append
+
+        def append_registrando(*args, **kwargs):
+            posiciones.append(stream.tell())
+            return append(*args, **kwargs)
+
+        handler.joiner.append = append_registrando
+        self.addCleanup(handler.joiner.close)
+        parser = MultiPartParser(
+            {'CONTENT_TYPE': MULTIPART_CONTENT, 'CONTENT_LENGTH': str(len(body))}, stream, [handler]
+        )
+        parser.parse()
+        return handler, body, posiciones, stream
+
+    def _pdf_grande(self, kb):
+        """PDF válido seguido de un comentario de relleno hasta superar kb KB."""
+        return crear_pdf(1) + b'\n%' + b'0' * (kb * 1024)
+
+    def _paginas(self, data):
+        return len(PdfReader(io.BytesIO(data)).pages)
+
+    def test_merges_while_body_streams(self):
+        handler, body, posiciones, _ = self._parsear([
+            ('a.pdf', crear_pdf(2)),
+            ('b.pdf', crear_pdf(3)),
+            ('c.pdf', self._pdf_grande(300)),
+        ])
+        self.assertIsNone(handler.error)
+        self.assertEqual(handler.joiner.count, 3)
+        # Los dos primeros se agregan antes de leer la última parte del cuerpo
+        self.assertEqual(len(posiciones), 3)
+        self.assertLess(posiciones[1], len(body) // 2)
+
+    def test_view_returns_merged_pdf(self):
+        response = self.client.post(reverse('join_pdf'), {'pdf_files': [
+            SimpleUploadedFile('a.pdf', crear_pdf(2), 'application/pdf'),
+            SimpleUploadedFile('b.pdf', crear_pdf(3), 'application/pdf'),
+        ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(self._paginas(b''.join(response.streaming_content)), 5)
+
+    def test_rejects_non_pdf_part(self):
+        handler, _, posiciones, _ = self._parsear([
+            ('notas.pdf', b'esto no es un PDF' * 100),
+            ('b.pdf', crear_pdf(3)),
+        ])
+        self.assertEqual(handler.error, "El archivo notas.pdf no es un PDF válido o está corrupto.")
+        self.assertEqual(posiciones, [])
+        self.assertEqual(handler.joiner.count, 0)
+
+        response = self.client.post(reverse('join_pdf'), {'pdf_files': [
+            SimpleUploadedFile('a.pdf', crear_pdf(2), 'application/pdf'),
+            SimpleUploadedFile('notas.pdf', b'esto no es un PDF', 'application/pdf'),
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {
+            'status': 'error', 'message': "El archivo notas.pdf no es un PDF válido o está corrupto."
+        })
+
+    @override_settings(PDF_JOIN_MAX_FILE_SIZE=1024 * 1024)
+    def test_rejects_part_over_size_limit(self):
+        handler, _, posiciones, _ = self._parsear([
+            ('grande.pdf', self._pdf_grande(1100)),
+            ('b.pdf', crear_pdf(3)),
+        ])
+        self.assertEqual(handler.error, "El archivo grande.pdf es demasiado grande. Máximo 1MB permitido.")
+        self.assertEqual(posiciones, [])
+
+        # Justo en el límite se acepta
+        handler, _, posiciones, _ = self._parsear([('limite.pdf', crear_pdf(1).ljust(1024 * 1024, b'\n'))])
+        self.assertIsNone(handler.error)
+        self.assertEqual(handler.joiner.count, 1)
+
+        response = self.client.post(reverse('join_pdf'), {'pdf_files': [
+            SimpleUploadedFile('a.pdf', crear_pdf(2), 'application/pdf'),
+            SimpleUploadedFile('grande.pdf', self._pdf_grande(1100), 'application/pdf'),
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], "El archivo grande.pdf es demasiado grande. Máximo 1MB permitido.")
+
+    def test_abort_on_error_stops_reading_body(self):
+        archivos = [('grande.pdf', self._pdf_grande(1100)), ('b.pdf', crear_pdf(3))]
+        with override_settings(PDF_JOIN_MAX_FILE_SIZE=512 * 1024, PDF_JOIN_ABORT_ON_ERROR=True):
+            handler, body, _, stream = self._parsear(archivos)
+        self.assertIsNotNone(handler.error)
+        self.assertLess(stream.tell(), len(body))
+
+        # Sin cortar la conexión el resto del cuerpo se lee y se descarta
+        with override_settings(PDF_JOIN_MAX_FILE_SIZE=512 * 1024, PDF_JOIN_ABORT_ON_ERROR=False):
+            handler, body, _, stream = self._parsear(archivos)
+        self.assertIsNotNone(handler.error)
+        self.assertEqual(stream.tell(), len(body))
+
+    def test_csrf_still_enforced(self):
+        client = Client(enforce_csrf_checks=True)
+        data = lambda: {'pdf_files': [SimpleUploadedFile('a.pdf', crear_pdf(2), 'application/pdf')]}
+
+        self.assertEqual(client.post(reverse('join_pdf'), data()).status_code, 403)
+
+        page = client.get(reverse('join_pdf'))
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page.content.decode()).group(1)
+        response = client.post(reverse('join_pdf'), {**data(), 'csrfmiddlewaretoken': token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._paginas(b''.join(response.streaming_content)), 2)
+
+
+class HandleCacheTests(MediaRootTestCase):
+    """Documentos que check_pdf_status deja abiertos para el desbloqueo (X-PDF-Handle)."""
+
+    def setUp(self):
+        super().setUp()
+        handles._handle_cache = None
+        self.addCleanup(setattr, handles, '_handle_cache', None)
+
+    def _status(self, data, nombre='informe.pdf'):
+        response = self.client.post(reverse('check_pdf_status'), {
+            'pdf_file': SimpleUploadedFile(nombre, data, 'application/pdf'),
+        })
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def _unlock(self, data, password='usuario', nombre='informe.pdf'):
+        response = self.client.post(reverse('unlock_pdf'), {
+            'pdf_file': SimpleUploadedFile(nombre, data, 'application/pdf'), 'password': password,
+        })
+        if response.status_code == 200:
+            response.contenido = b''.join(response.streaming_content)
+            response.close()
+        return response
+
+    def test_unlock_reuses_the_status_document(self):
+        protegido = crear_pdf(2, **CIFRADO)
+        self.assertIn(handles.HANDLE_COOKIE, self._status(protegido).cookies)
+        self.assertEqual(handles.get_handle_cache().stats()['entries'], 1)
+
+        # Con contraseña incorrecta el documento vuelve a la caché para el reintento
+        self.assertEqual(self._unlock(protegido, password='otra').status_code, 400)
+        response = self._unlock(protegido)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-PDF-Handle'], 'reused')
+        self.assertFalse(fitz.open(stream=response.contenido).needs_pass)
+        self.assertEqual(handles.get_handle_cache().stats(), {'entries': 0, 'hits': 2, 'misses': 0})
+
+        # Cada documento se usa una sola vez
+        self.assertEqual(self._unlock(protegido)['X-PDF-Handle'], 'opened')
+
+    def test_bad_cookie_signature_is_ignored(self):
+        protegido = crear_pdf(2, **CIFRADO)
+        self._status(protegido)
+        # Mismo token con otra firma
+        token, _, firma = self.client.cookies[handles.HANDLE_COOKIE].value.rpartition(':')
+        self.client.cookies[handles.HANDLE_COOKIE] = f"{token}:{firma[::-1]}"
+
+        response = self._unlock(protegido)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-PDF-Handle'], 'opened')
+        # El documento del token original sigue en la caché sin usarse
+        self.assertEqual(handles.get_handle_cache().stats()['entries'], 1)
+
+    def test_handle_is_not_served_for_another_file(self):
+        self._status(crear_pdf(2, **CIFRADO))
+        otro = crear_pdf(5, **CIFRADO)
+        response = self._unlock(otro)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-PDF-Handle'], 'opened')
+        self.assertEqual(fitz.open(stream=response.contenido).page_count, 5)
+        self.assertEqual(handles.get_handle_cache().stats()['entries'], 1)
+
+    @override_settings(PDF_HANDLE_CACHE_TTL=60)
+    def test_handles_expire_after_ttl(self):
+        protegido = crear_pdf(2, **CIFRADO)
+        with mock.patch.object(handles.time, 'monotonic', return_value=1000.0):
+            self._status(protegido)
+        with mock.patch.object(handles.time, 'monotonic', return_value=1061.0):
+            response = self._unlock(protegido)
+        self.assertEqual(response['X-PDF-Handle'], 'opened')
+        self.assertEqual(handles.get_handle_cache().stats(), {'entries': 0, 'hits': 0, 'misses': 1})
+
+        cache = handles.DocumentHandleCache(ttl=60, max_entries=4)
+        doc = mock.Mock()
+        with mock.patch.object(handles.time, 'monotonic', return_value=1000.0):
+            cache.put('a', doc)
+        with mock.patch.object(handles.time, 'monotonic', return_value=1060.0):
+            self.assertIs(cache.pop('a'), doc)
+            cache.put('a', doc)
+        with mock.patch.object(handles.time, 'monotonic', return_value=1121.0):
+            self.assertIsNone(cache.pop('a'))
+        doc.close.assert_called_once()
+
+    def test_evicts_least_recently_stored_beyond_max_entries(self):
+        cache = handles.get_handle_cache()
+        self.assertEqual(cache.max_entries, 32)
+        docs = [mock.Mock() for _ in range(33)]
+        for n, doc in enumerate(docs):
+            cache.put(f'clave{n}', doc)
+
+        self.assertEqual(cache.stats()['entries'], 32)
+        docs[0].close.assert_called_once()
+        self.assertIsNone(cache.pop('clave0'))
+        self.assertIs(cache.pop('clave1'), docs[1])
+        self.assertIs(cache.pop('clave32'), docs[32])
+        for doc in docs[1:]:
+            doc.close.assert_not_called()
+
+        # Volver a guardar una clave cierra el documento que sustituye
+        cache.put('clave2', docs[1])
+        docs[2].close.assert_called_once()
+
+    @override_settings(PDF_HANDLE_CACHE_TTL=0)
+    def test_disabled_cache(self):
+        protegido = crear_pdf(2, **CIFRADO)
+        self.assertNotIn(handles.HANDLE_COOKIE, self._status(protegido).cookies)
+        self.assertIsNone(handles.get_handle_cache())
+        self.assertEqual(self._unlock(protegido)['X-PDF-Handle'], 'opened')
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    """ContentAwareCompressionMiddleware comprime solo el texto que de verdad se reduce."""
+
+    TEXTO = ('<p>Página de prueba</p>\n' * 200).encode('utf-8')
+
+    def _procesar(self, response, accept_encoding='gzip, br'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return middleware_module.ContentAwareCompressionMiddleware(lambda request: response)(request)
+
+    def test_text_and_json_are_gzipped(self):
+        with mock.patch.object(middleware_module, 'brotli', None):
+            html = self._procesar(HttpResponse(self.TEXTO, content_type='text/html; charset=utf-8'))
+            datos = {'status': 'success', 'data': ['elemento'] * 200}
+            json_response = self._procesar(JsonResponse(datos))
+
+        self.assertEqual(html['Content-Encoding'], 'gzip')
+        self.assertEqual(html['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(html.content), self.TEXTO)
+        self.assertEqual(html['Content-Length'], str(len(html.content)))
+        self.assertEqual(json_response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(json_response.content), JsonResponse(datos).content)
+
+    def test_without_accepted_encoding_or_small_bodies(self):
+        response = self._procesar(HttpResponse(self.TEXTO, content_type='text/html'), accept_encoding='identity')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+        response = self._procesar(HttpResponse(b'<p>corto</p>', content_type='text/html'))
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_pdf_zip_and_partial_responses_pass_through(self):
+        for content_type in ('application/pdf', 'application/zip', 'image/png'):
+            with self.subTest(content_type=content_type):
+                response = self._procesar(HttpResponse(self.TEXTO, content_type=content_type))
+                self.assertNotIn('Content-Encoding', response)
+                self.assertNotIn('Vary', response)
+                self.assertEqual(response.content, self.TEXTO)
+
+        parcial = HttpResponse(self.TEXTO, content_type='text/html', status=206)
+        self.assertNotIn('Content-Encoding', self._procesar(parcial))
+
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        path = os.path.join(directorio, 'salida.pdf')
+        pdf = crear_pdf(1)
+        with open(path, 'wb') as f:
+            f.write(pdf)
+        archivo = self._procesar(FileResponse(open(path, 'rb'), content_type='application/pdf'))
+        self.assertNotIn('Content-Encoding', archivo)
+        self.assertEqual(b''.join(archivo.streaming_content), pdf)
+        archivo.close()
+
+    def test_streaming_text_is_gzipped_by_chunks(self):
+        response = self._procesar(StreamingHttpResponse(iter([self.TEXTO, self.TEXTO]), content_type='text/plain'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response)
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.TEXTO * 2)
+
+    def test_high_entropy_bodies_are_skipped(self):
+        aleatorio = os.urandom(8192)
+        response = self._procesar(HttpResponse(aleatorio, content_type='text/plain'))
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response.content, aleatorio)
+        self.assertGreater(middleware_module.shannon_entropy(aleatorio), 7.5)
+        self.assertEqual(middleware_module.shannon_entropy(b'aaaa'), 0.0)
+
+    def test_falls_back_to_gzip_without_brotli(self):
+        with mock.patch.object(middleware_module, 'brotli', None):
+            response = self._procesar(HttpResponse(self.TEXTO, content_type='text/html'), accept_encoding='br')
+            self.assertNotIn('Content-Encoding', response)
+            response = self._procesar(HttpResponse(self.TEXTO, content_type='text/html'), accept_encoding='br, gzip;q=0.5')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            response = self._procesar(HttpResponse(self.TEXTO, content_type='text/html'), accept_encoding='br, gzip;q=0')
+            self.assertNotIn('Content-Encoding', response)
+
+    @unittest.skipUnless(middleware_module.brotli, "brotli no está instalado")
+    def test_brotli_for_html_and_json(self):
+        response = self._procesar(HttpResponse(self.TEXTO, content_type='text/html'))
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(middleware_module.brotli.decompress(response.content), self.TEXTO)
+        # El resto de tipos de texto siguen con gzip
+        response = self._procesar(HttpResponse(self.TEXTO, content_type='text/css'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+
+class UploadSourceTests(MediaRootTestCase):
+    """Las vistas leen la subida del temporal de Django o de memoria, sin copiarla a MEDIA_ROOT."""
+
+    def test_in_memory_upload_returns_bytes(self):
+        data = crear_pdf(1)
+        upload = InMemoryUploadedFile(io.BytesIO(data), 'pdf_file', 'a.pdf', 'application/pdf', len(data), None)
+        upload.read(10)
+        self.assertEqual(upload_source(upload), data)
+
+    def test_temporary_upload_returns_its_path(self):
+        upload = TemporaryUploadedFile('a.pdf', 'application/pdf', 0, None)
+        self.addCleanup(upload.close)
+        upload.write(crear_pdf(1))
+        upload.flush()
+        self.assertEqual(upload_source(upload), upload.temporary_file_path())
+        self.assertEqual(upload_sources([upload, upload]), [upload.temporary_file_path()] * 2)
+
+    def _post_capturando_entrada(self, url, funcion, data):
+        entradas = []
+        original = getattr(pdf_processor, funcion)
+
+        def registrar(source, *args, **kwargs):
+            entradas.append(source)
+            archivos_media.append(sorted(
+                os.path.relpath(os.path.join(dirpath, filename), self.media_root)
+                for dirpath, _, filenames in os.walk(self.media_root) for filename in filenames
+            ))
+            return original(source, *args, **kwargs)
+
+        archivos_media = []
+        with mock.patch.object(pdf_processor, funcion, side_effect=registrar):
+            response = self.client.post(url, data)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            response.close()
+        self.assertEqual(response.status_code, 200)
+        return entradas[0], archivos_media[0]
+
+    def _peticiones(self):
+        imagen = io.BytesIO()
+        Image.new('RGB', (40, 30), 'red').save(imagen, 'PNG')
+        pdf = lambda **opciones: SimpleUploadedFile('informe.pdf', crear_pdf(3, **opciones), 'application/pdf')
+        return [
+            ('compress_pdf', 'comprimir_pdf', {'pdf_file': pdf()}),
+            ('rotate_pdf', 'rotar_pdf', {'pdf_file': pdf(), 'rotation_spec': 'all:90'}),
+            ('split_pdf', 'split_pdf_by_range', {
+                'pdf_file': pdf(), 'split_method': 'page_range', 'start_page': '1', 'end_page': '2',
+            }),
+            ('unlock_pdf', 'desbloquear_pdf', {'pdf_file': pdf(**CIFRADO), 'password': 'usuario'}),
+            ('convert_image_to_pdf', 'convert_images_to_pdf_with_options', {
+                'image_files': SimpleUploadedFile('foto.png', imagen.getvalue(), 'image/png'),
+            }),
+        ]
+
+    def _comprobar_vistas(self, en_memoria):
+        for url, funcion, data in self._peticiones():
+            with self.subTest(view=url):
+                source, archivos_media = self._post_capturando_entrada(reverse(url), funcion, data)
+                if funcion == 'convert_images_to_pdf_with_options':
+                    source = source[0]
+                if en_memoria:
+                    self.assertIsInstance(source, bytes)
+                else:
+                    self.assertIsInstance(source, str)
+                    self.assertNotEqual(os.path.commonpath([self.media_root, source]), self.media_root)
+                # Al empezar a procesar no hay ningún archivo en MEDIA_ROOT: la subida no se copió
+                self.assertEqual(archivos_media, [])
+                self.assertEqual(self.workspace_files(), [])
+
+    def test_views_use_the_bytes_in_memory(self):
+        self._comprobar_vistas(en_memoria=True)
+
+    def test_views_use_django_temporary_file(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        with override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0, FILE_UPLOAD_TEMP_DIR=directorio):
+            self._comprobar_vistas(en_memoria=False)
+        # Django borra sus temporales al terminar cada petición
+        self.assertEqual(os.listdir(directorio), [])
+
+
+class UnlockEngineTests(SimpleTestCase):
+    """remover_contraseña_pdf con cada motor, el paso de 'fitz' a 'pages' y las contraseñas incorrectas."""
+
+    # (motor, motor de páginas, cifrado): PyPDF2 sin PyCryptodome solo abre RC4
+    MOTORES = [
+        ('fitz', 'fitz', CIFRADO),
+        ('fitz', 'pypdf2', CIFRADO_RC4),
+        ('pages', 'fitz', CIFRADO),
+        ('pages', 'pypdf2', CIFRADO_RC4),
+    ]
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        self.salida = os.path.join(self.directorio, 'salida', 'sin_contraseña.pdf')
+
+    def _comprobar_salida(self, paginas=3):
+        doc = fitz.open(self.salida)
+        self.assertFalse(doc.is_encrypted)
+        self.assertEqual(doc.page_count, paginas)
+        self.assertEqual(doc[0].get_text().strip(), "Página 1")
+        doc.close()
+
+    def _crear_pdf(self, **cifrado):
+        doc = fitz.open()
+        for numero in range(3):
+            doc.new_page().insert_text((72, 72), f"Página {numero + 1}")
+        data = doc.tobytes(**cifrado)
+        doc.close()
+        return data
+
+    def test_each_engine_with_user_and_owner_password(self):
+        for engine, backend, cifrado in self.MOTORES:
+            protegido = self._crear_pdf(**cifrado)
+            for password in ('usuario', 'propietario'):
+                with self.subTest(engine=engine, backend=backend, password=password):
+                    self.assertTrue(pdf_processor.remover_contraseña_pdf(
+                        protegido, self.salida, password, backend=backend, engine=engine
+                    ))
+                    self._comprobar_salida()
+                    os.remove(self.salida)
+
+    def test_owner_password_only(self):
+        for engine, backend, cifrado in self.MOTORES:
+            solo_propietario = self._crear_pdf(**dict(cifrado, user_pw=''))
+            with self.subTest(engine=engine, backend=backend):
+                self.assertTrue(pdf_processor.remover_contraseña_pdf(
+                    solo_propietario, self.salida, 'propietario', backend=backend, engine=engine
+                ))
+                self._comprobar_salida()
+                os.remove(self.salida)
+                with self.assertRaisesMessage(ValueError, "Contraseña incorrecta"):
+                    pdf_processor.remover_contraseña_pdf(
+                        solo_propietario, self.salida, 'otra', backend=backend, engine=engine
+                    )
+
+    def test_wrong_password(self):
+        for engine, backend, cifrado in self.MOTORES:
+            with self.subTest(engine=engine, backend=backend):
+                with self.assertRaisesMessage(ValueError, "Contraseña incorrecta. No se pudo desencriptar el PDF"):
+                    pdf_processor.remover_contraseña_pdf(
+                        self._crear_pdf(**cifrado), self.salida, 'otra', backend=backend, engine=engine
+                    )
+                self.assertFalse(os.path.exists(self.salida))
+
+    def test_fitz_falls_back_to_pages(self):
+        save = fitz.Document.save
+
+        def guardar(doc, *args, **kwargs):
+            # Solo falla el guardado sin cifrado del documento completo
+            if 'encryption' in kwargs:
+                raise RuntimeError("no se puede guardar")
+            return save(doc, *args, **kwargs)
+
+        for backend, cifrado in (('fitz', CIFRADO), ('pypdf2', CIFRADO_RC4)):
+            protegido = self._crear_pdf(**cifrado)
+            with self.subTest(backend=backend):
+                with mock.patch.object(fitz.Document, 'save', guardar):
+                    result = pdf_processor.desbloquear_pdf(
+                        protegido, self.salida, 'usuario', backend=backend, engine='fitz'
+                    )
+                self.assertEqual(result['engine'], 'pages')
+                self.assertEqual(result['output_path'], self.salida)
+                self.assertEqual((result['auth'], result['total_pages']), (1, 3))
+                self._comprobar_salida()
+                os.remove(self.salida)
+
+    def test_invalid_inputs(self):
+        for engine in pdf_processor.UNLOCK_ENGINES:
+            with self.subTest(engine=engine):
+                with self.assertRaisesMessage(ValueError, "El PDF no está protegido con contraseña"):
+                    pdf_processor.remover_contraseña_pdf(crear_pdf(1), self.salida, 'usuario', engine=engine)
+                with self.assertRaisesMessage(ValueError, "La contraseña no puede estar vacía"):
+                    pdf_processor.remover_contraseña_pdf(self._crear_pdf(**CIFRADO), self.salida, '  ', engine=engine)
+        with self.assertRaisesMessage(ValueError, "Motor de desbloqueo desconocido: qpdf"):
+            pdf_processor.remover_contraseña_pdf(self._crear_pdf(**CIFRADO), self.salida, 'usuario', engine='qpdf')
@@ -0,0 +1,118 @@
+"""
+Entrada de los archivos subidos sin copiarlos a MEDIA_ROOT.
+
+Django ya deja cada subida en memoria (InMemoryUploadedFile, hasta
+FILE_UPLOAD_MAX_MEMORY_SIZE bytes) o en un archivo temporal propio
+(TemporaryUploadedFile, en FILE_UPLOAD_TEMP_DIR). Las funciones de pdf_processor
+aceptan una ruta o el contenido en bytes, así que se les pasa directamente la
+ruta del temporal o los bytes de la subida: los PDF pequeños no tocan el disco y
+los grandes se escriben una sola vez. Django borra su temporal al cerrar la
+petición, después de enviar la respuesta.
+
+JoinUploadHandler va un paso más allá para la unión: procesa cada PDF en cuanto
+termina de llegar su parte del cuerpo multipart, mientras el resto sigue
+subiendo.
+"""
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+from .funciones_python import pdf as pdf_processor
+
+# El encabezado %PDF- debe aparecer en el primer KB del archivo
+PDF_HEADER_WINDOW = 1024
+
+
+def upload_source(uploaded_file):
+    """
+    Devuelve la ruta del temporal de Django o el contenido en memoria de la subida.
+
+    Returns:
+        str | bytes: Entrada para las funciones de pdf_processor
+    """
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        return uploaded_file.temporary_file_path()
+
+    uploaded_file.seek(0)
+    return uploaded_file.read()
+
+
+def upload_sources(uploaded_files) -> list:
+    """upload_source para cada archivo, en el mismo orden."""
+    return [upload_source(uploaded_file) for uploaded_file in uploaded_files]
+
+
+class JoinUploadHandler(FileUploadHandler):
+    """
+    Une los PDF del campo pdf_files a medida que llegan en el cuerpo de la petición.
+
+    Cada archivo se recibe en un SpooledTemporaryFile (en memoria hasta
+    FILE_UPLOAD_MAX_MEMORY_SIZE) y, al completarse su parte, se valida y se agrega
+    a self.joiner (IncrementalPdfJoiner) mientras el resto del cuerpo sigue
+    llegando. Un archivo sin encabezado %PDF- en su primer KB o que no se puede
+    leer, o que supera PDF_JOIN_MAX_FILE_SIZE bytes, detiene la subida con
+    StopUpload y su error queda en self.error; con PDF_JOIN_ABORT_ON_ERROR se
+    corta la conexión en lugar de descartar el resto.
+
+    Debe ser el único manejador de la petición: los archivos no llegan a
+    request.FILES.
+    """
+
+    field_name = 'pdf_files'
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.joiner = pdf_processor.IncrementalPdfJoiner()
+        self.error = None
+        self.part = None
+        self.header = b''
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.header = b''
+        if field_name != self.field_name:
+            self.part = None
+            return
+        self.part = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE,
+            dir=settings.FILE_UPLOAD_TEMP_DIR
+        )
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.part is None:
+            return None
+        if len(self.header) < PDF_HEADER_WINDOW:
+            self.header += raw_data[:PDF_HEADER_WINDOW - len(self.header)]
+            if len(self.header) >= PDF_HEADER_WINDOW and b'%PDF-' not in self.header:
+                self._reject(f"El archivo {self.file_name} no es un PDF válido o está corrupto.")
+        max_size = getattr(settings, 'PDF_JOIN_MAX_FILE_SIZE', None)
+        if max_size and start + len(raw_data) > max_size:
+            self._reject(
+                f"El archivo {self.file_name} es demasiado grande. Máximo {max_size // (1024 * 1024)}MB permitido."
+            )
+        self.part.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.part is None:
+            return None
+        part, self.part = self.part, None
+        if b'%PDF-' not in self.header:
+            part.close()
+            self._reject(f"El archivo {self.file_name} no es un PDF válido o está corrupto.")
+        try:
+            self.joiner.append(part, self.file_name)
+        except Exception as e:
+            self._reject(str(e))
+        return None
+
+    def upload_interrupted(self):
+        if self.part is not None:
+            self.part.close()
+            self.part = None
+
+    def _reject(self, message):
+        self.error = message
+        self.upload_interrupted()
+        raise StopUpload(connection_reset=getattr(settings, 'PDF_JOIN_ABORT_ON_ERROR', False))
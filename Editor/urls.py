@@ -10,4 +10,9 @@ urlpatterns = [
     path('desbloquear/', views.unlock_pdf_view, name='unlock_pdf'),
     path('check-pdf-status/', views.check_pdf_status, name='check_pdf_status'),
     path('imagen/', views.convert_images_to_pdf_view, name='convert_image_to_pdf'),
+    path('cache/stats/', views.cache_stats_view, name='cache_stats'),
+    path('cleanup/stats/', views.cleanup_stats_view, name='cleanup_stats'),
+    path('jobs/<uuid:job_id>/', views.job_status_view, name='job_status'),
+    path('jobs/<uuid:job_id>/download/', views.job_download_view, name='job_download'),
+    path('jobs/<str:operation>/', views.submit_job_view, name='submit_job'),
 ]
\ No newline at end of file
@@ -1,56 +1,98 @@
 from django.shortcuts import render
-from django.http import HttpResponse, JsonResponse, FileResponse
+from django.urls import reverse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.conf import settings
-from django.core.files.storage import FileSystemStorage
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 import os
-import threading
-import time
 import json
 from .funciones_python import pdf as pdf_processor
+from . import cache as result_cache_module
+from . import cleanup
+from . import handles
+from . import jobs
+from .responses import StreamWithCleanup, file_download_response
+from .uploads import JoinUploadHandler, upload_source, upload_sources
+from .models import PDFJob
+
+def _lookup_cached_result(uploaded_file, operation, params):
+    """Busca el resultado de una operación en la caché. Devuelve (caché, clave, resultado o None)."""
+    result_cache = result_cache_module.get_result_cache()
+    if result_cache is None:
+        return None, None, None
+
+    cache_key = result_cache_module.make_key(
+        result_cache_module.hash_uploaded_file(uploaded_file), operation, params
+    )
+    return result_cache, cache_key, result_cache.get(cache_key)
+
+def _cached_file_response(request, cached, filename=None):
+    """Respuesta de descarga para un resultado servido desde la caché."""
+    return file_download_response(
+        request, cached.path, filename or cached.filename, cached.content_type,
+        headers={**cached.headers, 'X-PDF-Cache': 'HIT'}
+    )
+
+def _normalize_rotations(page_rotations):
+    """Normaliza las rotaciones por página para usarlas como parte de una clave de caché."""
+    if isinstance(page_rotations, str):
+        return ''.join(page_rotations.split()).lower()
+    try:
+        return sorted((int(page), int(angle)) for page, angle in page_rotations.items())
+    except (AttributeError, TypeError, ValueError):
+        return page_rotations
 
 def home(request):
     return render(request, 'home.html')
 
+@csrf_exempt
 def join_pdfs_view(request):
     if request.method == 'POST':
-        uploaded_files = request.FILES.getlist('pdf_files') 
-
-        if not uploaded_files:
-            return JsonResponse({"status": "error", "message": "No se seleccionaron archivos PDF."}, status=400)
-
-        fs = FileSystemStorage(location=settings.MEDIA_ROOT)
-        temp_pdf_paths = []
-
+        # El manejador tiene que instalarse antes de que la comprobación CSRF lea
+        # el cuerpo; por eso la vista es csrf_exempt y _join_pdfs_post la aplica
+        upload_handler = JoinUploadHandler(request)
+        request.upload_handlers = [upload_handler]
         try:
-            for uploaded_file in uploaded_files:
-                filename = fs.save(uploaded_file.name, uploaded_file)
-                temp_pdf_paths.append(fs.path(filename)) 
-
-            output_pdf_path = pdf_processor.join_pdfs(temp_pdf_paths, settings.MEDIA_ROOT)
-
-            with open(output_pdf_path, 'rb') as pdf_file:
-                response = HttpResponse(pdf_file.read(), content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename="{os.path.basename(output_pdf_path)}"'
-                return response
-
-        except Exception as e:
-            return JsonResponse({"status": "error", "message": str(e)}, status=500)
+            return _join_pdfs_post(request, upload_handler)
         finally:
-            for path in temp_pdf_paths:
-                if os.path.exists(path):
-                    try:
-                        os.remove(path)
-                    except OSError:
-                        pass
-            
-            if 'output_pdf_path' in locals() and os.path.exists(output_pdf_path):
-                try:
-                    os.remove(output_pdf_path)
-                except OSError:
-                    pass
+            upload_handler.joiner.close()
 
     return render(request, 'join.html')
 
+@csrf_protect
+def _join_pdfs_post(request, upload_handler):
+    """
+    Une los PDF que JoinUploadHandler fue agregando mientras llegaba el cuerpo.
+
+    La unión se envía desde un archivo "spooled" en bloques, pero se construye en
+    memoria (PdfWriter): el consumo crece con el tamaño del resultado.
+    """
+    request.FILES  # Consumir el cuerpo multipart (los PDF se unen al recibirse)
+
+    if upload_handler.error:
+        return JsonResponse({"status": "error", "message": upload_handler.error}, status=400)
+
+    if not upload_handler.joiner.count:
+        return JsonResponse({"status": "error", "message": "No se seleccionaron archivos PDF."}, status=400)
+
+    try:
+        merged_pdf = upload_handler.joiner.write_to_stream(
+            spool_max_size=getattr(settings, 'PDF_STREAM_SPOOL_MAX_SIZE', 16 * 1024 * 1024)
+        )
+        merged_pdf.seek(0, os.SEEK_END)
+        merged_size = merged_pdf.tell()
+        merged_pdf.seek(0)
+
+        response = StreamingHttpResponse(
+            pdf_processor.iterar_archivo(merged_pdf, getattr(settings, 'PDF_STREAM_CHUNK_SIZE', 64 * 1024)),
+            content_type='application/pdf'
+        )
+        response['Content-Length'] = str(merged_size)
+        response['Content-Disposition'] = 'attachment; filename="pdfs_combinados.pdf"'
+        return response
+
+    except Exception as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=500)
+
 def split_pdf(request):
     if request.method == 'POST':
         uploaded_file = request.FILES.get('pdf_file')
@@ -59,19 +101,42 @@ def split_pdf(request):
         if not uploaded_file:
             return JsonResponse({"status": "error", "message": "No se seleccionó ningún archivo PDF."}, status=400)
 
-        fs = FileSystemStorage(location=settings.MEDIA_ROOT)
-        output_directory = os.path.join(settings.MEDIA_ROOT, 'pdf_temp_processed')
-        os.makedirs(output_directory, exist_ok=True)
+        page_backend = getattr(settings, 'PDF_PAGE_BACKEND', pdf_processor.DEFAULT_PAGE_BACKEND)
+        split_workers = getattr(settings, 'PDF_SPLIT_WORKERS', 1)
+        stream_zip = getattr(settings, 'PDF_SPLIT_STREAM_ZIP', False)
+        zip_compression = request.POST.get('zip_compression') or getattr(settings, 'PDF_SPLIT_ZIP_COMPRESSION', pdf_processor.DEFAULT_ZIP_COMPRESSION)
 
-        files_to_delete_after_response = []
+        try:
+            pdf_processor.parse_zip_compression(zip_compression)
+        except ValueError as e:
+            return JsonResponse({"status": "error", "message": str(e)}, status=400)
+
+        # El nombre base forma parte del contenido (nombres de las partes del ZIP) y el
+        # motor de páginas cambia los bytes de cada parte; los workers no (se escriben en orden)
+        result_cache, cache_key, cached = _lookup_cached_result(uploaded_file, 'split', {
+            'page_backend': page_backend,
+            'split_method': split_method,
+            'pages_per_file': request.POST.get('pages_per_file', '').strip(),
+            'start_page': request.POST.get('start_page', '').strip(),
+            'end_page': request.POST.get('end_page', '').strip(),
+            'pages_specification': request.POST.get('pages_specification', '').replace(" ", ""),
+            'split_into_separate_pdfs': request.POST.get('split_into_separate_pdfs') == 'true',
+            'zip_compression': zip_compression,
+            'original_filename_base': pdf_processor.clean_filename(uploaded_file.name),
+        })
+        if cached:
+            return _cached_file_response(request, cached)
+
+        # Los resultados viven en un directorio propio que se borra al cerrar la respuesta
+        workspace = cleanup.RequestWorkspace()
+        output_directory = workspace.path
 
         try:
             original_file_name_base_clean = pdf_processor.clean_filename(uploaded_file.name)
-            temp_input_pdf_filename_with_hash = fs.save(uploaded_file.name, uploaded_file)
-            temp_input_pdf_path = fs.path(temp_input_pdf_filename_with_hash)
-            files_to_delete_after_response.append(temp_input_pdf_path)
+            temp_input_pdf_path = upload_source(uploaded_file)
 
             output_file_path_for_response = None
+            zip_stream_for_response = None
             filename_for_download = None
             content_type_for_download = None
 
@@ -88,13 +153,26 @@ def split_pdf(request):
                 except ValueError:
                     return JsonResponse({"status": "error", "message": "Valor inválido para 'páginas por archivo'. Por favor, introduce un número válido."}, status=400)
 
-                output_file_path_for_response = pdf_processor.zip_pdfs(
-                    temp_input_pdf_path,
-                    output_directory,
-                    pages_per_file,
-                    original_file_name_base_clean
-                )
-                filename_for_download = os.path.basename(output_file_path_for_response)
+                if stream_zip:
+                    filename_for_download, zip_stream_for_response = pdf_processor.zip_pdfs_stream(
+                        temp_input_pdf_path,
+                        pages_per_file,
+                        original_file_name_base_clean,
+                        backend=page_backend,
+                        workers=split_workers,
+                        compression=zip_compression
+                    )
+                else:
+                    output_file_path_for_response = pdf_processor.zip_pdfs(
+                        temp_input_pdf_path,
+                        output_directory,
+                        pages_per_file,
+                        original_file_name_base_clean,
+                        backend=page_backend,
+                        workers=split_workers,
+                        compression=zip_compression
+                    )
+                    filename_for_download = os.path.basename(output_file_path_for_response)
                 content_type_for_download = 'application/zip'
 
             elif split_method == 'page_range':
@@ -120,7 +198,8 @@ def split_pdf(request):
                     temp_input_pdf_path,
                     output_directory,
                     start_page,
-                    end_page
+                    end_page,
+                    backend=page_backend
                 )
                 filename_for_download = f"{original_file_name_base_clean}_rango_{start_page}_a_{end_page}.pdf"
                 content_type_for_download = 'application/pdf'
@@ -136,13 +215,26 @@ def split_pdf(request):
                     return JsonResponse({"status": "error", "message": "La especificación de páginas no puede estar vacía."}, status=400)
 
                 try:
-                    if split_into_separate_pdfs:
+                    if split_into_separate_pdfs and stream_zip:
+                        filename_for_download, zip_stream_for_response = pdf_processor.extract_specific_pages_to_zip_stream(
+                            temp_input_pdf_path,
+                            pages_specification,
+                            original_file_name_base_clean,
+                            backend=page_backend,
+                            workers=split_workers,
+                            compression=zip_compression
+                        )
+                        content_type_for_download = 'application/zip'
+                    elif split_into_separate_pdfs:
                         
                         output_file_path_for_response = pdf_processor.extract_specific_pages_to_zip(
                             temp_input_pdf_path,
                             output_directory,
                             pages_specification,
-                            original_file_name_base_clean
+                            original_file_name_base_clean,
+                            backend=page_backend,
+                            workers=split_workers,
+                            compression=zip_compression
                         )
                         filename_for_download = os.path.basename(output_file_path_for_response)
                         content_type_for_download = 'application/zip'
@@ -152,7 +244,8 @@ def split_pdf(request):
                             temp_input_pdf_path,
                             output_directory,
                             pages_specification,
-                            original_file_name_base_clean
+                            original_file_name_base_clean,
+                            backend=page_backend
                         )
 
                         pages_clean = pages_specification.replace(" ", "").replace(",", "_")
@@ -167,40 +260,23 @@ def split_pdf(request):
             else:
                 return JsonResponse({"status": "error", "message": "Método de división inválido seleccionado."}, status=400)
 
-            if output_file_path_for_response:
-                files_to_delete_after_response.append(output_file_path_for_response)
-
-                response = FileResponse(
-                    open(output_file_path_for_response, 'rb'),
-                    content_type=content_type_for_download,
-                    filename=filename_for_download,
-                    as_attachment=True
+            if zip_stream_for_response is not None:
+                # El ZIP se genera mientras se envía; la entrada se borra al cerrar la respuesta
+                response = StreamingHttpResponse(
+                    StreamWithCleanup(zip_stream_for_response, workspace.release()),
+                    content_type=content_type_for_download
                 )
+                response['Content-Disposition'] = f'attachment; filename="{filename_for_download}"'
+                return response
 
-                def cleanup_files():
-                    time.sleep(2)  # Wait for response to be sent
-                    for f in files_to_delete_after_response:
-                        if os.path.exists(f):
-                            try:
-                                os.remove(f)
-                                print(f"Eliminado: {f}")
-                            except OSError as e:
-                                print(f"Error eliminando {f}: {e}")
-
-                    # Clean up directory if empty
-                    if os.path.exists(output_directory) and not os.listdir(output_directory):
-                        try:
-                            os.rmdir(output_directory)
-                            print(f"Directorio eliminado: {output_directory}")
-                        except OSError as e:
-                            print(f"Error eliminando directorio {output_directory}: {e}")
-
-                # Start cleanup in background thread
-                cleanup_thread = threading.Thread(target=cleanup_files)
-                cleanup_thread.daemon = True
-                cleanup_thread.start()
+            if output_file_path_for_response:
+                if result_cache:
+                    result_cache.put(cache_key, output_file_path_for_response, filename_for_download, content_type_for_download)
 
-                return response
+                return file_download_response(
+                    request, output_file_path_for_response, filename_for_download, content_type_for_download,
+                    cleanup_paths=workspace.release()
+                )
             else:
                 return JsonResponse({"status": "error", "message": "No se generó un archivo de salida final."}, status=500)
 
@@ -208,19 +284,10 @@ def split_pdf(request):
             return JsonResponse({"status": "error", "message": str(e)}, status=400)
         except Exception as e:
             print(f"ERROR: Fallo inesperado durante el procesamiento en la vista: {e}")
-            # Clean up on error
-            for f in files_to_delete_after_response:
-                if os.path.exists(f):
-                    try:
-                        os.remove(f)
-                    except OSError as ose:
-                        print(f"ADVERTENCIA: No se pudo eliminar el archivo temporal {f} durante el manejo de errores: {ose}")
-            if os.path.exists(output_directory) and not os.listdir(output_directory):
-                try:
-                    os.rmdir(output_directory)
-                except OSError as ose:
-                    print(f"ADVERTENCIA: No se pudo eliminar el directorio temporal {output_directory} durante el manejo de errores: {ose}")
             return JsonResponse({"status": "error", "message": f"Ocurrió un error inesperado durante el procesamiento del PDF: {e}"}, status=500)
+        finally:
+            # Si el directorio no se entregó a la respuesta (errores, validaciones) se borra ya
+            workspace.close()
 
     return render(request, 'split.html')
 
@@ -230,57 +297,53 @@ def compress_pdf_view(request):
         if not uploaded_file:
             return JsonResponse({"status": "error", "message": "No se seleccionó ningún archivo PDF."}, status=400)
 
-        fs = FileSystemStorage(location=settings.MEDIA_ROOT)
-        temp_pdf_paths = []
-        output_pdf_path = None
+        compression_profile = request.POST.get('compression_profile') or getattr(settings, 'PDF_COMPRESSION_PROFILE', pdf_processor.DEFAULT_COMPRESSION_PROFILE)
+        try:
+            pdf_processor.get_compression_profile(compression_profile)
+        except ValueError as e:
+            return JsonResponse({"status": "error", "message": str(e)}, status=400)
+
+        base_name, ext = os.path.splitext(uploaded_file.name)
+        output_filename = f"{base_name}_comprimido{ext}"
+
+        compress_workers = getattr(settings, 'PDF_COMPRESS_WORKERS', 1)
+
+        # El motor paralelo (Pillow) no produce los mismos bytes que rewrite_images
+        result_cache, cache_key, cached = _lookup_cached_result(
+            uploaded_file, 'compress', {'profile': compression_profile.lower(), 'parallel': compress_workers > 1}
+        )
+        if cached:
+            return _cached_file_response(request, cached, output_filename)
+
+        workspace = cleanup.RequestWorkspace()
 
         try:
-            # Save input file
-            input_filename = fs.save(uploaded_file.name, uploaded_file)
-            input_pdf_path = fs.path(input_filename)
-            temp_pdf_paths.append(input_pdf_path)
+            # Input file: Django's temporary file or the in-memory bytes
+            input_pdf_path = upload_source(uploaded_file)
 
             # Prepare output path
-            base_name, ext = os.path.splitext(uploaded_file.name)
-            output_filename = f"{base_name}_comprimido{ext}"
-            output_pdf_path = os.path.join(settings.MEDIA_ROOT, output_filename)
+            output_pdf_path = workspace.file_path(output_filename)
 
             # Process PDF
-            success = pdf_processor.comprimir_pdf(input_pdf_path, output_pdf_path)
-
-            if success and os.path.exists(output_pdf_path):
-                response = FileResponse(
-                    open(output_pdf_path, 'rb'),
-                    content_type='application/pdf',
-                    filename=os.path.basename(output_pdf_path),
-                    as_attachment=True
+            decision = pdf_processor.comprimir_pdf(
+                input_pdf_path, output_pdf_path, compression_profile, workers=compress_workers
+            )
+
+            if decision and os.path.exists(output_pdf_path):
+                # Resultado del pre-análisis: qué se hizo y con qué perfil
+                compression_headers = {
+                    'X-PDF-Compression-Action': decision['action'],
+                    'X-PDF-Compression-Profile': decision['profile'],
+                    'X-PDF-Compression-Predicted-Ratio': str(decision['predicted_ratio']),
+                    'X-PDF-Compression-Ratio': str(round(decision['output_size'] / max(1, uploaded_file.size), 3)),
+                }
+                if result_cache:
+                    result_cache.put(cache_key, output_pdf_path, output_filename, 'application/pdf', compression_headers)
+
+                return file_download_response(
+                    request, output_pdf_path, os.path.basename(output_pdf_path), 'application/pdf',
+                    cleanup_paths=workspace.release(), headers=compression_headers
                 )
-                
-                def cleanup_files():
-                    time.sleep(2)  # Wait for response to be sent
-                    # Clean up input files
-                    for path in temp_pdf_paths:
-                        if os.path.exists(path):
-                            try:
-                                os.remove(path)
-                                print(f"Eliminado input: {path}")
-                            except OSError as e:
-                                print(f"Error eliminando input {path}: {e}")
-                    
-                    # Clean up output file
-                    if output_pdf_path and os.path.exists(output_pdf_path):
-                        try:
-                            os.remove(output_pdf_path)
-                            print(f"Eliminado output: {output_pdf_path}")
-                        except OSError as e:
-                            print(f"Error eliminando output {output_pdf_path}: {e}")
-                
-                # Start cleanup in background thread
-                cleanup_thread = threading.Thread(target=cleanup_files)
-                cleanup_thread.daemon = True
-                cleanup_thread.start()
-                
-                return response
             else:
                 return JsonResponse({"status": "error", "message": "La compresión falló o no se generó el archivo."}, status=500)
 
@@ -289,14 +352,8 @@ def compress_pdf_view(request):
         except Exception as e:
             return JsonResponse({"status": "error", "message": f"Ocurrió un error inesperado: {str(e)}"}, status=500)
         finally:
-            if not (output_pdf_path and os.path.exists(output_pdf_path)):
-                # Only clean up if we didn't create a successful output
-                for path in temp_pdf_paths:
-                    try:
-                        if os.path.exists(path):
-                            os.remove(path)
-                    except Exception:
-                        pass
+            # Si el directorio no se entregó a la respuesta se borra ya
+            workspace.close()
 
     return render(request, 'compress.html')
 
@@ -307,49 +364,60 @@ def rotate_pdf(request):
         if not uploaded_file:
             return JsonResponse({"status": "error", "message": "No se seleccionó ningún archivo PDF."}, status=400)
         
-        fs = FileSystemStorage(location=settings.MEDIA_ROOT)
-        input_pdf_path = None
-        output_pdf_path = None
-        
-        try:
-            input_filename = fs.save(uploaded_file.name, uploaded_file)
-            input_pdf_path = fs.path(input_filename)
-            
-            base_name, ext = os.path.splitext(uploaded_file.name)
-            output_filename = f"{base_name}_rotado{ext}"
-            output_pdf_path = os.path.join(settings.MEDIA_ROOT, output_filename)
-            
-            page_rotations_json = request.POST.get('page_rotations')
-            if not page_rotations_json:
-                return JsonResponse({"status": "error", "message": "No se recibieron datos de rotación de página."}, status=400)
-            
+        # rotation_spec: reglas como "all:+90" o "1-500:+90, odd:180" (rotar_pdf);
+        # page_rotations: JSON {índice de página: ángulo absoluto}
+        rotation_spec = request.POST.get('rotation_spec')
+        page_rotations_json = request.POST.get('page_rotations')
+        if rotation_spec is not None:
+            page_rotations_data = rotation_spec
+        elif not page_rotations_json:
+            return JsonResponse({"status": "error", "message": "No se recibieron datos de rotación de página."}, status=400)
+        else:
             try:
                 page_rotations_data = json.loads(page_rotations_json)
             except json.JSONDecodeError:
                 return JsonResponse({"status": "error", "message": "Formato de datos de rotación de página inválido."}, status=400)
+
+        base_name, ext = os.path.splitext(uploaded_file.name)
+        output_filename = f"{base_name}_rotado{ext}"
+
+        result_cache, cache_key, cached = _lookup_cached_result(
+            uploaded_file, 'rotate', {'page_rotations': _normalize_rotations(page_rotations_data)}
+        )
+        if cached:
+            return _cached_file_response(request, cached, output_filename)
+        
+        workspace = cleanup.RequestWorkspace()
+        
+        try:
+            input_pdf_path = upload_source(uploaded_file)
+            in_place = isinstance(input_pdf_path, str)
+            if in_place:
+                # El temporal de Django es de esta petición: la actualización incremental
+                # se añade sobre él sin copiarlo (Django tolera que ya no exista al cerrarlo)
+                output_pdf_path = input_pdf_path
+            else:
+                output_pdf_path = workspace.file_path(output_filename)
             
             success = pdf_processor.rotar_pdf(input_pdf_path, output_pdf_path, page_rotations_data)
             
             if success:
-                with open(output_pdf_path, 'rb') as pdf_file:
-                    response = HttpResponse(pdf_file.read(), content_type='application/pdf')
-                    response['Content-Disposition'] = f'attachment; filename="{os.path.basename(output_pdf_path)}"'
-                    return response
+                if result_cache:
+                    result_cache.put(cache_key, output_pdf_path, output_filename, 'application/pdf')
+                # La respuesta borra el temporal o el espacio de trabajo al cerrarse
+                return file_download_response(
+                    request, output_pdf_path, output_filename, 'application/pdf',
+                    cleanup_paths=[output_pdf_path] if in_place else workspace.release()
+                )
             else:
                 return JsonResponse({"status": "error", "message": "La rotación falló por una razón desconocida."}, status=500)
+        except ValueError as e:
+            return JsonResponse({"status": "error", "message": str(e)}, status=400)
         except Exception as e:
             return JsonResponse({"status": "error", "message": str(e)}, status=500)
         finally:
-            if input_pdf_path and os.path.exists(input_pdf_path):
-                try:
-                    os.remove(input_pdf_path)
-                except OSError:
-                    pass
-            if output_pdf_path and os.path.exists(output_pdf_path):
-                try:
-                    os.remove(output_pdf_path)
-                except OSError:
-                    pass
+            # Si el directorio no se entregó a la respuesta se borra ya
+            workspace.close()
     return render(request, 'rotar.html')
 
 def unlock_pdf_view(request):
@@ -368,41 +436,56 @@ def unlock_pdf_view(request):
         if not password or not password.strip():
             return JsonResponse({"status": "error", "message": "La contraseña es requerida."}, status=400)
 
-        fs = FileSystemStorage(location=settings.MEDIA_ROOT)
-        input_pdf_path = None
-        output_pdf_path = None
+        workspace = cleanup.RequestWorkspace()
         
         try:
-            # Guardar archivo temporal de entrada
-            input_filename = fs.save(uploaded_file.name, uploaded_file)
-            input_pdf_path = fs.path(input_filename)
-            
-            # Verificar primero si el PDF está protegido
-            pdf_info = pdf_processor.verificar_pdf_protegido(input_pdf_path)
-            
-            if pdf_info['error']:
-                return JsonResponse({"status": "error", "message": f"Error al verificar PDF: {pdf_info['error']}"}, status=400)
-            
-            if not pdf_info['is_encrypted']:
-                return JsonResponse({"status": "error", "message": "El PDF no está protegido con contraseña."}, status=400)
+            # Entrada: temporal de Django o bytes en memoria (Editor.uploads)
+            input_pdf_path = upload_source(uploaded_file)
+
+            # Documento que dejó abierto check_pdf_status para este navegador y este archivo
+            doc = None
+            handle_key = None
+            handle_cache = handles.get_handle_cache()
+            token = handles.get_token(request)
+            if handle_cache is not None and token and isinstance(input_pdf_path, bytes):
+                handle_key = handles.make_key(token, result_cache_module.hash_uploaded_file(uploaded_file))
+                doc = handle_cache.pop(handle_key)
+            handle_state = 'reused' if doc is not None else 'opened'
             
             # Crear nombre para archivo de salida
             base_name, ext = os.path.splitext(uploaded_file.name)
             clean_base_name = pdf_processor.clean_filename(base_name)
             output_filename = f"{clean_base_name}_sin_contraseña{ext}"
-            output_pdf_path = os.path.join(settings.MEDIA_ROOT, output_filename)
+            output_pdf_path = workspace.file_path(output_filename)
             
             print(f"Intentando remover contraseña del PDF: {uploaded_file.name}")
-            print(f"Tamaño del archivo: {pdf_info['file_size']} bytes")
+            print(f"Tamaño del archivo: {uploaded_file.size} bytes")
             
-            # Llamar a la función para remover contraseña
-            success = pdf_processor.remover_contraseña_pdf(
-                input_pdf_path, 
-                output_pdf_path, 
-                password.strip()
-            )
+            # Cifrado, autenticación y salida con un único documento abierto
+            try:
+                result = pdf_processor.desbloquear_pdf(
+                    input_pdf_path, 
+                    output_pdf_path, 
+                    password.strip(),
+                    doc=doc,
+                    backend=getattr(settings, 'PDF_PAGE_BACKEND', pdf_processor.DEFAULT_PAGE_BACKEND),
+                    engine=getattr(settings, 'PDF_UNLOCK_ENGINE', pdf_processor.DEFAULT_UNLOCK_ENGINE)
+                )
+            finally:
+                if doc is not None:
+                    # Con contraseña incorrecta el documento vuelve a la caché para el reintento
+                    if handle_key and doc.is_encrypted:
+                        handle_cache.put(handle_key, doc)
+                    else:
+                        doc.close()
+
+            if not result['is_encrypted']:
+                return JsonResponse({"status": "error", "message": "El PDF no está protegido con contraseña."}, status=400)
+
+            if result['auth'] == 0:
+                return JsonResponse({"status": "error", "message": "Contraseña incorrecta. Verifica e intenta nuevamente."}, status=400)
             
-            if success:
+            if result['output_path']:
                 # Verificar que el archivo de salida se creó correctamente
                 if not os.path.exists(output_pdf_path):
                     return JsonResponse({"status": "error", "message": "No se pudo generar el archivo sin contraseña."}, status=500)
@@ -411,14 +494,14 @@ def unlock_pdf_view(request):
                 if output_size == 0:
                     return JsonResponse({"status": "error", "message": "El archivo generado está vacío."}, status=500)
                 
-                print(f"✅ Contraseña removida exitosamente. Archivo de salida: {output_size} bytes")
+                print(f"✅ Contraseña removida exitosamente ({result['engine']}, documento {handle_state}). Archivo de salida: {output_size} bytes")
                 
-                # Leer y enviar el archivo
-                with open(output_pdf_path, 'rb') as pdf_file:
-                    file_content = pdf_file.read()
-                    
-                response = HttpResponse(file_content, content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename="{output_filename}"'
+                # Enviar el archivo desde disco; la respuesta borra el espacio de trabajo al cerrarse
+                response = file_download_response(
+                    request, output_pdf_path, output_filename, 'application/pdf',
+                    cleanup_paths=workspace.release()
+                )
+                response['X-PDF-Handle'] = handle_state
                 
                 return response
             else:
@@ -444,19 +527,8 @@ def unlock_pdf_view(request):
             return JsonResponse({"status": "error", "message": f"Error inesperado: {str(e)}"}, status=500)
             
         finally:
-            if input_pdf_path and os.path.exists(input_pdf_path):
-                try:
-                    os.remove(input_pdf_path)
-                    print(f"Archivo temporal de entrada eliminado: {input_pdf_path}")
-                except OSError as e:
-                    print(f"Error eliminando archivo temporal de entrada: {e}")
-                    
-            if output_pdf_path and os.path.exists(output_pdf_path):
-                try:
-                    os.remove(output_pdf_path)
-                    print(f"Archivo temporal de salida eliminado: {output_pdf_path}")
-                except OSError as e:
-                    print(f"Error eliminando archivo temporal de salida: {e}")
+            # Si el directorio no se entregó a la respuesta se borra ya
+            workspace.close()
 
     return render(request, 'unlock.html')
 
@@ -471,18 +543,24 @@ def check_pdf_status(request):
         if not uploaded_file.name.lower().endswith('.pdf'):
             return JsonResponse({"status": "error", "message": "El archivo debe ser un PDF"}, status=400)
         
-        fs = FileSystemStorage(location=settings.MEDIA_ROOT)
-        temp_path = None
-        
         try:
-            # Guardar temporalmente para verificar
-            temp_filename = fs.save(f"temp_check_{uploaded_file.name}", uploaded_file)
-            temp_path = fs.path(temp_filename)
-            
-            # Verificar estado del PDF
-            pdf_info = pdf_processor.verificar_pdf_protegido(temp_path)
+            # Sondeo del trailer sin copiar el PDF a MEDIA_ROOT (memorizado por hash)
+            source = upload_source(uploaded_file)
+            content_hash = result_cache_module.hash_uploaded_file(uploaded_file)
+            pdf_info = pdf_processor.sondear_pdf_protegido(source, content_hash=content_hash)
+
+            # Si está cifrado y llegó en memoria, dejar el documento abierto para el desbloqueo
+            handle_cache = handles.get_handle_cache()
+            token = None
+            if handle_cache is not None and pdf_info['is_encrypted'] and isinstance(source, bytes):
+                token = handles.get_or_create_token(request)
+                try:
+                    handle_cache.put(handles.make_key(token, content_hash), pdf_processor.abrir_fitz(source))
+                except Exception as e:
+                    print(f"Advertencia: no se pudo dejar abierto el PDF para el desbloqueo: {e}")
+                    token = None
             
-            return JsonResponse({
+            response = JsonResponse({
                 "status": "success",
                 "data": {
                     "is_encrypted": pdf_info['is_encrypted'],
@@ -493,17 +571,12 @@ def check_pdf_status(request):
                     "error": pdf_info['error']
                 }
             })
+            if token:
+                handles.set_token(response, token)
+            return response
             
         except Exception as e:
             return JsonResponse({"status": "error", "message": str(e)}, status=500)
-            
-        finally:
-            # Limpiar archivo temporal
-            if temp_path and os.path.exists(temp_path):
-                try:
-                    os.remove(temp_path)
-                except OSError:
-                    pass
     
     return JsonResponse({"status": "error", "message": "Método no permitido"}, status=405)
 
@@ -529,14 +602,18 @@ def convert_images_to_pdf_view(request):
         if not uploaded_files:
             return JsonResponse({"status": "error", "message": "No se seleccionaron archivos de imagen."}, status=400)
 
-        fs = FileSystemStorage(location=settings.MEDIA_ROOT)
-        temp_image_paths = []
-        output_pdf_path = None
+        try:
+            target_dpi = pdf_processor.parse_target_dpi(
+                request.POST.get('target_dpi') or getattr(settings, 'PDF_IMAGE_TARGET_DPI', None)
+            )
+        except ValueError as e:
+            return JsonResponse({"status": "error", "message": str(e)}, status=400)
+
+        workspace = cleanup.RequestWorkspace()
 
         try:
-            for uploaded_file in uploaded_files:
-                filename = fs.save(uploaded_file.name, uploaded_file)
-                temp_image_paths.append(fs.path(filename))
+            # Temporales de Django o bytes en memoria, sin copiarlos a MEDIA_ROOT
+            temp_image_paths = upload_sources(uploaded_files)
 
             # Obtener la configuración directamente de request.POST
             page_size = request.POST.get('page_size', 'A4')
@@ -547,20 +624,22 @@ def convert_images_to_pdf_view(request):
             # Llamar a la función de conversión con los parámetros del formulario
             output_pdf_path = pdf_processor.convert_images_to_pdf_with_options(
                 temp_image_paths, 
-                os.path.join(settings.MEDIA_ROOT, 'output.pdf'),
+                workspace.file_path('imagenes_a_pdf.pdf'),
                 page_size,
                 orientation,
                 margins,
-                fit_mode
+                fit_mode,
+                target_dpi,
+                workers=getattr(settings, 'PDF_IMAGE_WORKERS', 1),
+                backend=getattr(settings, 'PDF_IMAGE_BACKEND', None)
             )
 
             if output_pdf_path and os.path.exists(output_pdf_path):
-                with open(output_pdf_path, 'rb') as pdf_file:
-                    pdf_content = pdf_file.read()
-
-                response = HttpResponse(pdf_content, content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename="imagenes_a_pdf.pdf"'
-                return response
+                # La respuesta borra el espacio de trabajo al cerrarse
+                return file_download_response(
+                    request, output_pdf_path, 'imagenes_a_pdf.pdf', 'application/pdf',
+                    cleanup_paths=workspace.release()
+                )
             else:
                 return JsonResponse({"status": "error", "message": "La conversión falló o no se generó el archivo PDF."}, status=500)
 
@@ -568,27 +647,91 @@ def convert_images_to_pdf_view(request):
             # Captura y reporta errores más detallados
             return JsonResponse({"status": "error", "message": f"Ocurrió un error inesperado durante la conversión: {str(e)}"}, status=500)
         finally:
-            # Borrar todas las imágenes originales subidas
-            for path in temp_image_paths:
-                try:
-                    if os.path.exists(path):
-                        os.remove(path)
-                except Exception:
-                    pass
-
-            # Buscar y borrar imágenes temporales (_temp)
-            for file in os.listdir(settings.MEDIA_ROOT):
-                if "_temp" in file:
-                    try:
-                        os.remove(os.path.join(settings.MEDIA_ROOT, file))
-                    except Exception:
-                        pass
-
-            # Borrar el PDF generado
-            if output_pdf_path and os.path.exists(output_pdf_path):
-                try:
-                    os.remove(output_pdf_path)
-                except Exception:
-                    pass
+            # Si el directorio no se entregó a la respuesta se borra ya
+            workspace.close()
                                
-    return render(request, 'imagen_a_pdf.html')
\ No newline at end of file
+    return render(request, 'imagen_a_pdf.html')
+
+def submit_job_view(request, operation):
+    """Vista AJAX que encola una operación pesada y devuelve el id del trabajo"""
+    if request.method != 'POST':
+        return JsonResponse({"status": "error", "message": "Método no permitido"}, status=405)
+
+    if operation not in jobs.OPERATIONS:
+        return JsonResponse({"status": "error", "message": f"Operación desconocida: {operation}"}, status=404)
+
+    _, files_field, multiple = jobs.OPERATIONS[operation]
+    uploaded_files = request.FILES.getlist(files_field) if multiple else [f for f in [request.FILES.get(files_field)] if f]
+
+    if not uploaded_files:
+        return JsonResponse({"status": "error", "message": "No se seleccionaron archivos."}, status=400)
+
+    params = {key: request.POST.get(key) for key in request.POST if key != 'csrfmiddlewaretoken'}
+    params['original_filename_base'] = pdf_processor.clean_filename(uploaded_files[0].name)
+
+    try:
+        job = jobs.submit_job(operation, uploaded_files, params)
+    except ValueError as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({"status": "error", "message": f"No se pudo encolar el trabajo: {str(e)}"}, status=500)
+
+    return JsonResponse({
+        "status": "success",
+        "data": {
+            "job_id": str(job.id),
+            "job_status": job.status,
+            "status_url": reverse('job_status', args=[job.id]),
+            "download_url": reverse('job_download', args=[job.id]),
+        }
+    }, status=202)
+
+def job_status_view(request, job_id):
+    """Vista AJAX para consultar el estado y progreso de un trabajo"""
+    # Un trabajo interrumpido por un reinicio se informa como error en lugar de quedar "en proceso"
+    jobs.fail_stale_jobs()
+    job = PDFJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return JsonResponse({"status": "error", "message": "Trabajo no encontrado"}, status=404)
+
+    data = {
+        "job_id": str(job.id),
+        "operation": job.operation,
+        "job_status": job.status,
+        "progress": job.progress,
+        "error": job.error or None,
+        "download_url": None,
+    }
+    if job.status == PDFJob.STATUS_DONE:
+        data["download_url"] = reverse('job_download', args=[job.id])
+
+    return JsonResponse({"status": "success", "data": data})
+
+def job_download_view(request, job_id):
+    """Descarga el resultado de un trabajo terminado"""
+    job = PDFJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return JsonResponse({"status": "error", "message": "Trabajo no encontrado"}, status=404)
+
+    if job.status == PDFJob.STATUS_ERROR:
+        return JsonResponse({"status": "error", "message": job.error}, status=500)
+
+    if job.status != PDFJob.STATUS_DONE:
+        return JsonResponse({"status": "error", "message": "El trabajo aún no ha terminado.", "progress": job.progress}, status=409)
+
+    if not job.result_path or not os.path.exists(job.result_path):
+        return JsonResponse({"status": "error", "message": "El resultado ya no está disponible."}, status=410)
+
+    return file_download_response(request, job.result_path, job.result_filename, job.result_content_type)
+
+def cache_stats_view(request):
+    """Vista AJAX con los contadores de la caché de resultados"""
+    result_cache = result_cache_module.get_result_cache()
+    if result_cache is None:
+        return JsonResponse({"status": "success", "data": {"enabled": False}})
+
+    return JsonResponse({"status": "success", "data": {"enabled": True, **result_cache.stats()}})
+
+def cleanup_stats_view(request):
+    """Vista AJAX con los bytes temporales retenidos y lo recuperado por la limpieza"""
+    return JsonResponse({"status": "success", "data": cleanup.stats()})
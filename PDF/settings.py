@@ -19,6 +19,79 @@ MEDIA_URL = '/media/'
 BASE_DIR = Path(__file__).resolve().parent.parent
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Procesamiento de PDFs
+# Subidas (Editor.uploads): hasta FILE_UPLOAD_MAX_MEMORY_SIZE bytes se procesan en memoria
+# sin tocar el disco; las mayores se escriben una sola vez en FILE_UPLOAD_TEMP_DIR
+# (None = directorio temporal del sistema) y se procesan desde ese archivo
+FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
+FILE_UPLOAD_TEMP_DIR = None
+# Unión: ante el primer PDF inválido, cortar la conexión sin leer el resto de la subida
+# (True) o descartar el resto sin procesarlo y responder el error en JSON (False)
+PDF_JOIN_ABORT_ON_ERROR = False
+# Unión: tamaño máximo de cada PDF; la subida se corta en cuanto una parte lo supera
+# (el mismo límite que aplica join.js en el navegador; None = sin límite)
+PDF_JOIN_MAX_FILE_SIZE = 50 * 1024 * 1024
+# Bytes que un resultado en streaming mantiene en memoria antes de pasar a disco
+PDF_STREAM_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+# Tamaño de los bloques enviados al cliente en las respuestas en streaming
+PDF_STREAM_CHUNK_SIZE = 64 * 1024
+# Delegar el envío de resultados persistentes (caché, trabajos) al proxy:
+# None, 'x-sendfile' (Apache/lighttpd) o 'x-accel-redirect' (nginx, con una
+# ubicación interna PDF_SENDFILE_URL_PREFIX que apunte a MEDIA_ROOT)
+PDF_SENDFILE_BACKEND = None
+PDF_SENDFILE_URL_PREFIX = '/protected-media/'
+# Motor de ensamblado de páginas para dividir/extraer/desbloquear: 'fitz' (PyMuPDF) o 'pypdf2'
+PDF_PAGE_BACKEND = 'fitz'
+# Motor de desbloqueo: 'fitz' (guarda el documento completo sin cifrado con MuPDF) o
+# 'pages' (copia las páginas con PDF_PAGE_BACKEND); 'fitz' recurre a 'pages' si MuPDF falla
+PDF_UNLOCK_ENGINE = 'fitz'
+# Documentos cifrados que check_pdf_status deja abiertos para el desbloqueo del mismo navegador
+# (Editor.handles): segundos que se conservan (0 = desactivado) y máximo por proceso
+PDF_HANDLE_CACHE_TTL = 2 * 60
+PDF_HANDLE_CACHE_MAX_ENTRIES = 32
+# Procesos usados para generar las partes de zip_pdfs (1 = en serie)
+PDF_SPLIT_WORKERS = 1
+# Enviar los ZIP de división al cliente mientras se generan, sin escribirlos en disco
+PDF_SPLIT_STREAM_ZIP = False
+# Compresión por defecto de los ZIP de división: 'deflate', 'deflate:N', 'stored' o 'auto'
+# (se puede cambiar por petición con el parámetro POST zip_compression)
+PDF_SPLIT_ZIP_COMPRESSION = 'deflate'
+# Perfil por defecto de comprimir_pdf: 'fast', 'balanced' o 'max'
+# (se puede cambiar por petición con el parámetro POST compression_profile)
+PDF_COMPRESSION_PROFILE = 'balanced'
+# Procesos para recomprimir imágenes en paralelo con Pillow (1 = doc.rewrite_images en serie)
+PDF_COMPRESS_WORKERS = 1
+# Resolución máxima (dpi) de las imágenes en imagen a PDF según su tamaño en la página
+# (None = resolución original; se puede cambiar por petición con target_dpi, p. ej. 150, 200 o 300)
+PDF_IMAGE_TARGET_DPI = None
+# Procesos que preparan las imágenes de imagen a PDF en paralelo (1 = en serie)
+PDF_IMAGE_WORKERS = 1
+# Motor de imagen a PDF: 'fitz', 'reportlab' o None (fitz si todas las imágenes son JPEG/PNG)
+PDF_IMAGE_BACKEND = None
+# Hilos del pool local que ejecuta los trabajos en segundo plano (Editor.jobs)
+PDF_JOB_WORKERS = 2
+# Segundos que se conservan los trabajos terminados y sus resultados
+PDF_JOB_RESULT_TTL = 60 * 60
+# Segundos sin avance tras los que un trabajo pendiente o en proceso que no ejecuta
+# ningún pool de este proceso se da por interrumpido y se marca como error (0 = nunca)
+PDF_JOB_STALE_AFTER = 10 * 60
+# Limpieza de temporales: cada cuántos segundos el conserje recorre MEDIA_ROOT (0 = desactivado),
+# antigüedad a partir de la cual un archivo o espacio de trabajo se considera huérfano y
+# subdirectorios de MEDIA_ROOT que no toca (tienen su propia caducidad o son permanentes)
+PDF_JANITOR_INTERVAL = 5 * 60
+PDF_JANITOR_MAX_AGE = 60 * 60
+PDF_JANITOR_EXCLUDE = ('cache', 'jobs', 'pdfs')
+# Compresión HTTP (Editor.middleware): tamaño mínimo de la respuesta, entropía máxima
+# (bits/byte) de la muestra a partir de la cual se considera ya comprimida y calidad de brotli
+PDF_COMPRESSION_MIN_SIZE = 200
+PDF_COMPRESSION_MAX_ENTROPY = 7.5
+PDF_BROTLI_QUALITY = 5
+# Caché de resultados por hash de entrada + operación + parámetros (Editor.cache)
+PDF_RESULT_CACHE_ENABLED = True
+PDF_RESULT_CACHE_DIR = os.path.join(MEDIA_ROOT, 'cache')
+PDF_RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+PDF_RESULT_CACHE_TTL = 24 * 60 * 60
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -52,7 +125,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
-    'django.middleware.gzip.GZipMiddleware',
+    # Comprime solo HTML/JSON/texto; los PDF y ZIP ya van comprimidos (sustituye a GZipMiddleware)
+    'Editor.middleware.ContentAwareCompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
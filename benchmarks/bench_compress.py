@@ -0,0 +1,92 @@
+"""
+Benchmark de los perfiles de comprimir_pdf: tiempo, memoria pico y ratio de salida.
+
+Uso:
+    python benchmarks/bench_compress.py [--perfiles fast balanced max] [--workers 1 4] [pdf ...]
+
+Cada compresión se ejecuta en un proceso hijo nuevo para que la memoria pico
+(ru_maxrss) corresponda solo a esa ejecución. Si no se pasan PDFs se genera un
+corpus sintético con imágenes escaneadas simuladas.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import fitz
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Editor.funciones_python import pdf as pdf_processor  # noqa: E402
+
+
+def generar_corpus(directorio, paginas):
+    """Crea un PDF de texto y otro con una imagen de 300 dpi por página."""
+    texto = os.path.join(directorio, "texto.pdf")
+    doc = fitz.open()
+    for i in range(paginas):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Página {i + 1} " * 20)
+    doc.save(texto)
+    doc.close()
+
+    escaneado = os.path.join(directorio, "escaneado.pdf")
+    imagen = os.path.join(directorio, "pagina.jpg")
+    Image.effect_noise((2480, 3508), 40).convert("RGB").save(imagen, "JPEG", quality=95)
+    doc = fitz.open()
+    for _ in range(paginas):
+        page = doc.new_page()
+        page.insert_image(page.rect, filename=imagen)
+    doc.save(escaneado)
+    doc.close()
+    return [texto, escaneado]
+
+
+def _comprimir_en_hijo(input_pdf_path, output_pdf_path, perfil, workers, cola):
+    inicio = time.perf_counter()
+    pdf_processor.comprimir_pdf(input_pdf_path, output_pdf_path, perfil, workers=workers)
+    transcurrido = time.perf_counter() - inicio
+    # ru_maxrss está en KB en Linux; con workers > 1 se suma el pico de los procesos del pool
+    pico_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    cola.put((transcurrido, pico_kb / 1024))
+
+
+def medir(input_pdf_path, perfil, workers, directorio):
+    output_pdf_path = os.path.join(directorio, f"salida_{perfil}_{workers}.pdf")
+    cola = multiprocessing.Queue()
+    proceso = multiprocessing.Process(
+        target=_comprimir_en_hijo, args=(input_pdf_path, output_pdf_path, perfil, workers, cola)
+    )
+    proceso.start()
+    transcurrido, pico_mb = cola.get()
+    proceso.join()
+    ratio = os.path.getsize(output_pdf_path) / os.path.getsize(input_pdf_path)
+    return transcurrido, pico_mb, ratio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="PDFs del corpus (opcional)")
+    parser.add_argument("--perfiles", nargs="+", default=list(pdf_processor.COMPRESSION_PROFILES))
+    parser.add_argument("--workers", nargs="+", type=int, default=[1], help="Procesos para recomprimir imágenes")
+    parser.add_argument("--paginas", type=int, default=10, help="Páginas del corpus sintético")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        corpus = args.pdfs or generar_corpus(directorio, args.paginas)
+
+        print(f"{'archivo':<28}{'perfil':<10}{'workers':>8}{'tiempo (s)':>12}{'pico (MB)':>12}{'ratio':>9}")
+        for input_pdf_path in corpus:
+            nombre = os.path.basename(input_pdf_path)[:26]
+            for perfil in args.perfiles:
+                for workers in args.workers:
+                    transcurrido, pico_mb, ratio = medir(input_pdf_path, perfil, workers, directorio)
+                    print(f"{nombre:<28}{perfil:<10}{workers:>8}{transcurrido:>12.3f}{pico_mb:>12.1f}{ratio:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark de convert_images_to_pdf_with_options: motor reportlab frente a fitz.
+
+Uso:
+    python benchmarks/bench_images.py [--target-dpi 150] [--repeticiones 3] [imagen ...]
+
+Para cada motor mide el tiempo de conversión, las imágenes por segundo y el
+tamaño del PDF generado. Si no se pasan imágenes se genera un lote sintético de
+fotos JPEG y capturas PNG (con y sin transparencia).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Editor.funciones_python import pdf as pdf_processor  # noqa: E402
+
+
+def generar_lote(directorio, cantidad):
+    """Crea cantidad imágenes alternando fotos JPEG de 12 MP y capturas PNG."""
+    rutas = []
+    for i in range(cantidad):
+        if i % 3 == 2:
+            ruta = os.path.join(directorio, f"captura_{i}.png")
+            imagen = Image.linear_gradient("L").resize((1600, 1000)).convert("RGBA")
+            imagen.putalpha(200)
+            imagen.save(ruta)
+        elif i % 3 == 1:
+            ruta = os.path.join(directorio, f"captura_{i}.png")
+            Image.linear_gradient("L").resize((1600, 1000)).convert("RGB").save(ruta)
+        else:
+            ruta = os.path.join(directorio, f"foto_{i}.jpg")
+            Image.effect_noise((4000, 3000), 25 + i).convert("RGB").save(ruta, "JPEG", quality=90)
+        rutas.append(ruta)
+    return rutas
+
+
+def medir(image_paths, backend, target_dpi, repeticiones, directorio):
+    output_path = os.path.join(directorio, f"salida_{backend}.pdf")
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        pdf_processor.convert_images_to_pdf_with_options(
+            image_paths, output_path, 'A4', 'portrait', 'standard', 'fit',
+            target_dpi=target_dpi, backend=backend
+        )
+        tiempos.append(time.perf_counter() - inicio)
+    mejor = min(tiempos)
+    return mejor, len(image_paths) / mejor, os.path.getsize(output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("imagenes", nargs="*", help="Imágenes a convertir (opcional)")
+    parser.add_argument("--target-dpi", type=int, default=None, help="Resolución objetivo (por defecto, la original)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--cantidad", type=int, default=12, help="Imágenes del lote sintético")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        image_paths = args.imagenes or generar_lote(directorio, args.cantidad)
+        entrada = sum(os.path.getsize(path) for path in image_paths)
+        print(f"{len(image_paths)} imágenes, {entrada / 1024 / 1024:.1f} MB, target_dpi={args.target_dpi}")
+
+        print(f"{'motor':<12}{'tiempo (s)':>12}{'img/s':>10}{'PDF (MB)':>12}")
+        for backend in pdf_processor.IMAGE_BACKENDS:
+            mejor, por_segundo, tamano = medir(image_paths, backend, args.target_dpi, args.repeticiones, directorio)
+            print(f"{backend:<12}{mejor:>12.3f}{por_segundo:>10.1f}{tamano / 1024 / 1024:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark de join_pdfs: costo por archivo de entrada antes y después de
+reutilizar el PdfReader de validación para el append.
+
+Uso:
+    python benchmarks/bench_join.py [--archivos 50] [--paginas 40] [pdf ...]
+
+Si no se pasan PDFs se genera un corpus sintético con PyMuPDF.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import fitz
+from PyPDF2 import PdfMerger, PdfReader
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Editor.funciones_python import pdf as pdf_processor  # noqa: E402
+
+
+def generar_corpus(directorio, archivos, paginas):
+    """Crea PDFs sintéticos con texto en cada página."""
+    rutas = []
+    for n in range(archivos):
+        doc = fitz.open()
+        for i in range(paginas):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Archivo {n + 1} - página {i + 1}")
+        ruta = os.path.join(directorio, f"entrada_{n + 1}.pdf")
+        doc.save(ruta)
+        doc.close()
+        rutas.append(ruta)
+    return rutas
+
+
+def join_doble_lectura(pdf_file_paths, output_directory):
+    """Ruta anterior: valida con PdfReader y vuelve a analizar en merger.append."""
+    merger = PdfMerger()
+    output_path = os.path.join(output_directory, "pdfs_combinados.pdf")
+    try:
+        for pdf_path in pdf_file_paths:
+            with open(pdf_path, 'rb') as f:
+                PdfReader(f)
+            merger.append(pdf_path)
+        merger.write(output_path)
+        return output_path
+    finally:
+        merger.close()
+
+
+def medir(funcion, rutas, directorio, repeticiones):
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(rutas, directorio)
+        transcurrido = time.perf_counter() - inicio
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="PDFs a unir (opcional)")
+    parser.add_argument("--archivos", type=int, default=50)
+    parser.add_argument("--paginas", type=int, default=40)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        rutas = args.pdfs or generar_corpus(directorio, args.archivos, args.paginas)
+
+        antes = medir(join_doble_lectura, rutas, directorio, args.repeticiones)
+        despues = medir(pdf_processor.join_pdfs, rutas, directorio, args.repeticiones)
+
+        print(f"Archivos de entrada: {len(rutas)}")
+        print(f"{'ruta':<22}{'total (s)':>12}{'por archivo (ms)':>20}")
+        print(f"{'doble lectura':<22}{antes:>12.3f}{antes / len(rutas) * 1000:>20.2f}")
+        print(f"{'lectura única':<22}{despues:>12.3f}{despues / len(rutas) * 1000:>20.2f}")
+        print(f"Mejora: {antes / despues:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark de rotar_pdf: actualización incremental propia frente a saveIncr de MuPDF y reescritura completa.
+
+Uso:
+    python benchmarks/bench_rotate.py [--paginas 500] [--kb-por-pagina 400] [--regla all:+90] [pdf ...]
+
+Para cada PDF mide el tiempo y los KB añadidos al archivo (o escritos, en la
+reescritura) al aplicar la regla con:
+- rotar_pdf sobre una copia (copia + actualización incremental)
+- rotar_pdf sobre el propio archivo (solo la actualización incremental)
+- saveIncr de MuPDF sobre una copia con set_rotation
+- la reescritura completa anterior (garbage=4, deflate, clean)
+Si no se pasan PDFs se genera un escaneo sintético: una imagen sin comprimir por página.
+"""
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Editor.funciones_python import pdf as pdf_processor  # noqa: E402
+
+
+def generar_escaneo(path, paginas, kb_por_pagina):
+    """PDF con una imagen RGB de ruido de kb_por_pagina KB en cada página (no se comprime)."""
+    lado = int((kb_por_pagina * 1024 / 3) ** 0.5)
+    doc = fitz.open()
+    for _ in range(paginas):
+        page = doc.new_page()
+        pix = fitz.Pixmap(fitz.csRGB, lado, lado, os.urandom(lado * lado * 3), False)
+        page.insert_image(page.rect, pixmap=pix)
+    doc.save(path)
+    doc.close()
+
+
+def rotar_copia(input_path, output_path, regla):
+    pdf_processor.rotar_pdf(input_path, output_path, regla)
+
+
+def rotar_en_sitio(input_path, output_path, regla):
+    # La copia no se mide: la vista trabaja sobre el temporal de Django, que ya es suyo
+    shutil.copyfile(input_path, output_path)
+    inicio = time.perf_counter()
+    pdf_processor.rotar_pdf(output_path, output_path, regla)
+    return time.perf_counter() - inicio
+
+
+def rotar_mupdf_incremental(input_path, output_path, regla):
+    shutil.copyfile(input_path, output_path)
+    doc = fitz.open(output_path)
+    for pages, angle, relative in pdf_processor.parse_rotation_specification(regla, doc.page_count):
+        for page in pages:
+            pagina = doc[page - 1]
+            pagina.set_rotation((pagina.rotation + angle) % 360 if relative else angle % 360)
+    doc.saveIncr()
+    doc.close()
+
+
+def rotar_reescritura(input_path, output_path, regla):
+    doc = fitz.open(input_path)
+    for pages, angle, relative in pdf_processor.parse_rotation_specification(regla, doc.page_count):
+        for page in pages:
+            pagina = doc[page - 1]
+            pagina.set_rotation((pagina.rotation + angle) % 360 if relative else angle % 360)
+    doc.save(output_path, garbage=4, deflate=True, clean=True, pretty=False)
+    doc.close()
+
+
+VARIANTES = [
+    ('incremental', rotar_copia),
+    ('en sitio', rotar_en_sitio),
+    ('mupdf saveIncr', rotar_mupdf_incremental),
+    ('reescritura', rotar_reescritura),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="PDFs de entrada (opcional)")
+    parser.add_argument("--paginas", type=int, default=500, help="Páginas del escaneo sintético")
+    parser.add_argument("--kb-por-pagina", type=int, default=400, help="KB de imagen por página del escaneo sintético")
+    parser.add_argument("--regla", default="all:+90", help="Especificación de rotación")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        muestras = list(args.pdfs)
+        if not muestras:
+            muestras = [os.path.join(directorio, f"escaneo_{args.paginas}p.pdf")]
+            generar_escaneo(muestras[0], args.paginas, args.kb_por_pagina)
+
+        output_path = os.path.join(directorio, "salida.pdf")
+        print(f"{'muestra':<24}{'MB':>8}  {'variante':<16}{'tiempo (s)':>12}{'KB':>12}")
+        for path in muestras:
+            size = os.path.getsize(path)
+            for nombre, variante in VARIANTES:
+                tiempos = []
+                for _ in range(args.repeticiones):
+                    # Solo interesa el tiempo; los mensajes de progreso de pdf_processor se descartan
+                    with redirect_stdout(io.StringIO()):
+                        inicio = time.perf_counter()
+                        parcial = variante(path, output_path, args.regla)
+                        tiempos.append(parcial if parcial is not None else time.perf_counter() - inicio)
+                escritos = os.path.getsize(output_path) - (size if nombre != 'reescritura' else 0)
+                print(f"{os.path.basename(path):<24}{size / 1024 / 1024:>8.1f}  {nombre:<16}{min(tiempos):>12.3f}{escritos / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark de remover_contraseña_pdf: motor fitz (guardar sin cifrado) frente a copiar páginas.
+
+Uso:
+    python benchmarks/bench_unlock.py [--paginas 300] [--repeticiones 3] [pdf_sin_cifrar ...]
+
+Cifra cada PDF con AES-256 y con RC4-128 y, para cada motor, mide el tiempo de
+desbloqueo, el tamaño del resultado y si se conservan los marcadores. El motor
+'pages' se mide con los dos motores de ensamblado de páginas (fitz y pypdf2).
+Si no se pasan PDFs se genera un informe sintético con texto, imágenes y un
+marcador por página.
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stderr, redirect_stdout
+
+import fitz
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Editor.funciones_python import pdf as pdf_processor  # noqa: E402
+
+PASSWORD = 'clave'
+CIFRADOS = {
+    'aes-256': fitz.PDF_ENCRYPT_AES_256,
+    'rc4-128': fitz.PDF_ENCRYPT_RC4_128,
+}
+# (motor de desbloqueo, motor de páginas)
+VARIANTES = [('fitz', None), ('pages', 'fitz'), ('pages', 'pypdf2')]
+
+
+def generar_informe(paginas):
+    """PDF con texto, una imagen cada diez páginas y un marcador por página."""
+    imagen = io.BytesIO()
+    Image.effect_noise((800, 600), 30).convert("RGB").save(imagen, "JPEG", quality=85)
+
+    doc = fitz.open()
+    for i in range(paginas):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Informe - página {i + 1}", fontsize=14)
+        page.insert_textbox(fitz.Rect(72, 100, 523, 700), "Lorem ipsum dolor sit amet. " * 60, fontsize=9)
+        if i % 10 == 0:
+            page.insert_image(fitz.Rect(72, 500, 372, 725), stream=imagen.getvalue())
+    doc.set_toc([[1, f"Página {i + 1}", i + 1] for i in range(paginas)])
+    data = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return data
+
+
+def cifrar(data, encryption):
+    doc = fitz.open(stream=data, filetype='pdf')
+    cifrado = doc.tobytes(encryption=encryption, user_pw=PASSWORD, owner_pw=PASSWORD + '-propietario')
+    doc.close()
+    return cifrado
+
+
+def medir(input_path, engine, backend, repeticiones, directorio):
+    output_path = os.path.join(directorio, f"salida_{engine}_{backend}.pdf")
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        pdf_processor.remover_contraseña_pdf(input_path, output_path, PASSWORD, backend=backend, engine=engine)
+        tiempos.append(time.perf_counter() - inicio)
+    with fitz.open(output_path) as doc:
+        marcadores = len(doc.get_toc())
+    return min(tiempos), os.path.getsize(output_path), marcadores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="PDFs sin cifrar (opcional)")
+    parser.add_argument("--paginas", type=int, default=300, help="Páginas del informe sintético")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    muestras = [(os.path.basename(path), open(path, 'rb').read()) for path in args.pdfs]
+    if not muestras:
+        muestras = [(f"informe_{args.paginas}p", generar_informe(args.paginas))]
+
+    # Solo interesa el tiempo; los mensajes de progreso de pdf_processor se descartan
+    with tempfile.TemporaryDirectory() as directorio:
+        print(f"{'muestra':<20}{'cifrado':<10}{'motor':<14}{'tiempo (s)':>12}{'MB':>8}{'marcadores':>12}")
+        for nombre, data in muestras:
+            for cifrado, encryption in CIFRADOS.items():
+                input_path = os.path.join(directorio, f"{cifrado}.pdf")
+                with open(input_path, 'wb') as f:
+                    f.write(cifrar(data, encryption))
+
+                for engine, backend in VARIANTES:
+                    motor = engine if backend is None else f"{engine}/{backend}"
+                    try:
+                        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+                            mejor, tamano, marcadores = medir(input_path, engine, backend, args.repeticiones, directorio)
+                    except Exception as e:
+                        print(f"{nombre:<20}{cifrado:<10}{motor:<14}  error: {e}")
+                        continue
+                    print(f"{nombre:<20}{cifrado:<10}{motor:<14}{mejor:>12.3f}{tamano / 1024 / 1024:>8.2f}{marcadores:>12}")
+
+
+if __name__ == "__main__":
+    main()